@@ -2,12 +2,15 @@ from collections import OrderedDict
 
 from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from .imports import ActivityImport
 from .models import Activity
-from activities.serializers import ActivitySerializer, ActivityListSerializer, ActivityResponseSerializer
+from activities.serializers import ActivitySerializer, ActivityListSerializer, ActivityResponseSerializer, \
+    ActivityImportSerializer, ActivityImportResultSerializer
 from django_filters import rest_framework as filters
 
 
@@ -58,6 +61,8 @@ class ActivityFilter(filters.FilterSet):
     factor_type = filters.NumberFilter(field_name='emission_source__factor_type_id')
     year = filters.NumberFilter(field_name='year')
     month = filters.NumberFilter(field_name='month')
+    period_from = filters.NumberFilter(field_name='period', lookup_expr='gte', label='Periodo inicial (AAAAMM)')
+    period_to = filters.NumberFilter(field_name='period', lookup_expr='lte', label='Periodo final (AAAAMM)')
     usage = filters.CharFilter(field_name='usage', lookup_expr='icontains')
     unit = filters.CharFilter(field_name='unit__symbol', lookup_expr='icontains')
 
@@ -87,6 +92,7 @@ class ActivityViewSet(viewsets.ModelViewSet):
             serializer = ActivityListSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
+        queryset = queryset.prefetch_related('gases_emitted', 'gases_emitted_by_factor')
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
@@ -122,3 +128,17 @@ class ActivityViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = ActivityResponseSerializer(instance, context={'request': request})
         return Response(serializer.data)
+
+    @extend_schema(
+        summary='Import activities from a CSV or XLSX file',
+        request={'multipart/form-data': ActivityImportSerializer},
+        responses={200: ActivityImportResultSerializer}
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request, *args, **kwargs):
+        serializer = ActivityImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data['file']
+
+        result = ActivityImport(user=request.user).run(file, file.name)
+        return Response(ActivityImportResultSerializer(result).data)
@@ -0,0 +1,228 @@
+import csv
+import io
+from datetime import datetime
+from itertools import islice
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
+from openpyxl import load_workbook
+from activities.models import Activity
+from activities.recalculation import ActivityRecalculation
+from activities.serializers import ActivityImportRowSerializer
+from companies.models import EmissionsSource, Location, Member
+from emissions.utils import normalize_factor_consumption
+from main.models import UnitOfMeasure
+
+IMPORT_COLUMNS = ('emission_source', 'location', 'name', 'description', 'consumption', 'date', 'month', 'year', 'unit')
+
+
+def _cell_value(value):
+    """
+    Normalize a spreadsheet cell to the value a form would submit.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def read_rows(file, filename: str):
+    """
+    Stream the rows of a CSV or XLSX file as dicts keyed by the lower cased header.
+
+    :param file: A binary file object.
+    :param filename: The original file name, its extension selects the parser.
+    """
+    if filename.lower().endswith('.xlsx'):
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = [str(cell or '').strip().lower() for cell in next(rows, [])]
+            for row in rows:
+                if any(cell not in (None, '') for cell in row):
+                    yield {key: _cell_value(cell) for key, cell in zip(header, row) if key}
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            for row in csv.DictReader(text):
+                row = {(key or '').strip().lower(): _cell_value(value) for key, value in row.items()}
+                if any(value not in (None, '') for value in row.values()):
+                    yield row
+        finally:
+            text.detach()
+
+
+class ImportLookups(object):
+    """
+    Caches of the emission sources, locations and units referenced by an import.
+
+    References may be ids, the emission source code or name, the location name and the unit symbol or name.
+    The missing references of each chunk are resolved with one query per model. A reference matching several
+    rows, including a number that is the id of one row and the code or name of another, resolves to ``AMBIGUOUS``.
+    """
+
+    AMBIGUOUS = 'ambiguous'
+
+    def __init__(self, company_ids=None):
+        """
+        :param company_ids: Companies whose emission sources and locations can be referenced, every company
+                            when None.
+        """
+        self.company_ids = company_ids
+        self.sources = {}
+        self.locations = {}
+        self.units = {}
+        for unit_id, symbol, name in UnitOfMeasure.objects.values_list('id', 'symbol', 'name'):
+            self.units[str(unit_id)] = unit_id
+            for key in (symbol, name):
+                if key:
+                    self.units.setdefault(key.lower(), unit_id)
+
+    @staticmethod
+    def _split(keys):
+        # Codes and names can be numbers too, so every key is also matched as a code or name
+        ids = [int(key) for key in keys if key.isdigit()]
+        return ids, list(keys)
+
+    def _store(self, cache, keys, matches):
+        for key in keys:
+            values = matches.get(key, set())
+            cache[key] = self.AMBIGUOUS if len(values) > 1 else next(iter(values), None)
+
+    def prefetch(self, rows):
+        source_keys = {str(row.get('emission_source') or '').lower() for row in rows} - set(self.sources) - {''}
+        location_keys = {str(row.get('location') or '').lower() for row in rows} - set(self.locations) - {''}
+
+        if source_keys:
+            ids, names = self._split(source_keys)
+            sources = EmissionsSource.objects.annotate(code_lower=Lower('code'), name_lower=Lower('name')).filter(
+                Q(id__in=ids) | Q(code_lower__in=names) | Q(name_lower__in=names)
+            )
+            if self.company_ids is not None:
+                sources = sources.filter(location__company_id__in=self.company_ids)
+            matches = {}
+            for source_id, code, name, location_id, factor_id in sources.values_list(
+                'id', 'code', 'name', 'location_id', 'emission_factor_id'
+            ):
+                for key in {str(source_id), (code or '').lower(), (name or '').lower()} & source_keys:
+                    matches.setdefault(key, set()).add((source_id, location_id, factor_id))
+            self._store(self.sources, source_keys, matches)
+
+        if location_keys:
+            ids, names = self._split(location_keys)
+            locations = Location.objects.annotate(name_lower=Lower('name')).filter(
+                Q(id__in=ids) | Q(name_lower__in=names)
+            )
+            if self.company_ids is not None:
+                locations = locations.filter(company_id__in=self.company_ids)
+            matches = {}
+            for location_id, name in locations.values_list('id', 'name'):
+                for key in {str(location_id), name.lower()} & location_keys:
+                    matches.setdefault(key, set()).add(location_id)
+            self._store(self.locations, location_keys, matches)
+
+    def emission_source(self, value):
+        return self.sources.get(str(value).lower())
+
+    def location(self, value):
+        return self.locations.get(str(value).lower())
+
+    def unit(self, value):
+        return self.units.get(str(value).lower())
+
+
+class ActivityImport(object):
+    """
+    Import activities from a CSV or XLSX file.
+
+    The rows are streamed and handled in chunks: each chunk resolves its references through the lookup
+    caches, validates every row with ActivityImportRowSerializer, inserts the valid activities with
+    bulk_create and computes their gas rows in batch, so memory use does not depend on the file size.
+    """
+
+    # Errors kept in `errors`, the remaining are only counted
+    max_errors = 1000
+
+    def __init__(self, user=None, chunk_size=500, on_error=None):
+        """
+        :param user: The user recorded as creator of the activities, only the emission sources and locations of
+                     the companies they are a member of can be referenced. Without user, as in the import_activities
+                     command run without --user, every company can.
+        :param chunk_size: Rows validated and inserted together.
+        :param on_error: Callable receiving (row_number, errors) for every invalid row.
+        """
+        self.user = user
+        self.chunk_size = chunk_size
+        self.on_error = on_error
+        company_ids = None
+        if user is not None:
+            company_ids = list(Member.objects.filter(user=user).values_list('company_id', flat=True))
+        self.lookups = ImportLookups(company_ids)
+        # Only its chunk writer is used, the activities to write are given explicitly
+        self.recalculation = ActivityRecalculation(recalculate_all=True)
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row_number, 'errors': errors})
+        if self.on_error is not None:
+            self.on_error(row_number, errors)
+
+    def import_chunk(self, numbered_rows):
+        self.lookups.prefetch([row for _, row in numbered_rows])
+
+        activities = []
+        factor_ids = []
+        for row_number, row in numbered_rows:
+            serializer = ActivityImportRowSerializer(data=row, context={'lookups': self.lookups})
+            if not serializer.is_valid():
+                self.add_error(row_number, serializer.errors)
+                continue
+            data = serializer.validated_data
+            source_id, location_id, factor_id = data.pop('emission_source')
+            location_id = data.pop('location', None) or location_id
+            activities.append(Activity(
+                emission_source_id=source_id,
+                location_id=location_id,
+                unit_id=data.pop('unit'),
+                user_created=self.user,
+                period=Activity.get_period(data['year'], data['month']),
+                **data
+            ))
+            factor_ids.append(factor_id)
+
+        if not activities:
+            return
+
+        Activity.fill_classification_keys(activities)
+        consumption = normalize_factor_consumption(
+            [activity.consumption for activity in activities], [activity.unit_id for activity in activities],
+            factor_ids
+        )
+        with transaction.atomic():
+            activities = Activity.objects.bulk_create(activities)
+            self.recalculation.recalculate_chunk([
+                (activity.id, float(value), factor_id, activity.emission_source_id, activity.location_id,
+                 activity.year, activity.month, *activity.classification_keys.values())
+                for activity, factor_id, value in zip(activities, factor_ids, consumption)
+            ])
+        self.created += len(activities)
+
+    def run(self, file, filename):
+        rows = enumerate(read_rows(file, filename), start=2)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk)
+
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
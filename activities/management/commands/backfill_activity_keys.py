@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from activities.models import Activity, ActivityGasEmittedByFactor
+
+
+class Command(BaseCommand):
+    help = 'Copia la empresa y la clasificación de las fuentes de emisión en las actividades y sus gases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Actividades actualizadas por lote')
+        parser.add_argument('--all', action='store_true',
+                            help='Reescribe todas las actividades y no solo las que no tienen empresa')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        activities = Activity.objects.all()
+        if not options['all']:
+            activities = activities.filter(company__isnull=True)
+
+        ids = activities.order_by('id').values_list('id', flat=True)
+        total = ids.count()
+        self.stdout.write(f'{total} actividades por actualizar')
+
+        processed = 0
+        last_id = 0
+        while True:
+            chunk = list(ids.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+
+            batch = list(Activity.objects.filter(id__in=chunk).only(
+                'id', 'location_id', 'emission_source_id', *Activity.CLASSIFICATION_KEYS
+            ))
+            Activity.fill_classification_keys(batch)
+            with transaction.atomic():
+                Activity.objects.bulk_update(batch, list(Activity.CLASSIFICATION_KEYS), batch_size=1000)
+                ActivityGasEmittedByFactor.objects.filter(activity_id__in=chunk).update(**{
+                    field: Subquery(Activity.objects.filter(id=OuterRef('activity_id')).values(field))
+                    for field in Activity.CLASSIFICATION_KEYS
+                })
+
+            processed += len(chunk)
+            last_id = chunk[-1]
+            self.stdout.write(f'{processed}/{total} actividades actualizadas')
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} actividades actualizadas.'))
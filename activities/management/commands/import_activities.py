@@ -0,0 +1,49 @@
+import csv
+import json
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from activities.imports import ActivityImport
+
+
+class Command(BaseCommand):
+    help = 'Importa actividades desde un archivo CSV o XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV o XLSX con las actividades')
+        parser.add_argument('--user', type=int, help='Id del usuario que registra las actividades, solo se usan las fuentes de '
+                                 'emisión y ubicaciones de sus empresas')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Filas validadas e insertadas por lote')
+        parser.add_argument('--report', help='Archivo CSV donde se escriben los errores por fila')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(id=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'El usuario {options["user"]} no existe')
+
+        report = None
+        writer = None
+        if options['report']:
+            report = open(options['report'], 'w', newline='')
+            writer = csv.writer(report)
+            writer.writerow(['row', 'errors'])
+
+        def on_error(row_number, errors):
+            if writer is not None:
+                writer.writerow([row_number, json.dumps(errors, ensure_ascii=False, default=str)])
+            else:
+                self.stdout.write(self.style.WARNING(f'Fila {row_number}: {errors}'))
+
+        try:
+            with open(options['path'], 'rb') as file:
+                importer = ActivityImport(user=user, chunk_size=options['chunk_size'], on_error=on_error)
+                result = importer.run(file, options['path'])
+        finally:
+            if report is not None:
+                report.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{result["created"]} actividades importadas, {result["failed"]} filas con errores.'
+        ))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from activities.models import ActivityGasEmittedByFactor, EmissionRollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el consolidado mensual de emisiones a partir de los gases emitidos por actividad'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='Limita la reconstrucción a una empresa')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compara el consolidado con los gases emitidos sin modificarlo'
+        )
+
+    def handle(self, *args, **options):
+        facts = ActivityGasEmittedByFactor.objects.all()
+        rollup = EmissionRollup.objects.all()
+        if options['company']:
+            facts = facts.filter(activity__location__company_id=options['company'])
+            rollup = rollup.filter(company_id=options['company'])
+
+        if options['verify']:
+            return self.verify(facts, rollup)
+
+        with transaction.atomic():
+            deleted, _ = rollup.delete()
+            created = EmissionRollup.objects.bulk_create(EmissionRollup.objects.build(facts), batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Consolidado reconstruido: {deleted} filas eliminadas, {len(created)} filas creadas.'
+        ))
+
+    def verify(self, facts, rollup):
+        fields = ('emission_source_id', 'location_id', 'year', 'month', 'emission_factor_id', 'greenhouse_gas_id')
+        expected = {
+            tuple(row[field] for field in fields): (row['total_value'] or 0, row['total_co2e'] or 0)
+            for row in EmissionRollup.objects.aggregate_facts(facts).iterator()
+        }
+        current = {
+            tuple(row[field] for field in fields): (row['value'], row['co2e'])
+            for row in rollup.values(*fields, 'value', 'co2e').order_by().iterator()
+        }
+
+        mismatches = 0
+        for key in expected.keys() | current.keys():
+            expected_value, expected_co2e = expected.get(key, (0, 0))
+            value, co2e = current.get(key, (0, 0))
+            if abs(expected_value - value) > 1e-6 or abs(expected_co2e - co2e) > 1e-6:
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Diferencia en {dict(zip(fields, key))}: esperado ({expected_value}, {expected_co2e}), '
+                    f'consolidado ({value}, {co2e})'
+                ))
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} filas del consolidado no coinciden.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Consolidado verificado: {len(expected)} filas coinciden.'))
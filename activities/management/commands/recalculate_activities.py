@@ -0,0 +1,49 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from activities.recalculation import ActivityRecalculation
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los gases emitidos de las actividades afectadas por cambios en factores o gases'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--factor', type=int, action='append', default=[],
+                            help='Id de un factor de emisión modificado (puede repetirse)')
+        parser.add_argument('--gas', type=int, action='append', default=[],
+                            help='Id de un gas de efecto invernadero modificado (puede repetirse)')
+        parser.add_argument('--all', action='store_true', help='Recalcula todas las actividades')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Actividades por lote')
+        parser.add_argument('--checkpoint', default='recalculate_activities.checkpoint',
+                            help='Archivo donde se guarda el último id procesado')
+        parser.add_argument('--resume', action='store_true', help='Continúa desde el último id del checkpoint')
+
+    def handle(self, *args, **options):
+        if not (options['factor'] or options['gas'] or options['all']):
+            raise CommandError('Debe indicar --factor, --gas o --all')
+
+        checkpoint = options['checkpoint']
+        after_id = None
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                after_id = int(file.read().strip() or 0)
+            self.stdout.write(f'Continuando después de la actividad {after_id}')
+
+        recalculation = ActivityRecalculation(
+            factor_ids=options['factor'],
+            gas_ids=options['gas'],
+            recalculate_all=options['all'],
+            chunk_size=options['chunk_size']
+        )
+        total = recalculation.count(after_id)
+        self.stdout.write(f'{total} actividades por recalcular')
+
+        def progress(processed, last_id):
+            with open(checkpoint, 'w') as file:
+                file.write(str(last_id))
+            self.stdout.write(f'{processed}/{total} actividades recalculadas (último id {last_id})')
+
+        processed = recalculation.run(after_id=after_id, progress=progress)
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'{processed} actividades recalculadas.'))
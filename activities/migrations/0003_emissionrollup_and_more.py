@@ -0,0 +1,50 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0031_delete_emissionssourcemonthentry'),
+        ('emission_source_classifications', '0018_alter_commonequipment_normalized_name_and_more'),
+        ('emissions', '0014_alter_emissionresult_month'),
+        ('activities', '0002_alter_activitygasemittedbyfactor_greenhouse_gas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmissionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Año')),
+                ('month', models.PositiveSmallIntegerField(choices=[(1, 'Enero'), (2, 'Febrero'), (3, 'Marzo'), (4, 'Abril'), (5, 'Mayo'), (6, 'Junio'), (7, 'Julio'), (8, 'Agosto'), (9, 'Septiembre'), (10, 'Octubre'), (11, 'Noviembre'), (12, 'Diciembre')], verbose_name='Mes')),
+                ('value', models.FloatField(default=0, verbose_name='Cantidad Emitida')),
+                ('co2e', models.FloatField(default=0, verbose_name='CO₂e Equivalente')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emission_source_classifications.isocategory')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='companies.company')),
+                ('emission_factor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emissions.emissionfactor')),
+                ('emission_source', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='companies.emissionssource')),
+                ('factor_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emissions.factortype')),
+                ('greenhouse_gas', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emissions.greenhousegas')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emission_source_classifications.emissionsourcegroup')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='companies.location')),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emission_source_classifications.ghgscope')),
+                ('source_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='emissions.sourcetype')),
+            ],
+            options={
+                'verbose_name': 'Consolidado Mensual de Emisiones',
+                'verbose_name_plural': 'Consolidados Mensuales de Emisiones',
+                'ordering': ('company', 'year', 'month'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='emissionrollup',
+            index=models.Index(fields=['company', 'year', 'month'], name='activities__company_fe98b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emissionrollup',
+            index=models.Index(fields=['emission_source', 'location', 'year', 'month'], name='activities__emissio_936a20_idx'),
+        ),
+    ]
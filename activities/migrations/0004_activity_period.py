@@ -0,0 +1,46 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:35
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_period(apps, schema_editor):
+    for model_name in ('Activity', 'EmissionRollup'):
+        apps.get_model('activities', model_name).objects.update(period=F('year') * 100 + F('month'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0003_emissionrollup_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emissionrollup',
+            name='activities__company_fe98b2_idx',
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='period',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Año y mes de la actividad como AAAAMM, usado para filtrar rangos de fechas.', verbose_name='Periodo'),
+        ),
+        migrations.AddField(
+            model_name='emissionrollup',
+            name='period',
+            field=models.PositiveIntegerField(default=0, verbose_name='Periodo'),
+        ),
+        migrations.RunPython(fill_period, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['location', 'period'], name='activities__locatio_9f7a26_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['emission_source', 'period'], name='activities__emissio_d50bb9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='emissionrollup',
+            index=models.Index(fields=['company', 'period'], name='activities__company_3733a8_idx'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:38
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def fill_classification_keys(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    ActivityGasEmittedByFactor = apps.get_model('activities', 'ActivityGasEmittedByFactor')
+    Location = apps.get_model('companies', 'Location')
+    EmissionsSource = apps.get_model('companies', 'EmissionsSource')
+
+    sources = EmissionsSource.objects.filter(id=OuterRef('emission_source_id'))
+    Activity.objects.update(
+        company_id=Subquery(Location.objects.filter(id=OuterRef('location_id')).values('company_id')),
+        scope_id=Subquery(sources.values('group__category__scope_id')),
+        category_id=Subquery(sources.values('group__category_id')),
+        group_id=Subquery(sources.values('group_id')),
+        source_type_id=Subquery(sources.values('source_type_id')),
+    )
+    activities = Activity.objects.filter(id=OuterRef('activity_id'))
+    ActivityGasEmittedByFactor.objects.update(**{
+        field: Subquery(activities.values(field))
+        for field in ('company_id', 'scope_id', 'category_id', 'group_id', 'source_type_id')
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0031_delete_emissionssourcemonthentry'),
+        ('emissions', '0014_alter_emissionresult_month'),
+        ('emission_source_classifications', '0018_alter_commonequipment_normalized_name_and_more'),
+        ('activities', '0004_activity_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='category',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.isocategory'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='company',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='companies.company'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.emissionsourcegroup'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='scope',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.ghgscope'),
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='source_type',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emissions.sourcetype'),
+        ),
+        migrations.AddField(
+            model_name='activitygasemittedbyfactor',
+            name='category',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.isocategory'),
+        ),
+        migrations.AddField(
+            model_name='activitygasemittedbyfactor',
+            name='company',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='companies.company'),
+        ),
+        migrations.AddField(
+            model_name='activitygasemittedbyfactor',
+            name='group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.emissionsourcegroup'),
+        ),
+        migrations.AddField(
+            model_name='activitygasemittedbyfactor',
+            name='scope',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emission_source_classifications.ghgscope'),
+        ),
+        migrations.AddField(
+            model_name='activitygasemittedbyfactor',
+            name='source_type',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='emissions.sourcetype'),
+        ),
+        migrations.RunPython(fill_classification_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['company', 'period'], name='activities__company_4e2e1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['company', 'scope', 'period'], name='activities__company_392899_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['company', 'category', 'period'], name='activities__company_cfb3df_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['company', 'group', 'period'], name='activities__company_8966fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['company', 'source_type', 'period'], name='activities__company_bf6a55_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitygasemittedbyfactor',
+            index=models.Index(fields=['company', 'scope'], name='activities__company_43b188_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitygasemittedbyfactor',
+            index=models.Index(fields=['company', 'group'], name='activities__company_211674_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitygasemittedbyfactor',
+            index=models.Index(fields=['company', 'greenhouse_gas'], name='activities__company_3e4139_idx'),
+        ),
+    ]
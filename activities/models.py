@@ -1,10 +1,23 @@
+import zlib
+from functools import reduce
+from operator import or_
 from typing import List
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
 from django.utils.translation import gettext_lazy as _
 from emissions.models import EmissionFactor, GreenhouseGas
-from emissions.utils import calculate_emission, EmissionCalculation
+from emissions.utils import calculate_factor_emissions, EmissionCalculation
 from main.models import UnitOfMeasure
 
+# Sent after the stored emissions of some locations changed, with the `location_ids` argument and, when the rows
+# moved to other companies, the `company_ids` they belonged to
+emissions_changed = Signal()
+
+# First key of the postgres advisory locks taken by the rollup refreshes, the second key is a hash of the bucket
+ROLLUP_BUCKET_LOCK = 4_700_002
+
 
 class Activity(models.Model):
     """
@@ -19,12 +32,18 @@ class Activity(models.Model):
     - usage (float): The usage amount for the calculation.
     - month (str): The month of the emission calculation.
     - year (int): The year of the emission calculation.
+    - period (int): The year and month as a single comparable key (YYYYMM).
     - unit (ForeignKey): The unit of measurement for the usage.
     - total_co2e (float): The total CO₂e equivalent for the usage.
+    - company, scope, category, group, source_type (ForeignKey): Copies of the location company and the
+      emission source classification, to filter without joins.
     """
 
     results_by_component = []
 
+    # Rollup bucket of the activity as loaded from the database
+    _rollup_bucket = None
+
     MONTH_CHOICES = [
         (1, _('Enero')),
         (2, _('Febrero')),
@@ -69,6 +88,12 @@ class Activity(models.Model):
     date = models.DateField(_('Fecha'))
     month = models.PositiveSmallIntegerField(_('Mes'), choices=MONTH_CHOICES, default=1)
     year = models.PositiveSmallIntegerField(_('Año'), default=2024)
+    period = models.PositiveIntegerField(
+        _('Periodo'),
+        default=0,
+        editable=False,
+        help_text=_('Año y mes de la actividad como AAAAMM, usado para filtrar rangos de fechas.')
+    )
     unit = models.ForeignKey(
         UnitOfMeasure,
         related_name='+',
@@ -78,6 +103,115 @@ class Activity(models.Model):
 
     total_co2e = models.FloatField(_('Total CO₂e'), default=0)
 
+    # Keys copied from the location and emission source, kept by save() and backfill_activity_keys
+    company = models.ForeignKey(
+        'companies.Company', related_name='+', on_delete=models.CASCADE, blank=True, null=True, editable=False
+    )
+    scope = models.ForeignKey(
+        'emission_source_classifications.GHGScope',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    category = models.ForeignKey(
+        'emission_source_classifications.ISOCategory',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    group = models.ForeignKey(
+        'emission_source_classifications.EmissionSourceGroup',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    source_type = models.ForeignKey(
+        'emissions.SourceType', related_name='+', on_delete=models.SET_NULL, blank=True, null=True, editable=False
+    )
+
+    # Denormalized keys: field -> lookup from the activity
+    CLASSIFICATION_KEYS = {
+        'company_id': 'location__company_id',
+        'scope_id': 'emission_source__group__category__scope_id',
+        'category_id': 'emission_source__group__category_id',
+        'group_id': 'emission_source__group_id',
+        'source_type_id': 'emission_source__source_type_id',
+    }
+
+    @staticmethod
+    def fill_classification_keys(activities):
+        """
+        Copy the company and classification keys of the locations and emission sources into the
+        activities, with one query per model.
+        """
+        from companies.models import EmissionsSource, Location
+
+        companies = dict(Location.objects.filter(
+            id__in={activity.location_id for activity in activities}
+        ).values_list('id', 'company_id'))
+        sources = {
+            source['id']: source for source in EmissionsSource.objects.filter(
+                id__in={activity.emission_source_id for activity in activities}
+            ).values('id', 'group_id', 'group__category_id', 'group__category__scope_id', 'source_type_id')
+        }
+
+        for activity in activities:
+            source = sources.get(activity.emission_source_id, {})
+            activity.company_id = companies.get(activity.location_id)
+            activity.scope_id = source.get('group__category__scope_id')
+            activity.category_id = source.get('group__category_id')
+            activity.group_id = source.get('group_id')
+            activity.source_type_id = source.get('source_type_id')
+
+    @property
+    def classification_keys(self) -> dict:
+        return {field: getattr(self, field) for field in self.CLASSIFICATION_KEYS}
+
+    @staticmethod
+    def get_period(year, month) -> int:
+        return int(year) * 100 + int(month)
+
+    def save(self, *args, **kwargs):
+        self.period = self.get_period(self.year, self.month)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'year', 'month'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'period'}
+
+        if self.company_id is None or self._rollup_bucket != self.rollup_bucket:
+            self.fill_classification_keys([self])
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                    field.replace('_id', '') for field in self.CLASSIFICATION_KEYS
+                }
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rollup_bucket = instance.rollup_bucket
+        return instance
+
+    @property
+    def rollup_bucket(self):
+        """
+        Key of the EmissionRollup bucket the activity contributes to.
+        """
+        return self.__dict__.get('emission_source_id'), self.__dict__.get('location_id'), \
+            self.__dict__.get('year'), self.__dict__.get('month')
+
+    def refresh_rollup(self):
+        """
+        Recompute the rollup buckets the activity belonged to and belongs to now.
+        """
+        EmissionRollup.objects.refresh({self._rollup_bucket, self.rollup_bucket})
+        self._rollup_bucket = self.rollup_bucket
+
     def get_total_gas_emitted_value_by_gas(self, gas_id):
         try:
             gas = self.gases_emitted.get(greenhouse_gas__id=gas_id)
@@ -87,94 +221,158 @@ class Activity(models.Model):
 
     def calculate_gases_emitted(self) -> List[EmissionCalculation]:
         """
-        Calculate emissions for the activity.
+        Calculate emissions for the activity, the consumption is converted into the unit of the emission factor.
 
         Returns:
         - List[EmissionCalculation]: List of calculations by component.
         """
-        main_emission_factor = self.emission_source.emission_factor
-
-        self.results_by_component = []
-
-        main_component_result = calculate_emission(
-            name=main_emission_factor.main_component_name,
-            factor=main_emission_factor,
-            consumption=self.consumption,
-            application_percentage=main_emission_factor.application_percentage
+        self.results_by_component = calculate_factor_emissions(
+            self.emission_source.emission_factor_id,
+            self.consumption,
+            unit_id=self.unit_id
         )
-
-        self.results_by_component.append(main_component_result)
-
-        # Calculate emissions for each subcomponent
-        for component in main_emission_factor.components.all():
-            sub_component_result = calculate_emission(
-                name=component.component_name,
-                factor=component.component_factor,
-                consumption=self.consumption,
-                application_percentage=component.application_percentage
-            )
-            self.results_by_component.append(sub_component_result)
-
         return self.results_by_component
 
-    def save_gases_emitted(self):
+    @staticmethod
+    def _sync_gas_rows(model, current, rows, fields):
+        """
+        Update, create and delete the gas rows of the activity so they match `rows`.
+
+        :param model: ActivityGasEmitted or ActivityGasEmittedByFactor.
+        :param current: Lists of stored rows of the activity, keyed like `rows`. The first row of a key is kept,
+                        duplicates left by older saves are deleted with the rows of keys no longer calculated.
+        :param rows: Calculated unsaved rows keyed by their identity.
+        :param fields: Value fields compared between stored and calculated rows.
+        """
+        changed = []
+        created = []
+        for key, row in rows.items():
+            stored_rows = current.get(key)
+            if not stored_rows:
+                created.append(row)
+                continue
+            stored = stored_rows.pop(0)
+            if any(getattr(stored, field) != getattr(row, field) for field in fields):
+                for field in fields:
+                    setattr(stored, field, getattr(row, field))
+                changed.append(stored)
+
+        deleted = [stored.id for stored_rows in current.values() for stored in stored_rows]
+        if deleted:
+            model.objects.filter(id__in=deleted).delete()
+        if changed:
+            model.objects.bulk_update(changed, fields)
+        if created:
+            model.objects.bulk_create(created)
+
+    def save_gases_emitted(self, diff=False):
         """
         Save calculated gases emitted details for the activity.
+
+        All the rows are written in a single transaction with bulk queries.
+
+        :param diff: When true only the stored rows whose values changed are updated, new rows are created
+                     and stale ones deleted. Otherwise the previous records are replaced.
         """
         if not self.results_by_component:
             self.results_by_component = self.calculate_gases_emitted()
 
-        # Clear previous records
-        self.gases_emitted.all().delete()
-        self.gases_emitted_by_factor.all().delete()
+        # Resolve the gases of every component at once
+        acronyms = {gas_data['gas'] for component_data in self.results_by_component
+                    for gas_data in component_data['results']}
+        gases = {}
+        for greenhouse_gas in GreenhouseGas.objects.filter(acronym__in=acronyms).order_by('id'):
+            gases.setdefault(greenhouse_gas.acronym, greenhouse_gas)
 
+        gases_by_factor = {}
         total_emissions_by_gas = {}
         self.total_co2e = 0
 
-        # Save new records
         for component_data in self.results_by_component:
             emission_factor = component_data['emission_factor']
             for gas_data in component_data['results']:
-                greenhouse_gas = GreenhouseGas.objects.get(acronym=gas_data['gas'])
+                try:
+                    greenhouse_gas = gases[gas_data['gas']]
+                except KeyError:
+                    raise GreenhouseGas.DoesNotExist(f"Greenhouse gas '{gas_data['gas']}' does not exist.")
 
                 value = gas_data['value']
                 co2e = gas_data['co2e']
 
-                # Save gases emitted by factor and activity
-                ActivityGasEmittedByFactor.objects.create(
+                # Gases emitted by factor and activity, a factor may repeat as component
+                key = (emission_factor.id if emission_factor else None, greenhouse_gas.id)
+                occurrence = 0
+                while key + (occurrence,) in gases_by_factor:
+                    occurrence += 1
+                gases_by_factor[key + (occurrence,)] = ActivityGasEmittedByFactor(
                     activity=self,
                     emission_factor=emission_factor,
                     greenhouse_gas=greenhouse_gas,
                     value=value,
-                    co2e=co2e
+                    co2e=co2e,
+                    **self.classification_keys
                 )
 
                 # Track total emissions gas
-                if greenhouse_gas not in total_emissions_by_gas:
-                    total_emissions_by_gas[greenhouse_gas] = {
-                        'value': 0,
-                        'co2e': 0
-                    }
-                total_emissions_by_gas[greenhouse_gas]['value'] += value
-                total_emissions_by_gas[greenhouse_gas]['co2e'] += co2e
+                if greenhouse_gas.id not in total_emissions_by_gas:
+                    total_emissions_by_gas[greenhouse_gas.id] = ActivityGasEmitted(
+                        activity=self,
+                        greenhouse_gas=greenhouse_gas,
+                        value=0,
+                        co2e=0
+                    )
+                total_emissions_by_gas[greenhouse_gas.id].value += value
+                total_emissions_by_gas[greenhouse_gas.id].co2e += co2e
 
                 self.total_co2e += co2e
 
-        # Save gases emitted by activity
-        for greenhouse_gas, totals in total_emissions_by_gas.items():
-            ActivityGasEmitted.objects.create(
-                activity=self,
-                greenhouse_gas=greenhouse_gas,
-                value=totals['value'],
-                co2e=totals['co2e']
-            )
+        with transaction.atomic():
+            if diff:
+                current_by_factor = {}
+                for stored in self.gases_emitted_by_factor.order_by('id'):
+                    key = (stored.emission_factor_id, stored.greenhouse_gas_id)
+                    occurrence = 0
+                    while key + (occurrence,) in current_by_factor:
+                        occurrence += 1
+                    current_by_factor[key + (occurrence,)] = [stored]
+                current_by_gas = {}
+                for stored in self.gases_emitted.order_by('-id'):
+                    current_by_gas.setdefault(stored.greenhouse_gas_id, []).append(stored)
+                self._sync_gas_rows(
+                    ActivityGasEmittedByFactor,
+                    current_by_factor,
+                    gases_by_factor,
+                    ['value', 'co2e'] + list(self.CLASSIFICATION_KEYS)
+                )
+                self._sync_gas_rows(
+                    ActivityGasEmitted,
+                    current_by_gas,
+                    total_emissions_by_gas,
+                    ['value', 'co2e']
+                )
+            else:
+                # Replace previous records
+                self.gases_emitted.all().delete()
+                self.gases_emitted_by_factor.all().delete()
+                ActivityGasEmittedByFactor.objects.bulk_create(gases_by_factor.values())
+                ActivityGasEmitted.objects.bulk_create(total_emissions_by_gas.values())
 
-        self.save()
+            self.save(update_fields=['total_co2e'])
+            self.refresh_rollup()
 
     class Meta:
         ordering = ('date', 'name')
         verbose_name = _('Actividad')
         verbose_name_plural = _('Actividades')
+        indexes = [
+            models.Index(fields=['location', 'period']),
+            models.Index(fields=['emission_source', 'period']),
+            models.Index(fields=['company', 'period']),
+            models.Index(fields=['company', 'scope', 'period']),
+            models.Index(fields=['company', 'category', 'period']),
+            models.Index(fields=['company', 'group', 'period']),
+            models.Index(fields=['company', 'source_type', 'period']),
+        ]
 
     def __str__(self):
         return f'{self.name} ({self.date})'
@@ -249,10 +447,297 @@ class ActivityGasEmittedByFactor(models.Model):  # noqa
     value = models.FloatField(_('Cantidad Emitida'), default=0)
     co2e = models.FloatField(_('CO₂e Equivalente'), default=0)
 
+    # Copies of the activity keys (see Activity.CLASSIFICATION_KEYS)
+    company = models.ForeignKey(
+        'companies.Company', related_name='+', on_delete=models.CASCADE, blank=True, null=True, editable=False
+    )
+    scope = models.ForeignKey(
+        'emission_source_classifications.GHGScope',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    category = models.ForeignKey(
+        'emission_source_classifications.ISOCategory',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    group = models.ForeignKey(
+        'emission_source_classifications.EmissionSourceGroup',
+        related_name='+',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False
+    )
+    source_type = models.ForeignKey(
+        'emissions.SourceType', related_name='+', on_delete=models.SET_NULL, blank=True, null=True, editable=False
+    )
+
     class Meta:
         ordering = ('activity', 'emission_factor', 'greenhouse_gas')
         verbose_name = _('Gas Emitido por Actividad y Factor')
         verbose_name_plural = _('Gases Emitidos por Actividad y Factor')
+        indexes = [
+            models.Index(fields=['company', 'scope']),
+            models.Index(fields=['company', 'group']),
+            models.Index(fields=['company', 'greenhouse_gas']),
+        ]
 
     def __str__(self):
         return f'{self.greenhouse_gas.name} ({self.value})'
+
+
+class EmissionRollupManager(models.Manager):
+
+    def aggregate_facts(self, facts):
+        """
+        Sum ActivityGasEmittedByFactor rows by rollup key.
+
+        :param facts: ActivityGasEmittedByFactor queryset to aggregate.
+        """
+        return facts.filter(activity__location__isnull=False, activity__emission_source__isnull=False).values(
+            'emission_factor_id',
+            'greenhouse_gas_id',
+            company_id=F('activity__location__company_id'),
+            location_id=F('activity__location_id'),
+            emission_source_id=F('activity__emission_source_id'),
+            group_id=F('activity__emission_source__group_id'),
+            category_id=F('activity__emission_source__group__category_id'),
+            scope_id=F('activity__emission_source__group__category__scope_id'),
+            source_type_id=F('activity__emission_source__source_type_id'),
+            factor_type_id=F('activity__emission_source__factor_type_id'),
+            year=F('activity__year'),
+            month=F('activity__month'),
+            period=F('activity__period'),
+        ).annotate(
+            total_value=Sum('value'),
+            total_co2e=Sum('co2e')
+        ).order_by()
+
+    def build(self, facts):
+        """
+        Yield unsaved rollup rows for the given facts.
+        """
+        for row in self.aggregate_facts(facts).iterator():
+            row['value'] = row.pop('total_value') or 0
+            row['co2e'] = row.pop('total_co2e') or 0
+            yield self.model(**row)
+
+    def refresh(self, buckets, batch_size=100):
+        """
+        Recompute the rollup rows of the given buckets from the raw facts.
+
+        The buckets are locked until the transaction ends, so concurrent refreshes of a bucket run one after the
+        other instead of both deleting its rows and inserting their own copy.
+
+        :param buckets: Iterable of (emission_source_id, location_id, year, month) tuples.
+        :param batch_size: Number of buckets refreshed by query.
+        """
+        buckets = [bucket for bucket in buckets if bucket and None not in bucket]
+        with transaction.atomic():
+            self.lock_buckets(buckets)
+            for start in range(0, len(buckets), batch_size):
+                batch = buckets[start:start + batch_size]
+                self.filter(reduce(or_, [
+                    Q(emission_source_id=source_id, location_id=location_id, year=year, month=month)
+                    for source_id, location_id, year, month in batch
+                ])).delete()
+                facts = ActivityGasEmittedByFactor.objects.filter(reduce(or_, [
+                    Q(activity__emission_source_id=source_id, activity__location_id=location_id,
+                      activity__year=year, activity__month=month)
+                    for source_id, location_id, year, month in batch
+                ]))
+                self.bulk_create(self.build(facts), batch_size=1000)
+
+        if buckets:
+            emissions_changed.send(sender=self.model, location_ids={bucket[1] for bucket in buckets})
+
+    @staticmethod
+    def lock_buckets(buckets):
+        """
+        Take the transaction level advisory locks of the buckets, in order so two refreshes never deadlock.
+        """
+        keys = sorted({zlib.crc32(repr(tuple(bucket)).encode()) & 0x7fffffff for bucket in buckets})
+        with connection.cursor() as cursor:
+            for key in keys:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ROLLUP_BUCKET_LOCK, key])
+
+    def refresh_emission_source(self, emission_source_id):
+        """
+        Recompute every rollup row of an emission source.
+        """
+        self.filter(emission_source_id=emission_source_id).delete()
+        facts = ActivityGasEmittedByFactor.objects.filter(activity__emission_source_id=emission_source_id)
+        self.bulk_create(self.build(facts), batch_size=1000)
+
+
+class EmissionRollup(models.Model):
+    """
+    Precomputed monthly totals of the gases emitted by the activities.
+
+    Each row sums the ActivityGasEmittedByFactor records sharing the same company, location, emission
+    source, classification, emission factor, gas and period. The rows are kept current by the activities
+    (see Activity.refresh_rollup) and can be rebuilt with the `rebuild_emission_rollup` command.
+
+    Attributes:
+    - company (ForeignKey): The company owning the location of the activities.
+    - location (ForeignKey): The location of the activities.
+    - emission_source (ForeignKey): The emission source of the activities.
+    - group (ForeignKey): The emission source group.
+    - category (ForeignKey): The ISO category of the group.
+    - scope (ForeignKey): The GHG scope of the category.
+    - source_type (ForeignKey): The source type of the emission source.
+    - factor_type (ForeignKey): The factor type of the emission source.
+    - emission_factor (ForeignKey): The emission factor (main or component) of the gas rows.
+    - greenhouse_gas (ForeignKey): The greenhouse gas emitted.
+    - year (int): The year of the activities.
+    - month (int): The month of the activities.
+    - period (int): The year and month as YYYYMM.
+    - value (float): The sum of the gas values.
+    - co2e (float): The sum of the CO₂e equivalents.
+    """
+    company = models.ForeignKey('companies.Company', related_name='+', on_delete=models.CASCADE)
+    location = models.ForeignKey('companies.Location', related_name='+', on_delete=models.CASCADE)
+    emission_source = models.ForeignKey('companies.EmissionsSource', related_name='+', on_delete=models.CASCADE)
+    group = models.ForeignKey(
+        'emission_source_classifications.EmissionSourceGroup',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    category = models.ForeignKey(
+        'emission_source_classifications.ISOCategory',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    scope = models.ForeignKey(
+        'emission_source_classifications.GHGScope',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    source_type = models.ForeignKey(
+        'emissions.SourceType',
+        related_name='+',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+    factor_type = models.ForeignKey('emissions.FactorType', related_name='+', on_delete=models.CASCADE)
+    emission_factor = models.ForeignKey(
+        EmissionFactor,
+        related_name='+',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True
+    )
+    greenhouse_gas = models.ForeignKey(GreenhouseGas, related_name='+', on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField(_('Año'))
+    month = models.PositiveSmallIntegerField(_('Mes'), choices=Activity.MONTH_CHOICES)
+    period = models.PositiveIntegerField(_('Periodo'), default=0)
+    value = models.FloatField(_('Cantidad Emitida'), default=0)
+    co2e = models.FloatField(_('CO₂e Equivalente'), default=0)
+
+    objects = EmissionRollupManager()
+
+    class Meta:
+        ordering = ('company', 'year', 'month')
+        verbose_name = _('Consolidado Mensual de Emisiones')
+        verbose_name_plural = _('Consolidados Mensuales de Emisiones')
+        indexes = [
+            models.Index(fields=['company', 'period']),
+            models.Index(fields=['emission_source', 'location', 'year', 'month']),
+        ]
+
+    def __str__(self):
+        return f'{self.emission_source_id} {self.year}-{self.month} ({self.co2e})'
+
+
+@receiver(post_save, sender=Activity)
+def refresh_moved_activity_rollup(sender, instance: Activity, created, raw=False, update_fields=None, **kwargs):
+    # Activities that change bucket without recalculating their gases, save_gases_emitted refreshes the rollup
+    # itself after saving the total
+    if update_fields is not None and set(update_fields) == {'total_co2e'}:
+        return
+    if not raw and not created and instance._rollup_bucket != instance.rollup_bucket:
+        instance.refresh_rollup()
+
+
+@receiver(post_delete, sender=Activity)
+def refresh_deleted_activity_rollup(sender, instance: Activity, **kwargs):
+    EmissionRollup.objects.refresh({instance._rollup_bucket, instance.rollup_bucket})
+
+
+@receiver(post_save, sender='companies.EmissionsSource')
+def refresh_reclassified_source_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    outdated = EmissionRollup.objects.filter(emission_source_id=instance.id).exclude(
+        group_id=instance.group_id,
+        source_type_id=instance.source_type_id,
+        factor_type_id=instance.factor_type_id
+    )
+    if outdated.exists():
+        EmissionRollup.objects.refresh_emission_source(instance.id)
+
+    # Denormalized keys of the activities and their gas rows
+    source_keys = {
+        'group_id': instance.group_id,
+        'category_id': instance.group.category_id,
+        'scope_id': instance.group.category.scope_id,
+        'source_type_id': instance.source_type_id,
+    }
+    activities = Activity.objects.filter(emission_source_id=instance.id)
+    if activities.exclude(**source_keys).exists():
+        activities.update(**source_keys)
+        ActivityGasEmittedByFactor.objects.filter(activity__emission_source_id=instance.id).update(**source_keys)
+
+
+def update_classification_keys(field, value, keys):
+    """
+    Copy new denormalized keys into the activities, gas rows and rollup rows of a location, group or category
+    after the row they were copied from changed.
+
+    :param field: Activity field of the edited row, 'location_id', 'group_id' or 'category_id'.
+    :param value: Id of the edited row.
+    :param keys: New values of the keys, e.g. ``{'company_id': 2}``.
+    """
+    stale = Activity.objects.filter(**{field: value}).exclude(**keys)
+    changed = set(stale.order_by().values_list('location_id', 'company_id').distinct())
+    if not changed:
+        return
+
+    gas_field = field if field in Activity.CLASSIFICATION_KEYS else f'activity__{field}'
+    with transaction.atomic():
+        ActivityGasEmittedByFactor.objects.filter(**{gas_field: value}).exclude(**keys).update(**keys)
+        EmissionRollup.objects.filter(**{field: value}).exclude(**keys).update(**keys)
+        stale.update(**keys)
+    emissions_changed.send(
+        sender=Activity,
+        location_ids={location_id for location_id, _company_id in changed},
+        company_ids={company_id for _location_id, company_id in changed if company_id is not None}
+    )
+
+
+@receiver(post_save, sender='companies.Location')
+def update_location_company_keys(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        update_classification_keys('location_id', instance.id, {'company_id': instance.company_id})
+
+
+@receiver(post_save, sender='emission_source_classifications.EmissionSourceGroup')
+def update_group_category_keys(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        update_classification_keys(
+            'group_id', instance.id, {'category_id': instance.category_id, 'scope_id': instance.category.scope_id}
+        )
+
+
+@receiver(post_save, sender='emission_source_classifications.ISOCategory')
+def update_category_scope_keys(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        update_classification_keys('category_id', instance.id, {'scope_id': instance.scope_id})
@@ -0,0 +1,150 @@
+from typing import Iterable, Optional
+import numpy as np
+from django.db import transaction
+from activities.models import Activity, ActivityGasEmitted, ActivityGasEmittedByFactor, EmissionRollup
+from emissions.cache import get_compiled_factor
+from emissions.models import EmissionFactorComponent, GreenhouseGasEmission
+from emissions.utils import FactorMatrix, normalize_factor_consumption
+
+
+def affected_factor_ids(factor_ids: Iterable[int] = (), gas_ids: Iterable[int] = ()) -> set:
+    """
+    Main emission factors whose calculation depends on the given factors or gases.
+
+    A factor is affected when it is one of `factor_ids`, has an emission of one of `gas_ids`, or uses any of
+    those factors as a component.
+
+    :param factor_ids: Ids of the edited emission factors.
+    :param gas_ids: Ids of the edited greenhouse gases.
+    """
+    changed = set(factor_ids)
+    if gas_ids:
+        changed.update(GreenhouseGasEmission.objects.filter(
+            greenhouse_gas_id__in=list(gas_ids)
+        ).values_list('emission_factor_id', flat=True))
+
+    parents = EmissionFactorComponent.objects.filter(
+        component_factor_id__in=list(changed)
+    ).values_list('emission_factor_id', flat=True)
+    return changed | set(parents)
+
+
+class ActivityRecalculation(object):
+    """
+    Recompute the stored gases and total CO₂e of the activities affected by factor or gas changes.
+
+    Activities are processed by ascending id in chunks. Each chunk is calculated with one matrix product
+    per main emission factor and written back in a single transaction with bulk queries, so an interrupted
+    run can be resumed from the last processed id.
+    """
+
+    def __init__(self, factor_ids: Iterable[int] = (), gas_ids: Iterable[int] = (), recalculate_all=False,
+                 chunk_size=2000):
+        self.chunk_size = chunk_size
+        self.activities = Activity.objects.filter(
+            emission_source__isnull=False,
+            emission_source__emission_factor__isnull=False
+        )
+        if not recalculate_all:
+            self.activities = self.activities.filter(
+                emission_source__emission_factor_id__in=affected_factor_ids(factor_ids, gas_ids)
+            )
+        self.matrices = {}
+
+    def get_matrix(self, factor_id) -> FactorMatrix:
+        if factor_id not in self.matrices:
+            self.matrices[factor_id] = FactorMatrix(get_compiled_factor(factor_id))
+        return self.matrices[factor_id]
+
+    def count(self, after_id: Optional[int] = None) -> int:
+        activities = self.activities
+        if after_id is not None:
+            activities = activities.filter(id__gt=after_id)
+        return activities.count()
+
+    def chunks(self, after_id: Optional[int] = None):
+        """
+        Yield the pending activities as lists of value rows, with the consumption in the unit of the factor.
+        """
+        last_id = after_id or 0
+        while True:
+            rows = list(self.activities.filter(id__gt=last_id).order_by('id').values_list(
+                'id', 'consumption', 'emission_source__emission_factor_id',
+                'emission_source_id', 'location_id', 'year', 'month', *Activity.CLASSIFICATION_KEYS, 'unit_id'
+            )[:self.chunk_size])
+            if not rows:
+                return
+            consumption = normalize_factor_consumption(
+                [row[1] for row in rows], [row[-1] for row in rows], [row[2] for row in rows]
+            )
+            yield [(row[0], float(value), *row[2:-1]) for row, value in zip(rows, consumption)]
+            last_id = rows[-1][0]
+
+    def recalculate_chunk(self, rows) -> int:
+        """
+        Recalculate and store one chunk of activities, return the last processed id.
+
+        :param rows: Tuples of (id, consumption in the factor unit, main emission factor id, emission source id, location id, year,
+                     month) followed by the values of Activity.CLASSIFICATION_KEYS.
+        """
+        activities = []
+        gases_by_factor = []
+        gases_emitted = []
+
+        by_factor = {}
+        for row in rows:
+            by_factor.setdefault(row[2], []).append(row)
+
+        for factor_id, factor_rows in by_factor.items():
+            matrix = self.get_matrix(factor_id)
+            consumption = np.array([row[1] for row in factor_rows], dtype=float)
+            co2e = matrix.co2e(consumption)
+            co2e_by_gas = co2e @ matrix.gas_matrix
+            totals = co2e.sum(axis=1)
+
+            for index, row in enumerate(factor_rows):
+                activity_id = row[0]
+                keys = dict(zip(Activity.CLASSIFICATION_KEYS, row[7:]))
+                activities.append(Activity(id=activity_id, total_co2e=float(totals[index])))
+                for column, gas in enumerate(matrix.columns):
+                    gases_by_factor.append(ActivityGasEmittedByFactor(
+                        activity_id=activity_id,
+                        emission_factor_id=gas['factor_id'],
+                        greenhouse_gas_id=gas['gas_id'],
+                        value=gas['value'],
+                        co2e=float(co2e[index, column]),
+                        **keys
+                    ))
+                for position, gas_id in enumerate(matrix.gas_ids):
+                    gases_emitted.append(ActivityGasEmitted(
+                        activity_id=activity_id,
+                        greenhouse_gas_id=gas_id,
+                        value=float(matrix.gas_values[position]),
+                        co2e=float(co2e_by_gas[index, position])
+                    ))
+
+        activity_ids = [row[0] for row in rows]
+        with transaction.atomic():
+            ActivityGasEmittedByFactor.objects.filter(activity_id__in=activity_ids).delete()
+            ActivityGasEmitted.objects.filter(activity_id__in=activity_ids).delete()
+            ActivityGasEmittedByFactor.objects.bulk_create(gases_by_factor, batch_size=1000)
+            ActivityGasEmitted.objects.bulk_create(gases_emitted, batch_size=1000)
+            Activity.objects.bulk_update(activities, ['total_co2e'], batch_size=1000)
+            EmissionRollup.objects.refresh({row[3:7] for row in rows})
+
+        return activity_ids[-1]
+
+    def run(self, after_id: Optional[int] = None, progress=None):
+        """
+        Recalculate every pending activity.
+
+        :param after_id: Resume after this activity id.
+        :param progress: Callable receiving (processed, last_id) after each chunk.
+        """
+        processed = 0
+        for rows in self.chunks(after_id):
+            last_id = self.recalculate_chunk(rows)
+            processed += len(rows)
+            if progress is not None:
+                progress(processed, last_id)
+        return processed
@@ -1,8 +1,9 @@
 from django.contrib.contenttypes.models import ContentType
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from documents.models import Document
-from documents.serializer import BaseDocumentSerializer
+from documents.serializer import BaseDocumentSerializer, DocumentListSerializer
 from .models import Activity, ActivityGasEmitted, ActivityGasEmittedByFactor
 
 
@@ -26,6 +27,73 @@ class ActivityListSerializer(serializers.ModelSerializer):
         read_only_fields = ['total_co2e']
 
 
+class ActivityImportRowSerializer(serializers.ModelSerializer):
+    """
+    Validates one row of an activity import, references are resolved through the import lookups
+    (see activities.imports.ImportLookups) given in the context.
+    """
+    emission_source = serializers.CharField()
+    location = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    unit = serializers.CharField()
+
+    class Meta:
+        model = Activity
+        fields = ('emission_source', 'location', 'name', 'description', 'consumption', 'date', 'month', 'year',
+                  'unit')
+
+    def validate_emission_source(self, value):
+        lookups = self.context['lookups']
+        source = lookups.emission_source(value)
+        if source is None:
+            raise serializers.ValidationError(_('La fuente de emisión no existe.'))
+        if source == lookups.AMBIGUOUS:
+            raise serializers.ValidationError(_('Hay varias fuentes de emisión con ese código o nombre, usa su id.'))
+        if source[2] is None:
+            raise serializers.ValidationError(_('La fuente de emisión no tiene factor de emisión.'))
+        return source
+
+    def validate_location(self, value):
+        if not value:
+            return None
+        lookups = self.context['lookups']
+        location_id = lookups.location(value)
+        if location_id is None:
+            raise serializers.ValidationError(_('La ubicación no existe.'))
+        if location_id == lookups.AMBIGUOUS:
+            raise serializers.ValidationError(_('Hay varias ubicaciones con ese nombre, usa su id.'))
+        return location_id
+
+    def validate_unit(self, value):
+        unit_id = self.context['lookups'].unit(value)
+        if unit_id is None:
+            raise serializers.ValidationError(_('La unidad de medida no existe.'))
+        return unit_id
+
+    def validate(self, attrs):
+        source_location_id = attrs['emission_source'][1]
+        if attrs.get('location') and source_location_id and attrs['location'] != source_location_id:
+            raise serializers.ValidationError({'location': _('La fuente de emisión no pertenece a la ubicación.')})
+        # Rows without month or year belong to the period of their date, not to the model defaults
+        attrs.setdefault('month', attrs['date'].month)
+        attrs.setdefault('year', attrs['date'].year)
+        return attrs
+
+
+class ActivityImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(('.csv', '.xlsx')):
+            raise serializers.ValidationError(_('El archivo debe ser CSV o XLSX.'))
+        return value
+
+
+class ActivityImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
 class ActivitySerializer(serializers.ModelSerializer):
     documents = serializers.ListField(
         child=serializers.FileField(allow_empty_file=False, use_url=False),
@@ -55,7 +123,7 @@ class ActivitySerializer(serializers.ModelSerializer):
         documents_data = validated_data.pop('documents', [])
         user = self.context['request'].user
         instance = super().update(instance, validated_data)
-        instance.save_gases_emitted()
+        instance.save_gases_emitted(diff=True)
         self.save_documents(instance, documents_data, user)
         return instance
 
@@ -78,6 +146,7 @@ class ActivityResponseSerializer(BaseDocumentSerializer):
 
     class Meta:
         model = Activity
+        list_serializer_class = DocumentListSerializer
         fields = (
             'id',
             'emission_source',
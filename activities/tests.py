@@ -1,3 +1,108 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from activities import models as activity_models
+from companies.models import Location
+from emission_source_classifications.models import EmissionSourceGroup, ISOCategory
+
+
+class ClassificationKeysTest(SimpleTestCase):
+    """
+    Denormalized keys of the activities after the location, group or category they were copied from changes.
+    """
+
+    def setUp(self):
+        self.managers = {}
+        for model in (activity_models.Activity, activity_models.ActivityGasEmittedByFactor,
+                      activity_models.EmissionRollup):
+            patcher = mock.patch.object(model, 'objects')
+            self.managers[model.__name__] = patcher.start()
+            self.addCleanup(patcher.stop)
+        for name in ('transaction', 'emissions_changed'):
+            patcher = mock.patch.object(activity_models, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+        self.stale = self.managers['Activity'].filter.return_value.exclude.return_value
+        self.stale.order_by.return_value.values_list.return_value.distinct.return_value = [(3, 1), (5, 1)]
+
+    def assert_updated(self, activity_lookup, gas_lookup, keys):
+        self.managers['Activity'].filter.assert_called_with(**activity_lookup)
+        self.managers['Activity'].filter.return_value.exclude.assert_called_with(**keys)
+        self.stale.update.assert_called_once_with(**keys)
+        for name, lookup in (('ActivityGasEmittedByFactor', gas_lookup), ('EmissionRollup', activity_lookup)):
+            manager = self.managers[name]
+            manager.filter.assert_called_once_with(**lookup)
+            manager.filter.return_value.exclude.assert_called_once_with(**keys)
+            manager.filter.return_value.exclude.return_value.update.assert_called_once_with(**keys)
+
+    def test_location_moved_to_another_company(self):
+        activity_models.update_location_company_keys(
+            sender=Location, instance=Location(id=3, company_id=2), created=False
+        )
+
+        self.assert_updated({'location_id': 3}, {'activity__location_id': 3}, {'company_id': 2})
+        self.emissions_changed.send.assert_called_once_with(
+            sender=activity_models.Activity, location_ids={3, 5}, company_ids={1}
+        )
+
+    def test_group_moved_to_another_category(self):
+        group = EmissionSourceGroup(id=4, category=ISOCategory(id=7, scope_id=2))
+        activity_models.update_group_category_keys(sender=EmissionSourceGroup, instance=group, created=False)
+
+        self.assert_updated({'group_id': 4}, {'group_id': 4}, {'category_id': 7, 'scope_id': 2})
+
+    def test_category_moved_to_another_scope(self):
+        activity_models.update_category_scope_keys(
+            sender=ISOCategory, instance=ISOCategory(id=7, scope_id=3), created=False
+        )
+
+        self.assert_updated({'category_id': 7}, {'category_id': 7}, {'scope_id': 3})
+
+    def test_current_keys_are_not_written(self):
+        self.stale.order_by.return_value.values_list.return_value.distinct.return_value = []
+        activity_models.update_category_scope_keys(
+            sender=ISOCategory, instance=ISOCategory(id=7, scope_id=3), created=False
+        )
+
+        self.stale.update.assert_not_called()
+        self.managers['EmissionRollup'].filter.assert_not_called()
+        self.emissions_changed.send.assert_not_called()
+
+    def test_new_and_loaded_rows_are_skipped(self):
+        activity_models.update_location_company_keys(
+            sender=Location, instance=Location(id=3, company_id=2), created=True
+        )
+        activity_models.update_location_company_keys(
+            sender=Location, instance=Location(id=3, company_id=2), created=False, raw=True
+        )
+
+        self.managers['Activity'].filter.assert_not_called()
+
+
+class MovedActivityRollupTest(SimpleTestCase):
+    """
+    Rollup refreshes of the activities saved outside save_gases_emitted.
+    """
+
+    def setUp(self):
+        patcher = mock.patch.object(activity_models.Activity, 'refresh_rollup')
+        self.refresh_rollup = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_moved_activity_is_refreshed(self):
+        activity = activity_models.Activity(emission_source_id=1, location_id=2, year=2023, month=4)
+        activity._rollup_bucket = (1, 2, 2023, 3)
+        activity_models.refresh_moved_activity_rollup(sender=activity_models.Activity, instance=activity, created=False)
+
+        self.refresh_rollup.assert_called_once_with()
+
+    def test_saved_total_is_not_refreshed_twice(self):
+        # New activity saving its total from save_gases_emitted, which refreshes the rollup afterwards
+        activity = activity_models.Activity(emission_source_id=1, location_id=2, year=2023, month=4)
+        activity_models.refresh_moved_activity_rollup(
+            sender=activity_models.Activity, instance=activity, created=False, update_fields=frozenset(['total_co2e'])
+        )
+
+        self.refresh_rollup.assert_not_called()
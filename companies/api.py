@@ -2,20 +2,26 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.mixins import DestroyModelMixin
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.generics import GenericAPIView
 from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
 from django.db import models
 from activities.api import CustomPagination
+from activities.models import Activity
+from companies.cache import get_dashboard_data, dashboard_cache_stats
 from companies.models import Company, Brand, Member, Location, EmissionsSource
 from companies.quantification import DataAnalysis
 from companies.serializers import CompanySerializer, BrandSerializer, MemberSerializer, LocationSerializer, \
-    EmissionsSourceSerializer, CompanyLogoSerializer, DashboardDataSerializer, EmissionsSourceRequestSerializer
+    EmissionsSourceSerializer, CompanyLogoSerializer, DashboardDataSerializer, EmissionsSourceRequestSerializer, \
+    DashboardActivitySerializer, DashboardCacheStatsSerializer, TimeSeriesPointSerializer
 from django_filters import rest_framework as filters
 from django.utils.translation import gettext_lazy as _
-from companies.utils import generate_schema_for_emission_source
+from companies.utils import generate_schema_for_emission_source, stream_csv, stream_xlsx
 from main.contrib.mixins import UpdateModelMixinWithRequest
 
 
@@ -250,48 +256,142 @@ class EmissionsSourceViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+DASHBOARD_PARAMETERS = [
+    OpenApiParameter(name='company', type=OpenApiTypes.INT, description=_('Id de la Compañía'), required=True),
+    OpenApiParameter(name='location', type=OpenApiTypes.INT, description=_('Id de la sede')),
+    OpenApiParameter(name='scope', type=OpenApiTypes.INT, description='Id del Alcance'),
+    OpenApiParameter(name='category', type=OpenApiTypes.INT, description='Id del Categoría'),
+    OpenApiParameter(name='group', type=OpenApiTypes.INT, description='Id Grupo'),
+    OpenApiParameter(name='emission_source', type=OpenApiTypes.INT, description='Fuente de Emissión'),
+    OpenApiParameter(name='source_type', type=OpenApiTypes.INT, description='Tipo de Fuente e emisión'),
+    OpenApiParameter(name='factor_type', type=OpenApiTypes.INT, description='Tipos de Factores de emisión'),
+    OpenApiParameter(name='factor', type=OpenApiTypes.INT, description='Factores de emisión'),
+    OpenApiParameter(name='initial_date', type=OpenApiTypes.DATE, description='Fecha Inicial'),
+    OpenApiParameter(name='end_date', type=OpenApiTypes.DATE, description='Fecha Final'),
+    OpenApiParameter(name='year', type=OpenApiTypes.INT, description='Año'),
+    OpenApiParameter(name='month', type=OpenApiTypes.DATE, description='Mes'),
+]
+
+
+def get_data_analysis(request) -> DataAnalysis:
+    """
+    DataAnalysis for the dashboard filters of the request query string.
+    """
+    return DataAnalysis(
+        company_id=request.query_params.get('company'),
+        location_id=request.query_params.get('location', None),
+        category_id=request.query_params.get('category', None),
+        scope_id=request.query_params.get('scope', None),
+        group_id=request.query_params.get('group', None),
+        source_type_id=request.query_params.get('source_type', None),
+        emission_source_id=request.query_params.get('emission_source', None),
+        factor_type_id=request.query_params.get('factor_type', None),
+        factor_id=request.query_params.get('factor', None),
+        initial_date=request.query_params.get('initial_date', None),
+        end_date=request.query_params.get('end_date', None),
+        year=request.query_params.get('year', None),
+        month=request.query_params.get('month', None),
+    )
+
+
 @extend_schema(tags=['Dashboard'])
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
 
     @extend_schema(
         summary=_('Recuperar los datos del dashboard para una sede especifica'),
-        parameters=[
-            OpenApiParameter(name='company', type=OpenApiTypes.INT, description=_('Id de la Compañía'), required=True),
-            OpenApiParameter(name='location', type=OpenApiTypes.INT, description=_('Id de la sede')),
-            OpenApiParameter(name='scope', type=OpenApiTypes.INT, description='Id del Alcance'),
-            OpenApiParameter(name='category', type=OpenApiTypes.INT, description='Id del Categoría'),
-            OpenApiParameter(name='group', type=OpenApiTypes.INT, description='Id Grupo'),
-            OpenApiParameter(name='emission_source', type=OpenApiTypes.INT, description='Fuente de Emissión'),
-            OpenApiParameter(name='source_type', type=OpenApiTypes.INT, description='Tipo de Fuente e emisión'),
-            OpenApiParameter(name='factor_type', type=OpenApiTypes.INT, description='Tipos de Factores de emisión'),
-            OpenApiParameter(name='factor', type=OpenApiTypes.INT, description='Factores de emisión'),
-            OpenApiParameter(name='initial_date', type=OpenApiTypes.DATE, description='Fecha Inicial'),
-            OpenApiParameter(name='end_date', type=OpenApiTypes.DATE, description='Fecha Final'),
-            OpenApiParameter(name='year', type=OpenApiTypes.INT, description='Año'),
-            OpenApiParameter(name='month', type=OpenApiTypes.DATE, description='Mes'),
+        parameters=DASHBOARD_PARAMETERS,
+        responses={200: DashboardDataSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        def compute():
+            data_analysis = get_data_analysis(request)
+            data_analysis.calculate()
+            return DashboardDataSerializer(data_analysis.data).data
+
+        return Response(get_dashboard_data(request.query_params, compute))
+
 
+@extend_schema(tags=['Dashboard'])
+class DashboardTimeSeriesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary=_('Serie mensual de emisiones con variación mensual e interanual'),
+        parameters=DASHBOARD_PARAMETERS + [
+            OpenApiParameter(name='dimension', type=OpenApiTypes.STR,
+                             enum=list(DataAnalysis.TIME_SERIES_DIMENSIONS),
+                             description=_('Dimensión de agrupación (gas por defecto)')),
         ],
-        responses={200: DashboardDataSerializer}
+        responses={200: TimeSeriesPointSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        data_analysis = DataAnalysis(
-            company_id=request.query_params.get('company'),
-            location_id=request.query_params.get('location', None),
-            category_id=request.query_params.get('category', None),
-            scope_id=request.query_params.get('scope', None),
-            group_id=request.query_params.get('group', None),
-            source_type_id=request.query_params.get('source_type', None),
-            emission_source_id=request.query_params.get('emission_source', None),
-            factor_type_id=request.query_params.get('factor_type', None),
-            factor_id=request.query_params.get('factor', None),
-            initial_date=request.query_params.get('initial_date', None),
-            end_date=request.query_params.get('end_date', None),
-            year=request.query_params.get('year', None),
-            month=request.query_params.get('month', None),
+        dimension = request.query_params.get('dimension', 'gas')
+        if dimension not in DataAnalysis.TIME_SERIES_DIMENSIONS:
+            return Response(
+                {'dimension': _('Dimensión no válida.')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        series = get_data_analysis(request).time_series(dimension)
+        return Response(TimeSeriesPointSerializer(series, many=True).data)
 
-        )
-        data_analysis.calculate()
-        serializer = DashboardDataSerializer(data_analysis.data)
-        return Response(serializer.data)
 
+@extend_schema(tags=['Dashboard'])
+class DashboardCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        summary=_('Contadores de aciertos y fallos del cache del dashboard'),
+        responses={200: DashboardCacheStatsSerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(DashboardCacheStatsSerializer(dashboard_cache_stats()).data)
+
+
+@extend_schema(tags=['Dashboard'])
+class DashboardActivitiesView(GenericAPIView):
+    """
+    Activities matching the dashboard filters, paginated or exported as CSV/XLSX.
+    """
+    permission_classes = [IsAuthenticated]
+    pagination_class = CustomPagination
+    # workaround to remove warning: Failed to obtain model through view's queryset due to raised exception
+    queryset = Activity.objects.none()
+
+    @extend_schema(
+        summary=_('Recuperar las actividades del dashboard'),
+        parameters=DASHBOARD_PARAMETERS + [
+            OpenApiParameter(name='export', type=OpenApiTypes.STR, enum=['csv', 'xlsx'],
+                             description=_('Exporta todas las actividades filtradas')),
+        ],
+        responses={200: DashboardActivitySerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        # Only the activities of the companies the user is a member of, for the list and the exports
+        company = request.query_params.get('company', '')
+        company_ids = Member.objects.filter(user=request.user).values_list('company_id', flat=True)
+        if not company.isdigit() or not company_ids.filter(company_id=company).exists():
+            raise NotFound(_('No se ha encontrado la compañía.'))
+
+        data_analysis = get_data_analysis(request)
+        rows = data_analysis.activity_rows()
+
+        export = request.query_params.get('export')
+        if export in ('csv', 'xlsx'):
+            # Server-side cursor over the whole filtered set
+            rows = rows.iterator(chunk_size=2000)
+            header = list(DataAnalysis.ACTIVITY_FIELDS)
+            if export == 'csv':
+                response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+            else:
+                response = StreamingHttpResponse(
+                    stream_xlsx(header, rows),
+                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                )
+            response['Content-Disposition'] = f'attachment; filename=activities.{export}'
+            return response
+
+        page = self.paginate_queryset(rows)
+        records = [DataAnalysis.activity_record(row) for row in page]
+        return self.get_paginated_response(DashboardActivitySerializer(records, many=True).data)
@@ -0,0 +1,81 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from emissions.cache import FACTOR_CACHE
+from main.cache import get_cache_version, bump_cache_version, increment_counter, get_counter
+
+# Query parameters of the dashboard that select its data
+DASHBOARD_PARAMS = ('company', 'location', 'scope', 'category', 'group', 'emission_source', 'source_type',
+                    'factor_type', 'factor', 'initial_date', 'end_date', 'year', 'month')
+
+HITS_KEY = 'pl4n3t:dashboard:hits'
+MISSES_KEY = 'pl4n3t:dashboard:misses'
+
+
+def _company_cache(company_id):
+    return f'dashboard:{company_id}'
+
+
+def normalize_dashboard_params(query_params) -> dict:
+    """
+    Keep the dashboard parameters with a value, stripped, so equivalent requests share an entry.
+    """
+    params = {}
+    for name in DASHBOARD_PARAMS:
+        value = (query_params.get(name) or '').strip()
+        if value:
+            params[name] = value
+    return params
+
+
+def dashboard_cache_key(company_id, params: dict) -> str:
+    """
+    Cache key of a dashboard: the company and factor cache versions plus a hash of the normalized parameters.
+    """
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    company_version = get_cache_version(_company_cache(company_id))
+    factor_version = get_cache_version(FACTOR_CACHE)
+    return f'pl4n3t:dashboard:{company_id}:{company_version}:{factor_version}:{digest}'
+
+
+def get_dashboard_data(query_params, compute):
+    """
+    Return the cached dashboard data of the request parameters, calling `compute()` on a miss.
+
+    :param query_params: The request query parameters.
+    :param compute: Callable returning the serialized dashboard data.
+    """
+    params = normalize_dashboard_params(query_params)
+    key = dashboard_cache_key(params.get('company'), params)
+
+    data = cache.get(key)
+    if data is not None:
+        increment_counter(HITS_KEY)
+        return data
+
+    increment_counter(MISSES_KEY)
+    data = compute()
+    cache.set(key, data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate_company_dashboard(company_id):
+    """
+    Discard every cached dashboard of a company once the current transaction commits, so a dashboard computed
+    before the commit is not cached under the new version. The stale entries expire with their timeout.
+    """
+    if company_id is not None:
+        transaction.on_commit(lambda: bump_cache_version(_company_cache(company_id)))
+
+
+def dashboard_cache_stats() -> dict:
+    hits = get_counter(HITS_KEY)
+    misses = get_counter(MISSES_KEY)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+    }
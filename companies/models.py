@@ -4,15 +4,17 @@ from urllib.parse import urljoin
 from django.contrib.gis.db import models
 from django.contrib.sites.models import Site
 from django.core.mail import send_mail
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.html import strip_tags
 from accounts.models import User
-from emission_source_classifications.models import EmissionSourceGroup, CommonActivity, CommonEquipment, CommonProduct, \
-    create_or_get_common_data, Investment
+from activities.models import Activity, emissions_changed
+from companies.cache import invalidate_company_dashboard
+from emission_source_classifications.harvest import queue_common_data
+from emission_source_classifications.models import EmissionSourceGroup
 from emissions.models import SourceType, EmissionFactor, FactorType
 from django.utils.translation import gettext_lazy as _
 from main.models import City, UnitOfMeasure, EconomicSector, IndustryType, LocationType, Country, State
@@ -527,6 +529,20 @@ class EmissionsSource(models.Model):
     def group_name(self) -> str:
         return self.group.name
 
+    @property
+    def common_names(self):
+        """
+        Values harvested into the common data models (see create_common_data).
+        """
+        return self.__dict__.get('activity_name'), self.__dict__.get('equipment_name'), \
+            self.__dict__.get('product_name'), self.__dict__.get('investment_type'), self.__dict__.get('group_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._common_names = instance.common_names
+        return instance
+
     class Meta:
         ordering = ('name',)
         verbose_name = _('Fuente de Emisión')
@@ -557,10 +573,11 @@ def create_free_membership(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=EmissionsSource)
 def create_common_data(sender, instance: EmissionsSource, created, **kwargs):
-    create_or_get_common_data(CommonActivity, 'name', instance.activity_name)
-    create_or_get_common_data(CommonEquipment, 'name', instance.equipment_name, instance.group)
-    create_or_get_common_data(CommonProduct, 'name', instance.product_name)
-    create_or_get_common_data(Investment, 'name', instance.investment_type)
+    # Saves that keep the names, most edits, do not touch the common data
+    if not created and getattr(instance, '_common_names', None) == instance.common_names:
+        return
+    queue_common_data(instance)
+    instance._common_names = instance.common_names
 
 
 @receiver(post_save, sender=Member)
@@ -571,3 +588,26 @@ def send_invitation(sender, instance: Member, created, **kwargs):
             logger.debug(f'Invitation email triggered for member ID: {instance.id}')
         except Exception as e:
             logger.error(f'Error sending invitation email: {e}')
+
+
+@receiver(emissions_changed)
+def invalidate_changed_dashboards(sender, location_ids, company_ids=(), **kwargs):
+    location_companies = Location.objects.filter(id__in=location_ids).values_list('company_id', flat=True)
+    for company_id in set(company_ids) | set(location_companies):
+        invalidate_company_dashboard(company_id)
+
+
+@receiver([post_save, post_delete], sender=Activity)
+def invalidate_activity_dashboard(sender, instance: Activity, **kwargs):
+    if instance.location_id is not None:
+        invalidate_changed_dashboards(sender, location_ids=[instance.location_id])
+
+
+@receiver([post_save, post_delete], sender=EmissionsSource)
+def invalidate_emission_source_dashboard(sender, instance: EmissionsSource, **kwargs):
+    invalidate_changed_dashboards(sender, location_ids=[instance.location_id])
+
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_location_dashboard(sender, instance: Location, **kwargs):
+    invalidate_company_dashboard(instance.company_id)
@@ -1,12 +1,88 @@
 from datetime import datetime
+import pandas as pd
 from django.conf import settings
-from django.db.models import Sum, F, Prefetch
+from django.db.models import F, Sum, Window, ValueRange
+from django.db.models.functions import FirstValue
 from django.utils import timezone
-from activities.models import ActivityGasEmitted, ActivityGasEmittedByFactor, Activity
+from activities.models import ActivityGasEmittedByFactor, Activity, EmissionRollup
 from companies.models import Company
 
 
+class PrecedingRange(ValueRange):
+    """
+    RANGE frame with fixed offsets, e.g. PrecedingRange(start=-12, end=-12) selects the row exactly twelve
+    units before the current one in the window ordering (PostgreSQL 11+).
+    """
+
+    @staticmethod
+    def _bound(offset):
+        if offset is None:
+            return 'UNBOUNDED PRECEDING'
+        if offset == 0:
+            return 'CURRENT ROW'
+        return f'{abs(offset)} PRECEDING' if offset < 0 else f'{offset} FOLLOWING'
+
+    def window_frame_start_end(self, connection, start, end):
+        return self._bound(start), self._bound(end)
+
+
 class DataAnalysis(object):
+    """
+    Builds the dashboard summaries of a company.
+
+    The filtered fact rows are read with a single query from the monthly rollup table (one row per
+    emission source, location, period, emission factor and gas) and loaded into a pandas DataFrame,
+    every breakdown of the dashboard is then computed in memory from that frame instead of sending
+    one GROUP BY query per summary.
+    """
+
+    # Fact columns: alias -> lookup over EmissionRollup
+    FACT_FIELDS = {
+        'scope': 'scope__name',
+        'category': 'category__name',
+        'group': 'group__name',
+        'source_type': 'source_type__name',
+        'emission_source': 'emission_source__name',
+        'gas_name': 'greenhouse_gas__name',
+        'factor': 'emission_factor__name',
+        'year': 'year',
+        'month': 'month',
+    }
+    FACT_COLUMNS = list(FACT_FIELDS) + ['value', 'co2e']
+
+    # Activity projection: output key -> lookup over Activity
+    ACTIVITY_FIELDS = {
+        'id': 'id',
+        'company': 'location__company__name',
+        'location': 'location__name',
+        'scope': 'emission_source__group__category__scope__name',
+        'category': 'emission_source__group__category__name',
+        'group': 'emission_source__group__name',
+        'emission_source': 'emission_source__name',
+        'emission_source_id': 'emission_source_id',
+        'source_type': 'emission_source__source_type__name',
+        'factor_type': 'emission_source__factor_type__name',
+        'factor': 'emission_source__emission_factor__name',
+        'factor_id': 'emission_source__emission_factor_id',
+        'name': 'name',
+        'description': 'description',
+        'consumption': 'consumption',
+        'date': 'date',
+        'month': 'month',
+        'year': 'year',
+        'unit': 'unit_id',
+        'user_created': 'user_created_id',
+        'total_co2e': 'total_co2e',
+    }
+
+    # Time series dimension -> (key lookup, label lookup) over EmissionRollup
+    TIME_SERIES_DIMENSIONS = {
+        'gas': ('greenhouse_gas_id', 'greenhouse_gas__name'),
+        'scope': ('scope_id', 'scope__name'),
+        'group': ('group_id', 'group__name'),
+        'location': ('location_id', 'location__name'),
+    }
+
     company = None
     company_id = None
     location_id = None
@@ -21,7 +97,9 @@ class DataAnalysis(object):
     month = None
     filters = {}
     gases_emitted_by_factor = ActivityGasEmittedByFactor.objects.none()
+    rollup = EmissionRollup.objects.none()
     filtered_activities = Activity.objects.none()
+    facts = None
 
     results = {}
 
@@ -52,259 +130,291 @@ class DataAnalysis(object):
         self.month = month
         self.data = {}
 
+    @staticmethod
+    def _to_records(frame: pd.DataFrame, columns: dict) -> list:
+        """
+        Convert a summary frame into a list of plain python dicts.
+
+        :param frame: The summary frame.
+        :param columns: Mapping of frame column -> output key.
+        """
+        records = []
+        for row in frame.itertuples(index=False):
+            item = {}
+            for column, key in columns.items():
+                value = getattr(row, column)
+                if pd.isna(value):
+                    value = None
+                elif hasattr(value, 'item'):
+                    value = value.item()
+                item[key] = value
+            records.append(item)
+        return records
+
+    def _summarize(self, by: list, value_column: str, output_value: str = 'value') -> pd.DataFrame:
+        """
+        Sum `value_column` grouped by the `by` fact columns, ordered by them (nulls last, as in SQL).
+        """
+        summary = self.facts.groupby(by, dropna=False, sort=True)[value_column].sum(min_count=1).reset_index()
+        return summary.rename(columns={value_column: output_value})
+
+    def load_facts(self) -> pd.DataFrame:
+        """
+        Fetch the filtered fact rows with a single query.
+        """
+        lookups = list(self.FACT_FIELDS.values())
+        rows = self.rollup.order_by().values_list(*lookups, 'value', 'co2e')
+        self.facts = pd.DataFrame.from_records(list(rows), columns=self.FACT_COLUMNS)
+        self.facts[['value', 'co2e']] = self.facts[['value', 'co2e']].astype(float)
+        return self.facts
+
     def emissions_by_gas(self):
         # Collect data for the summary of emissions emitted by gas
-        gases_emitted = self.gases_emitted_by_factor.values('greenhouse_gas__name').annotate(
-            total_value=Sum('value')
-        ).order_by('greenhouse_gas__name')
+        gases_emitted = self._summarize(['gas_name'], 'value', 'total_value')
         gas_summary = []
 
-        for gas in gases_emitted:
-            percentage_change = self.calculate_percentage_change(gas['greenhouse_gas__name'])
-            gas_summary.append({
-                'gas_name': gas['greenhouse_gas__name'],
-                'total_value': gas['total_value'],
-                'percentage_change': percentage_change
-            })
+        for gas in self._to_records(gases_emitted, {'gas_name': 'gas_name', 'total_value': 'total_value'}):
+            gas['percentage_change'] = self.calculate_percentage_change(gas['gas_name'])
+            gas_summary.append(gas)
 
         self.data['gas_emissions'] = gas_summary
         return gas_summary
 
     def emissions_by_source(self):
         # Collect data for the summary by emission source type
-        emission_sources = self.gases_emitted_by_factor.values('activity__emission_source__name').annotate(
-            value=Sum('co2e')
-        ).order_by('activity__emission_source__name')
-        source_summary = [
-            {'source_type': source['activity__emission_source__name'], 'value': source['value']} for source in
-            emission_sources]
+        emission_sources = self._summarize(['emission_source'], 'co2e')
+        source_summary = self._to_records(emission_sources, {'emission_source': 'source_type', 'value': 'value'})
 
         self.data['emission_sources'] = source_summary
         return source_summary
 
     def emissions_by_classification_group(self):
-        # Collect data for GHG distribution
-        gei_distribution = self.gases_emitted_by_factor.values('co2e').annotate(
-            percentage=F('co2e') / Sum('co2e') * 100
-        )
-        gei_summary = [{'category': 'GEI', 'percentage': gei['percentage']} for gei in gei_distribution]
+        # Collect data for GHG distribution, each distinct co2e value against the total of its group
+        distribution = self.facts.groupby('co2e', sort=True)['co2e'].sum().rename('total').reset_index()
+        distribution['percentage'] = (distribution['co2e'] / distribution['total'].where(distribution['total'] != 0)) * 100
+        gei_summary = [
+            {'category': 'GEI', 'percentage': gei['percentage']}
+            for gei in self._to_records(distribution, {'percentage': 'percentage'})
+        ]
 
         self.data['gei_distribution'] = gei_summary
         return gei_summary
 
     def get_total_co2e(self):
-        self.data['total_emissions'] = self.gases_emitted_by_factor.aggregate(total=Sum('co2e'))['total']
+        total = self.facts['co2e'].sum(min_count=1)
+        self.data['total_emissions'] = None if pd.isna(total) else float(total)
         return self.data['total_emissions']
 
     def calculate_percentage_change(self, gas_name):
         current_month = timezone.now().month
         previous_month = current_month - 1 if current_month > 1 else 12
 
-        current_month_emissions = self.gases_emitted_by_factor.filter(
-            activity__date__month=current_month,
-            greenhouse_gas__name=gas_name
-        ).aggregate(total=Sum('value'))['total'] or 0
-
-        previous_month_emissions = self.gases_emitted_by_factor.filter(
-            activity__date__month=previous_month,
-            greenhouse_gas__name=gas_name
-        ).aggregate(total=Sum('value'))['total'] or 0
+        gas_facts = self.facts[self.facts['gas_name'] == gas_name]
+        current_month_emissions = gas_facts.loc[gas_facts['month'] == current_month, 'value'].sum()
+        previous_month_emissions = gas_facts.loc[gas_facts['month'] == previous_month, 'value'].sum()
 
         if previous_month_emissions == 0:
             return 100
 
         percentage_change = ((current_month_emissions - previous_month_emissions) / previous_month_emissions) * 100
-        return percentage_change
+        return float(percentage_change)
+
+    @staticmethod
+    def _change(current, previous):
+        if not previous:
+            return None
+        return (current - previous) / previous * 100
+
+    def time_series(self, dimension='gas') -> list:
+        """
+        Monthly totals by dimension with their month-over-month and year-over-year changes, computed with
+        window functions in a single query over the rollup.
+
+        :param dimension: One of TIME_SERIES_DIMENSIONS.
+        """
+        if not self.filters:
+            self.queryset()
+        key, label = self.TIME_SERIES_DIMENSIONS[dimension]
+
+        # Read one more year before the window so the first months have their comparison values, and every month
+        # so a month filter keeps the previous month and year; both are applied to the rows after the window
+        filters = self.rollup_filters(self.filters)
+        month = filters.pop('month', None)
+        if 'year' in filters:
+            year = int(filters.pop('year'))
+            filters.setdefault('period__gte', Activity.get_period(year, 1))
+            filters.setdefault('period__lte', Activity.get_period(year, 12))
+        window_start = filters.pop('period__gte', None)
+        if window_start is not None:
+            filters['period__gte'] = window_start - 100
+
+        month_index = F('year') * 12 + F('month')
+
+        def previous(months):
+            return Window(
+                expression=FirstValue(Sum('co2e')),
+                partition_by=[F(key)],
+                order_by=month_index.asc(),
+                frame=PrecedingRange(start=-months, end=-months)
+            )
+
+        rows = EmissionRollup.objects.filter(**filters).values(key, label, 'year', 'month', 'period').annotate(
+            total_value=Sum('value'),
+            total_co2e=Sum('co2e'),
+            previous_month_co2e=previous(1),
+            previous_year_co2e=previous(12),
+        ).order_by(label, key, 'year', 'month')
+
+        series = []
+        for row in rows:
+            if window_start is not None and row['period'] < window_start:
+                continue
+            if month is not None and row['month'] != int(month):
+                continue
+            series.append({
+                'id': row[key],
+                'name': row[label],
+                'year': row['year'],
+                'month': row['month'],
+                'value': row['total_value'],
+                'co2e': row['total_co2e'],
+                'previous_month_co2e': row['previous_month_co2e'],
+                'previous_year_co2e': row['previous_year_co2e'],
+                'month_over_month': self._change(row['total_co2e'], row['previous_month_co2e']),
+                'year_over_year': self._change(row['total_co2e'], row['previous_year_co2e']),
+            })
+        return series
 
     def emissions_by_source_type_and_scope(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__source_type__name', 'activity__emission_source__group__category__scope__name'
-        ).annotate(
-            value=Sum('co2e')
-        ).order_by('activity__emission_source__source_type__name', 'activity__emission_source__group__category__scope__name')
-
-        summary = [
-            {
-                'source_type': item['activity__emission_source__source_type__name'],
-                'scope': item['activity__emission_source__group__category__scope__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['source_type', 'scope'], 'co2e')
+        summary = self._to_records(data, {'source_type': 'source_type', 'scope': 'scope', 'value': 'value'})
 
         self.data['emissions_by_source_type_and_scope'] = summary
         return summary
 
     def emissions_by_scope(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__group__category__scope__name'
-        ).annotate(
-            value=Sum('co2e')
-        ).order_by('activity__emission_source__group__category__scope__name')
-
-        summary = [
-            {
-                'scope': item['activity__emission_source__group__category__scope__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['scope'], 'co2e')
+        summary = self._to_records(data, {'scope': 'scope', 'value': 'value'})
 
         self.data['emissions_by_scope'] = summary
         return summary
 
     def emissions_direct_and_indirect(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__source_type__name'
-        ).annotate(
-            value=Sum('co2e')
-        ).order_by('activity__emission_source__source_type__name')
-
-        summary = [
-            {
-                'emission_type': item['activity__emission_source__source_type__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['source_type'], 'co2e')
+        summary = self._to_records(data, {'source_type': 'emission_type', 'value': 'value'})
 
         self.data['emissions_direct_and_indirect'] = summary
         return summary
 
     def gases_emitted_by_scope(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__group__category__scope__name', 'greenhouse_gas__name'
-        ).annotate(
-            value=Sum('value')
-        ).order_by('activity__emission_source__group__category__scope__name', 'greenhouse_gas__name')
-
-        summary = [
-            {
-                'scope': item['activity__emission_source__group__category__scope__name'],
-                'gas_name': item['greenhouse_gas__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['scope', 'gas_name'], 'value')
+        summary = self._to_records(data, {'scope': 'scope', 'gas_name': 'gas_name', 'value': 'value'})
 
         self.data['gases_emitted_by_scope'] = summary
         return summary
 
     def gases_emitted_by_scope_and_source_type(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__group__category__scope__name',
-            'activity__emission_source__source_type__name',
-            'greenhouse_gas__name'
-        ).annotate(
-            value=Sum('value')
-        ).order_by(
-            'activity__emission_source__group__category__scope__name',
-            'activity__emission_source__source_type__name',
-            'greenhouse_gas__name'
-        )
-
-        summary = [
-            {
-                'scope': item['activity__emission_source__group__category__scope__name'],
-                'source_type': item['activity__emission_source__source_type__name'],
-                'gas_name': item['greenhouse_gas__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['scope', 'source_type', 'gas_name'], 'value')
+        summary = self._to_records(data, {
+            'scope': 'scope',
+            'source_type': 'source_type',
+            'gas_name': 'gas_name',
+            'value': 'value'
+        })
 
         self.data['gases_emitted_by_scope_and_source_type'] = summary
         return summary
 
     def gases_emitted_by_group(self):
-        data = self.gases_emitted_by_factor.values(
-            'activity__emission_source__group__name', 'greenhouse_gas__name'
-        ).annotate(
-            value=Sum('value')
-        ).order_by('activity__emission_source__group__name', 'greenhouse_gas__name')
-
-        summary = [
-            {
-                'group': item['activity__emission_source__group__name'],
-                'gas_name': item['greenhouse_gas__name'],
-                'value': item['value']
-            }
-            for item in data
-        ]
+        data = self._summarize(['group', 'gas_name'], 'value')
+        summary = self._to_records(data, {'group': 'group', 'gas_name': 'gas_name', 'value': 'value'})
 
         self.data['gases_emitted_by_group'] = summary
         return summary
 
     def queryset(self):
+        # Company and classification keys are denormalized on the activity (see Activity.CLASSIFICATION_KEYS)
         filters = {
-            'location__company': self.company
+            'company_id': self.company.id
         }
         if self.location_id is not None:
             filters['location_id'] = self.location_id
         if self.category_id is not None:
-            filters['emission_source__group__category_id'] = self.category_id
+            filters['category_id'] = self.category_id
         if self.scope_id is not None:
-            filters['emission_source__group__category__scope_id'] = self.scope_id
+            filters['scope_id'] = self.scope_id
         if self.group_id is not None:
-            filters['emission_source__group__id'] = self.group_id
+            filters['group_id'] = self.group_id
         if self.source_type_id is not None:
-            filters['emission_source__source_type_id'] = self.source_type_id
+            filters['source_type_id'] = self.source_type_id
         if self.emission_source_id is not None:
-            filters['emission_source__id'] = self.emission_source_id
+            filters['emission_source_id'] = self.emission_source_id
         if self.factor_type_id is not None:
             filters['emission_source__factor_type_id'] = self.factor_type_id
         if self.factor_id is not None:
             filters['emission_source__emission_factor__id'] = self.factor_id
         if self.initial_date is not None:
             initial_date = datetime.strptime(self.initial_date, '%Y-%m-%d')
-            filters['year__gte'] = initial_date.year
-            filters['month__gte'] = initial_date.month
+            filters['period__gte'] = Activity.get_period(initial_date.year, initial_date.month)
         if self.end_date is not None:
             end_date = datetime.strptime(self.end_date, '%Y-%m-%d')
-            filters['year__lte'] = end_date.year
-            filters['month__lte'] = end_date.month
+            filters['period__lte'] = Activity.get_period(end_date.year, end_date.month)
         if self.year:
             filters['year'] = self.year
         if self.month:
             filters['month'] = self.month
 
         # Filter by activities
-        self.filtered_activities = Activity.objects.filter(**filters).select_related(
-            'location',
-            'emission_source__group__category',
-            'emission_source__source_type',
-            'emission_source__factor_type'
-        ).prefetch_related(
-            Prefetch('gases_emitted_by_factor', queryset=ActivityGasEmittedByFactor.objects.select_related(
-                'emission_factor', 'greenhouse_gas'
-            ))
-        )
+        self.filters = filters
+        self.filtered_activities = Activity.objects.filter(**filters)
 
-        # Prefetch gases emitidos por factor
+        # Gases emitted by factor of the filtered activities
         self.gases_emitted_by_factor = ActivityGasEmittedByFactor.objects.filter(
-            activity__in=self.filtered_activities
-        ).select_related(
-            'emission_factor',
-            'greenhouse_gas'
+            activity__in=Activity.objects.filter(**filters).values('id')
         )
 
+        # Facts: rollup rows matching the same filters
+        self.rollup = EmissionRollup.objects.filter(**self.rollup_filters(filters))
+
         return self.filtered_activities
 
+    @staticmethod
+    def rollup_filters(filters: dict) -> dict:
+        """
+        Translate the activity filters into the equivalent lookups over EmissionRollup.
+        """
+        lookups = {
+            'emission_source__factor_type_id': 'factor_type_id',
+        }
+        return {lookups.get(key, key): value for key, value in filters.items()}
+
+    def activity_rows(self):
+        """
+        Projection of the filtered activities with every join resolved in SQL, as a values_list queryset
+        in ACTIVITY_FIELDS order (see activity_record).
+        """
+        if not self.filters:
+            self.queryset()
+        return self.filtered_activities.order_by('date', 'name', 'id').values_list(*self.ACTIVITY_FIELDS.values())
+
+    @classmethod
+    def activity_record(cls, row) -> dict:
+        return dict(zip(cls.ACTIVITY_FIELDS, row))
+
     def calculate(self):
         # Filter data by attributes set's
         self.queryset()
-        self.data['activities_filtered'] = self.filtered_activities
+        self.load_facts()
 
         # Calculate data summaries
         self.emissions_by_source_type_and_scope()
-        self.emissions_by_source_type_and_scope()
         self.emissions_by_scope()
         self.emissions_direct_and_indirect()
         self.gases_emitted_by_scope()
         self.gases_emitted_by_scope_and_source_type()
         self.gases_emitted_by_group()
-        self.emissions_by_gas(),
-        self.emissions_by_source(),
-        self.emissions_by_classification_group(),
+        self.emissions_by_gas()
+        self.emissions_by_source()
+        self.emissions_by_classification_group()
         self.get_total_co2e()
         return self.data
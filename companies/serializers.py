@@ -3,16 +3,16 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from activities.models import Activity
 from companies.models import Company, Brand, Member, Location, EmissionsSource
 from documents.models import Document
-from documents.serializer import BaseDocumentSerializer
+from documents.serializer import BaseDocumentSerializer, DocumentListSerializer
 from django.utils.translation import gettext_lazy as _
 
 
 class EmissionsSourceSerializer(BaseDocumentSerializer):
     class Meta:
         model = EmissionsSource
+        list_serializer_class = DocumentListSerializer
         fields = '__all__'
         read_only_fields = ['id', 'emission_source_name']
 
@@ -199,55 +199,28 @@ class GEISummarySerializer(serializers.Serializer):
     percentage = serializers.FloatField()
 
 
-class ActivitiesFilteredSerializer(serializers.ModelSerializer):
-    company = serializers.SerializerMethodField(read_only=True)
-    location = serializers.SerializerMethodField(read_only=True)
-    scope = serializers.SerializerMethodField(read_only=True)
-    category = serializers.SerializerMethodField(read_only=True)
-    group = serializers.SerializerMethodField(read_only=True)
-    emission_source = serializers.SerializerMethodField(read_only=True)
-    source_type = serializers.SerializerMethodField(read_only=True)
-    factor_type = serializers.SerializerMethodField(read_only=True)
-    factor = serializers.SerializerMethodField(read_only=True)
-    emission_source_id = serializers.SerializerMethodField(read_only=True)
-    factor_id = serializers.SerializerMethodField(read_only=True)
-
-    def get_company(self, obj: Activity): # noqa
-        return obj.location.company.name
-
-    def get_location(self, obj: Activity): # noqa
-        return obj.location.name
-
-    def get_scope(self, obj: Activity): # noqa
-        return obj.emission_source.group.category.scope.name
-
-    def get_category(self, obj: Activity): # noqa
-        return obj.emission_source.group.category.name
-
-    def get_group(self, obj: Activity): # noqa
-        return obj.emission_source.group.name
-
-    def get_emission_source(self, obj: Activity): # noqa
-        return obj.emission_source.name
-
-    def get_source_type(self, obj: Activity): # noqa
-        return obj.emission_source.source_type.name
-
-    def get_factor_type(self, obj: Activity): # noqa
-        return obj.emission_source.factor_type.name
-
-    def get_factor(self, obj: Activity): # noqa
-        return obj.emission_source.emission_factor.name
-
-    def get_emission_source_id(self, obj: Activity): # noqa
-        return obj.emission_source.id
-
-    def get_factor_id(self, obj: Activity): # noqa
-        return obj.emission_source.emission_factor.id
-
-    class Meta:
-        model = Activity
-        fields = '__all__'
+class DashboardActivitySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    company = serializers.CharField(allow_null=True)
+    location = serializers.CharField(allow_null=True)
+    scope = serializers.CharField(allow_null=True)
+    category = serializers.CharField(allow_null=True)
+    group = serializers.CharField(allow_null=True)
+    emission_source = serializers.CharField(allow_null=True)
+    emission_source_id = serializers.IntegerField(allow_null=True)
+    source_type = serializers.CharField(allow_null=True)
+    factor_type = serializers.CharField(allow_null=True)
+    factor = serializers.CharField(allow_null=True)
+    factor_id = serializers.IntegerField(allow_null=True)
+    name = serializers.CharField(allow_null=True)
+    description = serializers.CharField(allow_null=True)
+    consumption = serializers.FloatField()
+    date = serializers.DateField()
+    month = serializers.IntegerField()
+    year = serializers.IntegerField()
+    unit = serializers.IntegerField()
+    user_created = serializers.IntegerField(allow_null=True)
+    total_co2e = serializers.FloatField()
 
 
 class EmissionsBySourceTypeAndScopeSerializer(serializers.Serializer):
@@ -285,8 +258,26 @@ class GasesEmittedByGroupSerializer(serializers.Serializer):
     value = serializers.FloatField()
 
 
+class TimeSeriesPointSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    year = serializers.IntegerField()
+    month = serializers.IntegerField()
+    value = serializers.FloatField()
+    co2e = serializers.FloatField()
+    previous_month_co2e = serializers.FloatField(allow_null=True)
+    previous_year_co2e = serializers.FloatField(allow_null=True)
+    month_over_month = serializers.FloatField(allow_null=True)
+    year_over_year = serializers.FloatField(allow_null=True)
+
+
+class DashboardCacheStatsSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_ratio = serializers.FloatField(allow_null=True)
+
+
 class DashboardDataSerializer(serializers.Serializer):
-    activities_filtered = ActivitiesFilteredSerializer(many=True)
     gas_emissions = GasEmissionSummarySerializer(many=True)
     emission_sources = EmissionSourceSummarySerializer(many=True)
     gei_distribution = GEISummarySerializer(many=True)
@@ -1,3 +1,98 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import User
+from companies.api import DashboardActivitiesView
+from companies.cache import get_dashboard_data, invalidate_company_dashboard, dashboard_cache_stats
+
+
+class DashboardCacheTest(SimpleTestCase):
+    """
+    Dashboard entries against the default host-wide file cache.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backend = 'django.core.cache.backends.filebased.FileBasedCache'
+        settings = override_settings(
+            CACHES={
+                'default': {'BACKEND': backend, 'LOCATION': f'{directory.name}/cache', 'OPTIONS': {'MAX_ENTRIES': 4}},
+                'stats': {'BACKEND': backend, 'LOCATION': f'{directory.name}/stats'},
+            },
+            CACHE_LOCK_DIR=f'{directory.name}/locks',
+            DASHBOARD_CACHE_TIMEOUT=60 * 60,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.now = 1_700_000_000.0
+        for module in ('django.core.cache.backends.base', 'django.core.cache.backends.filebased'):
+            patcher = mock.patch(f'{module}.time.time', side_effect=lambda: self.now)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # No transaction is open, the versions are bumped right away
+        patcher = mock.patch('companies.cache.transaction.on_commit', side_effect=lambda func: func())
+        self.on_commit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalidated_dashboard_is_not_served_after_default_timeout(self):
+        query_params = {'company': '7', 'year': '2023'}
+        self.assertEqual(get_dashboard_data(query_params, lambda: {'total': 1}), {'total': 1})
+        self.assertEqual(get_dashboard_data(query_params, lambda: {'total': 2}), {'total': 1})
+
+        invalidate_company_dashboard(7)
+        self.on_commit.assert_called_once()
+        # Past the 300 seconds default timeout of the cache but inside the dashboard timeout
+        self.now += 301
+        self.assertEqual(get_dashboard_data(query_params, lambda: {'total': 2}), {'total': 2})
+        self.now += 301
+        self.assertEqual(get_dashboard_data(query_params, lambda: {'total': 3}), {'total': 2})
+
+    def test_hit_and_miss_counters_do_not_expire(self):
+        query_params = {'company': '7'}
+        get_dashboard_data(query_params, lambda: {'total': 1})
+        get_dashboard_data(query_params, lambda: {'total': 1})
+        get_dashboard_data(query_params, lambda: {'total': 1})
+        self.now += 3 * 60 * 60
+
+        stats = dashboard_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_counters_survive_culling_of_the_dashboards(self):
+        # Every dashboard adds its entry and its company version to the default cache, above its max entries
+        for company in range(10):
+            get_dashboard_data({'company': str(company)}, lambda: {'total': 1})
+
+        stats = dashboard_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 10))
+
+
+class DashboardActivitiesAccessTest(SimpleTestCase):
+    """
+    Dashboard activities of companies the user is not a member of.
+    """
+
+    def setUp(self):
+        patcher = mock.patch('companies.api.Member.objects')
+        self.members = patcher.start().filter.return_value.values_list.return_value
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('companies.api.get_data_analysis')
+        self.get_data_analysis = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        request = APIRequestFactory().get('/companies/dashboard/activities/', params)
+        force_authenticate(request, user=User(id=1))
+        return DashboardActivitiesView.as_view()(request)
+
+    def test_other_company_is_not_found(self):
+        self.members.filter.return_value.exists.return_value = False
+
+        for params in ({'company': '8'}, {'company': '8', 'export': 'csv'}, {}):
+            self.assertEqual(self.get(**params).status_code, 404)
+        self.members.filter.assert_called_with(company_id='8')
+        self.get_data_analysis.assert_not_called()
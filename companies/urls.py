@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from companies.api import CompanyViewSet, BrandViewSet, MemberViewSet, LocationViewSet, EmissionsSourceViewSet, \
-    CompanyLogoViewSet, DashboardView
+    CompanyLogoViewSet, DashboardView, DashboardActivitiesView, \
+    DashboardCacheStatsView, DashboardTimeSeriesView
 from companies.views import accept_invitation
 
 router = DefaultRouter()
@@ -21,6 +22,9 @@ api_urls = ([
              name='member-detail'),
     ])),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('dashboard/activities/', DashboardActivitiesView.as_view(), name='dashboard-activities'),
+    path('dashboard/time-series/', DashboardTimeSeriesView.as_view(), name='dashboard-time-series'),
+    path('dashboard/cache-stats/', DashboardCacheStatsView.as_view(), name='dashboard-cache-stats'),
 
 ], 'companies')
 
@@ -1,3 +1,6 @@
+import csv
+import tempfile
+from openpyxl import Workbook
 from rest_framework import serializers
 from companies.serializers import EmissionsSourceRequestSerializer
 from django.contrib.gis.db import models as gis_models
@@ -40,3 +43,45 @@ def generate_schema_for_emission_source():
             'properties': properties
         }
     }
+
+
+class Echo:
+    """
+    File-like object that returns what is written, lets csv.writer feed a StreamingHttpResponse.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """
+    Yield the CSV lines of the header and each row.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_xlsx(header, rows, chunk_size=64 * 1024):
+    """
+    Write the rows to a write-only workbook spooled to a temporary file and yield its content in chunks.
+
+    The XLSX format is a zip archive that can only be completed once every row is written, the
+    write-only workbook keeps memory flat while the rows are consumed.
+    """
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(header)
+    for row in rows:
+        worksheet.append(row)
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
@@ -13,7 +13,7 @@ class DocumentAdmin(admin.ModelAdmin):
         ),
         (
             _('Content'),
-            {'fields': ('user_created', 'title', 'file', 'thumbnails', 'tags',)}
+            {'fields': ('user_created', 'title', 'file', 'thumbnails', 'thumbnail_status', 'tags',)}
         ),
         (
             _('Metadata'),
@@ -22,9 +22,9 @@ class DocumentAdmin(admin.ModelAdmin):
     )
 
     list_display = ('title', 'file_type', 'object_pk', 'created',)
-    list_filter = ('created', 'file_type',)
+    list_filter = ('created', 'file_type', 'thumbnail_status',)
     date_hierarchy = 'created'
     ordering = ('-created',)
     raw_id_fields = ('user_created',)
-    readonly_fields = ["updated", "created", 'size', 'file_type', 'is_multimedia', 'thumbnails']
+    readonly_fields = ["updated", "created", 'size', 'file_type', 'is_multimedia', 'thumbnails', 'thumbnail_status']
     search_fields = ('title', UsernameSearch(), 'user_name', 'user_email',)
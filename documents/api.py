@@ -3,10 +3,12 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, status, parsers
 from rest_framework.decorators import action
+from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin, DestroyModelMixin
 from rest_framework.response import Response
-from documents.models import Document
-from documents.serializer import DocumentSerializer
-from main.settings import get_platform_object_types
+from documents.models import Document, DocumentUpload
+from documents.serializer import DocumentSerializer, DocumentUploadSerializer
+from documents.uploads import UploadError, parse_content_range, write_chunk, finalize_upload
+from main.settings import get_platform_object_types, get_user_object_queryset
 from main.contrib.mixins import UpdateModelMixinWithRequest, DestroyModelOwnerMixin, UserCreateMixinViewSet
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework.settings import api_settings
@@ -31,7 +33,7 @@ class DocumentViewSet(viewsets.GenericViewSet, UpdateModelMixinWithRequest, Dest
     def get_object_by_name_and_id(self, model_name, model_id):
         try:
             model = self.object_types[model_name]
-            return model.objects.get(id=model_id)
+            return get_user_object_queryset(self.request.user, model).get(id=model_id)
         except KeyError:
             return None
         except ObjectDoesNotExist:
@@ -92,3 +94,52 @@ class DocumentViewSet(viewsets.GenericViewSet, UpdateModelMixinWithRequest, Dest
         if not model:
             return Response(status=status.HTTP_400_BAD_REQUEST)
         return self.create_document(request, model)
+
+
+@extend_schema(tags=['Documents'])
+class DocumentUploadViewSet(viewsets.GenericViewSet, CreateModelMixin, RetrieveModelMixin, DestroyModelMixin):
+    """
+    Resumable uploads: create the upload, PUT the bytes in order with ``Content-Range`` headers, GET it to know
+    where to continue after an interruption and finalize it to create the document.
+    """
+    serializer_class = DocumentUploadSerializer
+    queryset = DocumentUpload.objects.none()
+
+    def get_queryset(self):
+        return DocumentUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @extend_schema(
+        summary=_("Envía un fragmento del archivo"),
+        description='El cuerpo es el contenido binario del fragmento, indicado con `Content-Range: bytes '
+                    '<inicio>-<fin>/<total>`. El inicio debe ser el `offset` actual de la carga.',
+        request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+        responses={200: DocumentUploadSerializer},
+    )
+    def update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.document_id:
+            return Response({'detail': _('la carga ya fue finalizada')}, status=status.HTTP_409_CONFLICT)
+        try:
+            start, length = parse_content_range(request.headers.get('Content-Range'), upload)
+            write_chunk(upload, request.stream, start, length)
+        except UploadError as error:
+            upload.refresh_from_db(fields=['offset'])
+            return Response({'detail': str(error), 'offset': upload.offset}, status=error.status_code)
+        return Response(self.get_serializer(upload).data)
+
+    @extend_schema(
+        summary=_("Crea el documento con el archivo completo"),
+        request=None,
+        responses={201: DocumentSerializer},
+    )
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, *args, **kwargs):
+        upload = self.get_object()
+        try:
+            document = finalize_upload(upload.id)
+        except UploadError as error:
+            return Response({'detail': str(error), 'offset': upload.offset}, status=error.status_code)
+        return Response(DocumentSerializer(document, context={'request': request}).data, status=status.HTTP_201_CREATED)
@@ -0,0 +1,149 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def content_disposition(as_attachment, filename):
+    # Same header FileResponse builds, needed here for the sendfile and partial responses
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        filename.encode('ascii')
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def document_etag(document):
+    """
+    Strong ETag from the stored hash, documents hashed before the field existed get a weak one from size and mtime.
+    """
+    if document.sha256:
+        return f'"{document.sha256}"'
+    stat = os.stat(document.file.path)
+    return f'W/"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    """
+    Return the ``(start, end)`` inclusive byte range asked by a single range ``Range`` header, None when the header
+    is missing or uses a form that is answered with the whole file, such as multiple ranges.
+
+    :raises ValueError: When the range can not be satisfied.
+    """
+    match = RANGE.match(header or '')
+    if not match or (not match['start'] and not match['end']):
+        return None
+    if not match['start']:
+        # Suffix range, the last N bytes
+        length = int(match['end'])
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(match['start'])
+    end = min(int(match['end']), size - 1) if match['end'] else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    ``If-Range`` only allows the partial answer when the client holds the current version of the file.
+    """
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    if value.startswith('W/'):
+        return False
+    date = parse_http_date_safe(value)
+    return date is not None and date >= last_modified
+
+
+def file_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def sendfile_response(document, content_type):
+    """
+    Empty response that tells the web server to send the file, or None when ``DOCUMENT_SENDFILE_BACKEND`` is not set.
+    """
+    backend = settings.DOCUMENT_SENDFILE_BACKEND
+    if not backend:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = quote(settings.DOCUMENT_SENDFILE_URL_PREFIX + document.file.name)
+    elif backend == 'apache':
+        response['X-Sendfile'] = document.file.path
+    else:
+        raise ValueError(f'Unknown DOCUMENT_SENDFILE_BACKEND {backend}')
+    return response
+
+
+def serve_document(request, document, as_attachment=True):
+    """
+    Answer a download of a document the caller is already allowed to read.
+
+    With a sendfile backend the web server transfers the file and handles ranges. Otherwise the file is streamed from
+    here with support for ``Range``/``If-Range`` single ranges, so players can seek and clients resume downloads.
+    Both paths answer conditional requests with the document ETag.
+
+    :param request: Download request.
+    :param document: Document to send.
+    :param as_attachment: Whether the browser should save the file instead of showing it.
+    """
+    path = document.file.path
+    stat = os.stat(path)
+    etag = document_etag(document)
+    last_modified = int(stat.st_mtime)
+    content_type = document.file_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = sendfile_response(document, content_type)
+    if response is None:
+        response = stream_document(request, path, stat.st_size, content_type, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if response.status_code != 304:
+        response['Content-Disposition'] = content_disposition(as_attachment, document.filename())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def stream_document(request, path, size, content_type, etag, last_modified):
+    requested = request.headers.get('Range') if if_range_matches(request, etag, last_modified) else None
+    try:
+        byte_range = parse_range(requested, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    response = StreamingHttpResponse(file_range(path, start, end - start + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
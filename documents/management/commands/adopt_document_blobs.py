@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from documents.models import Document, DocumentBlob
+
+
+class Command(BaseCommand):
+    help = 'Mueve los archivos de los documentos anteriores a los blobs y elimina las copias repetidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Máximo de documentos a procesar')
+
+    def handle(self, *args, **options):
+        documents = Document._base_manager.filter(blob__isnull=True).exclude(file='').order_by('id')
+        if options['limit']:
+            documents = documents[:options['limit']]
+
+        adopted = 0
+        for document in documents.iterator():
+            try:
+                path = document.file.path
+                sha256 = document.sha256 or document.compute_sha256()
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'El archivo del documento {document.id} no existe'))
+                continue
+            with transaction.atomic():
+                blob = DocumentBlob.objects.acquire_path(path, sha256, document.filename())
+                Document._base_manager.filter(id=document.id).update(
+                    blob=blob, file=blob.file.name, sha256=sha256, original_filename=document.filename()
+                )
+            adopted += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{adopted} documentos movidos a blobs.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from documents.uploads import expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Elimina las cargas de documentos sin terminar que expiraron y sus archivos parciales'
+
+    def handle(self, *args, **options):
+        count = 0
+        for upload in expired_uploads().iterator():
+            upload.delete()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'{count} cargas expiradas eliminadas.'))
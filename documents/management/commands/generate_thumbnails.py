@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from documents.models import Document
+from documents.thumbnails import claim_documents, process_document
+
+
+class Command(BaseCommand):
+    help = 'Genera las miniaturas pendientes de los documentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Termina cuando no quedan documentos pendientes')
+        parser.add_argument('--sleep', type=float, default=5, help='Segundos de espera cuando no hay documentos')
+        parser.add_argument('--batch-size', type=int, default=20, help='Documentos reservados por lote')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Vuelve a encolar los documentos cuyas miniaturas fallaron')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            count = Document.objects.filter(thumbnail_status=Document.THUMBNAIL_FAILED).update(
+                thumbnail_status=Document.THUMBNAIL_PENDING, thumbnail_attempts=0
+            )
+            self.stdout.write(f'{count} documentos encolados de nuevo')
+
+        while True:
+            close_old_connections()
+            documents = claim_documents(options['batch_size'])
+            for document in documents:
+                status = process_document(document)
+                self.stdout.write(f'Documento {document.id}: {status}')
+            if not documents:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from documents.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Calcula el hash SHA-256 de los documentos que no lo tienen'
+
+    def handle(self, *args, **options):
+        documents = Document.objects.filter(sha256='').only('id', 'file')
+        total = documents.count()
+        self.stdout.write(f'{total} documentos por procesar')
+
+        hashed = 0
+        for document in documents.iterator():
+            try:
+                sha256 = document.compute_sha256()
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'El archivo del documento {document.id} no existe'))
+                continue
+            Document.objects.filter(id=document.id).update(sha256=sha256)
+            hashed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{hashed} documentos actualizados.'))
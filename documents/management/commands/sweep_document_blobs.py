@@ -0,0 +1,81 @@
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from documents.models import Document, DocumentBlob, fs
+from documents.utils import _delete_file
+from main.settings import UPLOAD_TO
+
+
+class Command(BaseCommand):
+    help = 'Elimina los blobs de documentos sin referencias y los archivos huérfanos del almacenamiento de blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=settings.DOCUMENT_BLOB_SWEEP_GRACE,
+                            help='Segundos que debe tener un blob sin referencias antes de eliminarlo')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recalcula las referencias de todos los blobs antes de limpiar')
+        parser.add_argument('--dry-run', action='store_true', help='Muestra lo que se eliminaría sin borrar nada')
+
+    def handle(self, *args, **options):
+        # Trashed documents keep their blob, only forced deletes release it
+        documents = Document._base_manager.all()
+        limit = timezone.now() - timedelta(seconds=options['grace'])
+
+        if options['recount']:
+            references = documents.filter(blob=OuterRef('pk')).order_by().values('blob').annotate(
+                total=Count('id')).values('total')
+            updated = DocumentBlob.objects.update(ref_count=Coalesce(Subquery(references), 0))
+            self.stdout.write(f'{updated} blobs recontados')
+
+        candidates = DocumentBlob.objects.filter(ref_count__lte=0, updated__lt=limit).exclude(
+            Exists(documents.filter(blob=OuterRef('pk')))
+        )
+        deleted = reclaimed = 0
+        for blob_id in candidates.values_list('id', flat=True).iterator():
+            with transaction.atomic():
+                blob = DocumentBlob.objects.select_for_update(skip_locked=True).filter(
+                    id=blob_id, ref_count__lte=0, updated__lt=limit
+                ).first()
+                # Checked again under the lock, an upload of the same content may have taken it meanwhile
+                if blob is None or documents.filter(blob=blob).exists():
+                    continue
+                deleted += 1
+                reclaimed += blob.size
+                if not options['dry_run']:
+                    path = blob.file.path
+                    blob.delete()
+                    transaction.on_commit(lambda path=path: _delete_file(path))
+
+        orphans = self.sweep_orphan_files(limit, options['dry_run'])
+        action = 'Se eliminarían' if options['dry_run'] else 'Eliminados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {deleted} blobs ({reclaimed} bytes) y {orphans} archivos huérfanos.'
+        ))
+
+    def sweep_orphan_files(self, limit, dry_run):
+        """
+        Files in the blob folders without a blob row, left by uploads whose transaction rolled back.
+        """
+        root = fs.path(f'{UPLOAD_TO}/blobs')
+        removed = 0
+        for directory, folders, files in os.walk(root):
+            folders[:] = [folder for folder in folders if folder != 'thumbnails']
+            names = {
+                os.path.relpath(os.path.join(directory, name), settings.MEDIA_ROOT): os.path.join(directory, name)
+                for name in files
+            }
+            if not names:
+                continue
+            known = set(DocumentBlob.objects.filter(file__in=list(names)).values_list('file', flat=True))
+            for name, path in names.items():
+                if name in known or os.path.getmtime(path) >= limit.timestamp():
+                    continue
+                removed += 1
+                if not dry_run:
+                    _delete_file(path)
+        return removed
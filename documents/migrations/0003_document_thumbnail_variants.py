@@ -0,0 +1,23 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_remove_document_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('PENDING', 'Pendiente'), ('PROCESSING', 'En proceso'), ('DONE', 'Generadas'), ('FAILED', 'Fallidas'), ('UNSUPPORTED', 'No soportado')], db_index=True, default='PENDING', max_length=20, verbose_name='Estado de las miniaturas'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='thumbnail_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Miniaturas'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('documents', '0003_document_thumbnail_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('object_pk', models.CharField(max_length=64, verbose_name='object ID')),
+                ('filename', models.CharField(max_length=200, verbose_name='Nombre del archivo')),
+                ('title', models.CharField(blank=True, max_length=200, null=True)),
+                ('tags', models.CharField(blank=True, max_length=200, null=True)),
+                ('file_type', models.CharField(blank=True, max_length=200, null=True, verbose_name='Tipo de archivo')),
+                ('size', models.BigIntegerField(verbose_name='Tamaño')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Bytes recibidos')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('document', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='documents.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_documentupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Hash SHA-256'),
+        ),
+    ]
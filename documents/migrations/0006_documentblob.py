@@ -0,0 +1,43 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:52
+
+import django.core.files.storage
+from django.db import migrations, models
+import django.db.models.deletion
+import documents.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='Hash SHA-256')),
+                ('file', models.FileField(max_length=300, storage=django.core.files.storage.FileSystemStorage(location='/src/media'), upload_to='')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Tamaño')),
+                ('ref_count', models.IntegerField(default=0, verbose_name='Referencias')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='original_filename',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Nombre original'),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(max_length=300, storage=django.core.files.storage.FileSystemStorage(location='/src/media'), upload_to=documents.models.upload_location),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='documents', to='documents.documentblob'),
+        ),
+    ]
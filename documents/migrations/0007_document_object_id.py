@@ -0,0 +1,31 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:55
+
+from django.db import migrations, models
+from django.db.models.functions import Cast
+
+
+def fill_object_id(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.filter(object_pk__regex=r'^[0-9]{1,18}$').update(
+        object_id=Cast('object_pk', models.BigIntegerField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_documentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='object_id',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='object ID numérico'),
+        ),
+        migrations.RunPython(fill_object_id, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['content_type', 'object_id'], name='documents_object_id_idx'),
+        ),
+    ]
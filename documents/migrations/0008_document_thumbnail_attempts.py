@@ -0,0 +1,18 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_object_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='thumbnail_attempts',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Intentos de miniaturas'),
+        ),
+    ]
@@ -1,19 +1,20 @@
+import hashlib
 import os
-import sys
-from io import BytesIO
-from PIL import Image
-from django.core.files.uploadedfile import InMemoryUploadedFile
+import shutil
+import uuid
+from django.contrib.contenttypes.models import ContentType
 from django.dispatch import receiver
 from django.urls import reverse
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.core.files.storage import FileSystemStorage
-from django.utils.crypto import get_random_string
 from main.base import Generic, Base, GenericManager
 from main.settings import UPLOAD_TO
-from documents.utils import _delete_file, get_file_type
+from documents.utils import _delete_file, get_file_type, is_thumbnail_source
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.contrib.sites.models import Site
+from django.utils import timezone
 
 fs = FileSystemStorage(location=settings.MEDIA_ROOT)
 
@@ -23,16 +24,146 @@ def upload_location(instance, filename):
     return f"{UPLOAD_TO}/{instance.content_type.model}/{instance.object_pk}/{filename}"
 
 
+def blob_location(sha256, filename):
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    return f"{UPLOAD_TO}/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+class DocumentBlobManager(models.Manager):
+
+    def _acquire(self, sha256, filename, size, write):
+        """
+        Return the blob of a content adding one reference, ``write(name)`` stores the file only when the blob is new
+        or its file went missing.
+
+        The row is inserted before the file is written, a concurrent upload of the same content waits on the unique
+        hash and then finds the blob already stored.
+        """
+        with transaction.atomic():
+            blob, created = self.get_or_create(
+                sha256=sha256, defaults={'file': blob_location(sha256, filename), 'size': size}
+            )
+            if created or not fs.exists(blob.file.name):
+                write(blob.file.name)
+            self.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, updated=timezone.now())
+        return blob
+
+    def acquire_file(self, file, sha256):
+        """
+        Blob for an uploaded file, the upload is only written when its content is not stored yet.
+        """
+        def write(name):
+            fs.delete(name)
+            fs.save(name, file)
+
+        return self._acquire(sha256, file.name, file.size, write)
+
+    def acquire_path(self, path, sha256, filename):
+        """
+        Blob for a file already on disk. A new content is hard linked into place instead of copied, the original path
+        is deleted once the transaction commits so it is still there if the caller rolls back.
+        """
+        size = os.path.getsize(path)
+
+        def write(name):
+            target = fs.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _delete_file(target)
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)
+
+        blob = self._acquire(sha256, filename, size, write)
+        transaction.on_commit(lambda: _delete_file(path))
+        return blob
+
+    def release(self, blob_id):
+        self.filter(pk=blob_id).update(ref_count=F('ref_count') - 1, updated=timezone.now())
+
+
+class DocumentBlob(models.Model):
+    """
+    Stored content shared by every document with the same SHA-256, so repeated attachments use disk once.
+
+    Attributes:
+        sha256: Hash of the content.
+        file: Stored file, named after the hash.
+        size: Size in bytes.
+        ref_count: Documents pointing to the blob, blobs without references are removed by ``sweep_document_blobs``.
+    """
+    sha256 = models.CharField(_('Hash SHA-256'), max_length=64, unique=True)
+    file = models.FileField(storage=fs, max_length=300)
+    size = models.BigIntegerField(_('Tamaño'), default=0)
+    ref_count = models.IntegerField(_('Referencias'), default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = DocumentBlobManager()
+
+    def __str__(self):
+        return self.sha256
+
+
+class DocumentManager(GenericManager):
+    def for_model(self, model):
+        # Objects with integer keys are matched on the indexed object_id instead of casting to text
+        if isinstance(model, models.Model) and isinstance(model.pk, int):
+            content_type = ContentType.objects.get_for_model(model)
+            return self.get_queryset().filter(content_type=content_type, object_id=model.pk)
+        return super().for_model(model)
+
+    def for_objects(self, model, pks):
+        """
+        Documents of several objects of one model in a single query.
+
+        :param model: Model class or instance of the objects.
+        :param pks: Integer primary keys of the objects.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        return self.get_queryset().filter(content_type=content_type, object_id__in=pks)
+
+
 class Document(Base, Generic):
-    file = models.FileField(storage=fs, upload_to=upload_location)
+    THUMBNAIL_PENDING = 'PENDING'
+    THUMBNAIL_PROCESSING = 'PROCESSING'
+    THUMBNAIL_DONE = 'DONE'
+    THUMBNAIL_FAILED = 'FAILED'
+    THUMBNAIL_UNSUPPORTED = 'UNSUPPORTED'
+
+    THUMBNAIL_STATUS_CHOICES = [
+        (THUMBNAIL_PENDING, _('Pendiente')),
+        (THUMBNAIL_PROCESSING, _('En proceso')),
+        (THUMBNAIL_DONE, _('Generadas')),
+        (THUMBNAIL_FAILED, _('Fallidas')),
+        (THUMBNAIL_UNSUPPORTED, _('No soportado')),
+    ]
+
+    object_id = models.PositiveBigIntegerField(_('object ID numérico'), null=True, blank=True, editable=False)
+    file = models.FileField(storage=fs, max_length=300, upload_to=upload_location)
+    blob = models.ForeignKey(
+        DocumentBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='documents', editable=False
+    )
+    original_filename = models.CharField(_('Nombre original'), max_length=255, blank=True, default='')
     thumbnails = models.FileField(storage=fs, max_length=300, upload_to=upload_location, blank=True, null=True)
+    thumbnail_variants = models.JSONField(_('Miniaturas'), default=dict, blank=True)
+    thumbnail_status = models.CharField(
+        _('Estado de las miniaturas'),
+        choices=THUMBNAIL_STATUS_CHOICES,
+        max_length=20,
+        default=THUMBNAIL_PENDING,
+        db_index=True
+    )
+    # Claims of the generate_thumbnails workers, a document left processing that many times is marked as failed
+    thumbnail_attempts = models.PositiveSmallIntegerField(_('Intentos de miniaturas'), default=0, editable=False)
     file_type = models.CharField('Tipo de archivo', max_length=200, blank=True, null=True)
     size = models.BigIntegerField(_('Tamaño'), default=0)
+    sha256 = models.CharField(_('Hash SHA-256'), max_length=64, blank=True, default='', db_index=True)
     is_multimedia = models.BooleanField(_('Es un Archivo Multimedia'), default=False)
     title = models.CharField(max_length=200, blank=True, null=True)
     tags = models.CharField(max_length=200, blank=True, null=True, help_text=_('Una Lista separada por comas'))
 
-    objects = GenericManager()
+    objects = DocumentManager()
 
     @classmethod
     def create(cls, file, title, user_created, content_type, object_pk):
@@ -68,7 +199,7 @@ class Document(Base, Generic):
         return get_file_type(self.file_type)
 
     def filename(self):
-        return os.path.basename(self.file.name)
+        return self.original_filename or os.path.basename(self.file.name)
 
     def __str__(self):
         return self.file.name[len(UPLOAD_TO) + 1:]
@@ -76,53 +207,117 @@ class Document(Base, Generic):
     def get_download_url(self):
         return reverse('documents_document_download', args=(self.pk,))
 
-    def save(self, **kwargs):
-        # Opening the uploaded image
-        try:
-            kwargs['force_insert'] = True
-            # original_image = Image.open(self.file)
-            thumbnails_image = Image.open(self.file)
-
-            # original_output = BytesIO()
-            thumbnails_output = BytesIO()
-
-            if thumbnails_image.height > 300 or thumbnails_image.width > 300:
-                output_size = (300, 169)
-                thumbnails_image.thumbnail(output_size)
-                thumbnails_image.save(thumbnails_output, format='JPEG', quality=90)
-            # TODO: resize image enable
-            # Resize/modify the image
-            # original_image = original_image.resize((1080, 1920))
-
-            # After modifications, save it to the output
-            # original_image.save(original_output, format='JPEG', quality=90)
-            # original_output.seek(0)
-            unique_id = get_random_string(length=32)
-
-            # change the imagefield value to be the newley modifed image value
-            # self.file = InMemoryUploadedFile(
-            #     original_output,
-            #     'ImageField', "%s.jpg" % self.file.name.split('.')[0],
-            #     'image/jpeg',
-            #     sys.getsizeof(original_output), None
-            # )
-            self.thumbnails = InMemoryUploadedFile(
-                thumbnails_output,
-                'ImageField',
-                "%s.jpg" % unique_id,
-                'image/jpeg',
-                sys.getsizeof(thumbnails_output), None
-            )
-            super(Document, self).save()
-        except:
-            super(Document, self).save()
+    def compute_sha256(self):
+        # Files received through documents.uploadhandler were hashed while they streamed in
+        if not self.file._committed and getattr(self.file.file, 'sha256', None):
+            return self.file.file.sha256
+        digest = hashlib.sha256()
+        for chunk in self.file.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+    def save(self, *args, **kwargs):
+        # Typed copy of object_pk, used by the document lookups and prefetches
+        self.object_id = int(self.object_pk) if str(self.object_pk).isdigit() else None
+        # Thumbnails are generated by the generate_thumbnails command so the upload returns once the file is stored
+        if self._state.adding and self.file_type and not is_thumbnail_source(self.file_type):
+            self.thumbnail_status = self.THUMBNAIL_UNSUPPORTED
+        # The hash is the ETag of the downloads, it is taken while the uploaded file is still at hand
+        if self._state.adding and self.file and not self.sha256:
+            self.sha256 = self.compute_sha256()
+        if self._state.adding and self.file and not self.file._committed:
+            # Uploads are stored once per content, the document points to the shared blob
+            with transaction.atomic():
+                self.original_filename = self.original_filename or os.path.basename(self.file.name)
+                self.blob = DocumentBlob.objects.acquire_file(self.file, self.sha256)
+                self.file = self.blob.file.name
+                super(Document, self).save(*args, **kwargs)
+            return
+        super(Document, self).save(*args, **kwargs)
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='documents_object_id_idx'),
+        ]
+
+
+def prefetch_documents(objects):
+    """
+    Load the documents of a list of objects with one query per model and keep them in ``prefetched_documents`` of
+    each object, where ``BaseDocumentSerializer`` reads them.
+
+    :param objects: Model instances, objects without an integer primary key are left to the per object query.
+    """
+    by_model = {}
+    for obj in objects:
+        if obj is not None and isinstance(obj.pk, int) and not hasattr(obj, 'prefetched_documents'):
+            by_model.setdefault(type(obj), []).append(obj)
+
+    for model, instances in by_model.items():
+        documents = {}
+        for document in Document.objects.for_objects(model, {obj.pk for obj in instances}):
+            documents.setdefault(document.object_id, []).append(document)
+        for obj in instances:
+            obj.prefetched_documents = documents.get(obj.pk, [])
 
 
 @receiver(models.signals.post_delete, sender=Document)
 def delete_file(sender, instance, *args, **kwargs):
-    """ Deletes files on `post_delete` """
-    if instance.file:
+    """ Releases the blob, or deletes the file of documents stored before blobs, on `post_delete` """
+    if instance.blob_id:
+        DocumentBlob.objects.release(instance.blob_id)
+    elif instance.file:
         _delete_file(instance.file.path)
+    for formats in instance.thumbnail_variants.values():
+        for name in formats.values():
+            _delete_file(instance.file.storage.path(name))
+
+
+def upload_part_location(upload):
+    return os.path.join(UPLOAD_TO, 'uploads', f'{upload.id}.part')
+
+
+class DocumentUpload(models.Model):
+    """
+    Resumable upload of a document sent in byte ranges, turned into a ``Document`` when finalized.
+
+    Attributes:
+        user: Owner of the upload, the only one allowed to send chunks.
+        content_type: Model of the object the document is attached to.
+        object_pk: Id of the object the document is attached to.
+        filename: Original name of the file.
+        size: Total size in bytes declared when the upload started.
+        offset: Bytes stored so far, the next chunk must start here.
+        document: Document created when the upload was finalized.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('accounts.User', on_delete=models.CASCADE, related_name='document_uploads')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_pk = models.CharField(_('object ID'), max_length=64)
+    filename = models.CharField(_('Nombre del archivo'), max_length=200)
+    title = models.CharField(max_length=200, blank=True, null=True)
+    tags = models.CharField(max_length=200, blank=True, null=True)
+    file_type = models.CharField('Tipo de archivo', max_length=200, blank=True, null=True)
+    size = models.BigIntegerField(_('Tamaño'))
+    offset = models.BigIntegerField(_('Bytes recibidos'), default=0)
+    document = models.OneToOneField(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    @property
+    def part_path(self):
+        return fs.path(upload_part_location(self))
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
+
+    class Meta:
+        ordering = ('-created',)
+
+
+@receiver(models.signals.post_delete, sender=DocumentUpload)
+def delete_upload_part(sender, instance, *args, **kwargs):
+    """ Deletes the partial file of an upload that is aborted or expires """
+    _delete_file(instance.part_path)
@@ -5,14 +5,19 @@ from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
-from documents.models import Document
+from django.conf import settings
+from django.db import models
+from documents.models import Document, DocumentUpload, prefetch_documents
 from documents.utils import is_multimedia_file, get_file_type
+from main.settings import get_platform_object_types, get_user_object_queryset
 
 
 class DocumentSerializer(serializers.ModelSerializer):
     file = serializers.FileField(allow_empty_file=False, use_url=False)
     file_url = serializers.SerializerMethodField()
     thumbnails_url = serializers.SerializerMethodField(read_only=True)
+    thumbnail_variants = serializers.SerializerMethodField(read_only=True)
+    download_url = serializers.SerializerMethodField(read_only=True)
     file_type = serializers.SerializerMethodField(read_only=True)
 
     @extend_schema_field(OpenApiTypes.URI)
@@ -35,6 +40,28 @@ class DocumentSerializer(serializers.ModelSerializer):
                 return document.get_thumbnails_absolute_url()
         return ''
 
+    @extend_schema_field(OpenApiTypes.URI)
+    def get_download_url(self, document: Document):
+        request = self.context.get('request')
+        url = document.get_download_url()
+        return request.build_absolute_uri(url) if request is not None else url
+
+    @extend_schema_field({
+        'type': 'object',
+        'additionalProperties': {'type': 'object', 'additionalProperties': {'type': 'string', 'format': 'uri'}},
+        'example': {'300x169': {'jpeg': 'https://...jpg', 'webp': 'https://...webp'}}
+    })
+    def get_thumbnail_variants(self, document: Document):
+        request = self.context.get('request')
+        storage = document.file.storage
+        variants = {}
+        for size, formats in document.thumbnail_variants.items():
+            variants[size] = {}
+            for image_format, name in formats.items():
+                url = storage.url(name)
+                variants[size][image_format] = request.build_absolute_uri(url) if request is not None else url
+        return variants
+
     @extend_schema_field(OpenApiTypes.STR)
     def get_file_type(self, obj: Document):
         return obj.document_content_type
@@ -65,18 +92,48 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ('id', 'file', 'file_type', 'title', 'user_created', 'updated', 'created',
-                  'tags', 'is_multimedia', 'file_url', 'thumbnails_url', 'size', 'file_type')
+                  'tags', 'is_multimedia', 'file_url', 'thumbnails_url', 'size', 'file_type',
+                  'thumbnail_status', 'thumbnail_variants', 'sha256', 'download_url')
         read_only_fields = ['id', 'updated', 'created', 'file_url', 'thumbnails_url',
-                            'user_created', 'is_evidence', 'size', 'file_type']
+                            'user_created', 'is_evidence', 'size', 'file_type', 'thumbnail_status',
+                            'thumbnail_variants', 'sha256', 'download_url']
         # extra_kwargs = {'file': {'write_only': True}}
 
 
+def prefetch_serializer_documents(serializer, objects):
+    # Nested serializers with documents, such as the emission source of a result, are prefetched as well
+    prefetch_documents(objects)
+    for field in serializer.fields.values():
+        if isinstance(field, BaseDocumentSerializer):
+            related = []
+            for obj in objects:
+                try:
+                    related.append(field.get_attribute(obj))
+                except (AttributeError, KeyError):
+                    continue
+            prefetch_serializer_documents(field, [obj for obj in related if obj is not None])
+
+
+class DocumentListSerializer(serializers.ListSerializer):
+    """
+    List serializer of ``BaseDocumentSerializer`` subclasses, loads the documents of the whole list up front so the
+    rows do not query them one by one. Set it as ``Meta.list_serializer_class``.
+    """
+
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, models.Manager) else data)
+        prefetch_serializer_documents(self.child, objects)
+        return super().to_representation(objects)
+
+
 class BaseDocumentSerializer(serializers.ModelSerializer):
     documents = serializers.SerializerMethodField(read_only=True)
 
     @extend_schema_field(DocumentSerializer(many=True, read_only=True, allow_null=True))
     def get_documents(self, obj):
-        documents = Document.objects.for_model(obj)
+        documents = getattr(obj, 'prefetched_documents', None)
+        if documents is None:
+            documents = Document.objects.for_model(obj)
         request = self.context.get('request')
         serializer = DocumentSerializer(
             documents,
@@ -106,3 +163,35 @@ class AvatarSerializer(serializers.ModelSerializer):
             context={"request": request}
         )
         return serializer.data
+
+
+class DocumentUploadSerializer(serializers.ModelSerializer):
+    object_type = serializers.CharField(write_only=True)
+    object_pk = serializers.IntegerField(write_only=True)
+    chunk_size = serializers.SerializerMethodField()
+
+    def get_chunk_size(self, obj) -> int:
+        return settings.DOCUMENT_UPLOAD_MAX_CHUNK_SIZE
+
+    def validate_size(self, value):
+        if value <= 0 or value > settings.DOCUMENT_UPLOAD_MAX_SIZE:
+            raise ValidationError(_('el archivo debe pesar entre 1 byte y %(size)s bytes') % {
+                'size': settings.DOCUMENT_UPLOAD_MAX_SIZE
+            })
+        return value
+
+    def validate(self, data):
+        model = get_platform_object_types().get(data.pop('object_type'))
+        if model is None:
+            raise ValidationError({'object_type': _('tipo de objeto no soportado')})
+        user = self.context['request'].user
+        if not get_user_object_queryset(user, model).filter(pk=data['object_pk']).exists():
+            raise ValidationError({'object_pk': _('el objeto no existe')})
+        data['content_type'] = ContentType.objects.get_for_model(model)
+        return data
+
+    class Meta:
+        model = DocumentUpload
+        fields = ('id', 'object_type', 'object_pk', 'filename', 'title', 'tags', 'file_type', 'size', 'offset',
+                  'chunk_size', 'document', 'created', 'updated')
+        read_only_fields = ['id', 'offset', 'document', 'created', 'updated']
@@ -0,0 +1,192 @@
+import logging
+import os
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image, features
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from documents.models import Document
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+# Size of the variant stored in Document.thumbnails for the clients that only know that field
+DEFAULT_THUMBNAIL_SIZE = (300, 169)
+
+
+class UnsupportedDocument(Exception):
+    pass
+
+
+def open_pdf_first_page(file, box):
+    """
+    Render the first page of a PDF at the scale that fills ``box``. Needs pypdfium2, documents are reported as
+    unsupported when it is not installed.
+    """
+    try:
+        import pypdfium2
+    except ImportError:
+        raise UnsupportedDocument('pypdfium2 is not installed, PDF thumbnails are disabled')
+
+    pdf = pypdfium2.PdfDocument(file.read())
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        scale = max(box[0] / width, box[1] / height, 0.1)
+        return page.render(scale=scale).to_pil()
+    finally:
+        pdf.close()
+
+
+def open_source_image(document, box):
+    """
+    Open the file of a document as an image no bigger than needed for ``box``.
+
+    JPEGs are decoded with ``draft`` at a reduced DCT scale, so large photos never load at full resolution.
+    Images above ``Image.MAX_IMAGE_PIXELS`` raise ``DecompressionBombError``.
+    """
+    with document.file.open('rb') as file:
+        if file.read(5) == b'%PDF-':
+            file.seek(0)
+            return open_pdf_first_page(file, box)
+
+        file.seek(0)
+        try:
+            image = Image.open(file)
+        except Image.UnidentifiedImageError:
+            raise UnsupportedDocument(f'{document.file.name} is not an image or a PDF')
+        image.draft('RGB', box)
+        image.load()
+        return image
+
+
+def available_formats():
+    # Pillow builds without libwebp only produce the JPEG variants
+    return {
+        image_format: options for image_format, options in THUMBNAIL_FORMATS.items()
+        if image_format != 'webp' or features.check('webp')
+    }
+
+
+def encode_variant(image, size, image_format):
+    pil_format, _extension, options = THUMBNAIL_FORMATS[image_format]
+    variant = image.copy()
+    variant.thumbnail(size, reducing_gap=2.0)
+    if pil_format == 'JPEG' and variant.mode != 'RGB':
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        rgba = variant.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        variant = background
+    elif variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA')
+
+    output = BytesIO()
+    variant.save(output, format=pil_format, **options)
+    return output.getvalue()
+
+
+def generate_thumbnails(document):
+    """
+    Store every ``DOCUMENT_THUMBNAIL_SIZES`` variant of a document in JPEG and WebP.
+
+    :returns: The variants by size and format, e.g. ``{'300x169': {'jpeg': name, 'webp': name}}``.
+    """
+    sizes = [tuple(size) for size in settings.DOCUMENT_THUMBNAIL_SIZES]
+    box = (max(size[0] for size in sizes), max(size[1] for size in sizes))
+    image = open_source_image(document, box)
+
+    storage = document.file.storage
+    folder = os.path.join(os.path.dirname(document.file.name), 'thumbnails')
+    unique_id = get_random_string(length=32)
+    variants = {}
+    for size in sizes:
+        key = f'{size[0]}x{size[1]}'
+        variants[key] = {}
+        for image_format, (_pil_format, extension, _options) in available_formats().items():
+            name = os.path.join(folder, f'{unique_id}-{key}.{extension}')
+            content = encode_variant(image, size, image_format)
+            variants[key][image_format] = storage.save(name, ContentFile(content))
+    return variants
+
+
+def delete_thumbnails(document):
+    storage = document.file.storage
+    for formats in (document.thumbnail_variants or {}).values():
+        for name in formats.values():
+            storage.delete(name)
+    if document.thumbnails and document.thumbnails.name not in [
+        name for formats in (document.thumbnail_variants or {}).values() for name in formats.values()
+    ]:
+        document.thumbnails.delete(save=False)
+
+
+def claim_documents(batch_size):
+    """
+    Take documents waiting for thumbnails, plus the ones a stopped worker left processing after
+    ``DOCUMENT_THUMBNAIL_TIMEOUT`` seconds. Rows locked by other workers are skipped.
+
+    Documents left processing after ``DOCUMENT_THUMBNAIL_MAX_ATTEMPTS`` claims are marked as failed instead, so a
+    file that kills its worker is not taken forever.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.DOCUMENT_THUMBNAIL_TIMEOUT)
+    max_attempts = settings.DOCUMENT_THUMBNAIL_MAX_ATTEMPTS
+    with transaction.atomic():
+        exhausted = list(Document.objects.select_for_update(skip_locked=True).filter(
+            thumbnail_status=Document.THUMBNAIL_PROCESSING, updated__lt=stale, thumbnail_attempts__gte=max_attempts
+        ).values_list('id', flat=True))
+        if exhausted:
+            logger.warning('Thumbnails of documents %s failed after %s attempts', exhausted, max_attempts)
+            Document.objects.filter(id__in=exhausted).update(
+                thumbnail_status=Document.THUMBNAIL_FAILED, updated=timezone.now()
+            )
+
+        ids = list(Document.objects.select_for_update(skip_locked=True).filter(
+            Q(thumbnail_status=Document.THUMBNAIL_PENDING)
+            | Q(thumbnail_status=Document.THUMBNAIL_PROCESSING, updated__lt=stale,
+                thumbnail_attempts__lt=max_attempts)
+        ).order_by('id').values_list('id', flat=True)[:batch_size])
+        Document.objects.filter(id__in=ids).update(
+            thumbnail_status=Document.THUMBNAIL_PROCESSING, thumbnail_attempts=F('thumbnail_attempts') + 1,
+            updated=timezone.now()
+        )
+    return list(Document.objects.filter(id__in=ids).order_by('id'))
+
+
+def process_document(document):
+    """
+    Generate the thumbnails of a claimed document and record the outcome in ``thumbnail_status``.
+
+    The previous thumbnails are only replaced by a successful generation, a failed retry keeps them.
+    """
+    try:
+        variants = generate_thumbnails(document)
+    except UnsupportedDocument as error:
+        logger.info('No thumbnails for document %s: %s', document.id, error)
+        status = Document.THUMBNAIL_UNSUPPORTED
+    except Exception:
+        logger.exception('Error generating the thumbnails of document %s', document.id)
+        status = Document.THUMBNAIL_FAILED
+    else:
+        status = Document.THUMBNAIL_DONE
+
+    document.thumbnail_status = status
+    if status != Document.THUMBNAIL_DONE:
+        document.save(update_fields=['thumbnail_status', 'updated'])
+        return status
+
+    delete_thumbnails(document)
+    default = variants.get('{}x{}'.format(*DEFAULT_THUMBNAIL_SIZE)) or next(iter(variants.values()), {})
+    document.thumbnails.name = default.get('jpeg')
+    document.thumbnail_variants = variants
+    document.save(update_fields=['thumbnails', 'thumbnail_variants', 'thumbnail_status', 'updated'])
+    return status
@@ -0,0 +1,132 @@
+import fcntl
+import hashlib
+import mimetypes
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from documents.models import Document, DocumentBlob, DocumentUpload
+from documents.utils import is_multimedia_file
+
+CONTENT_RANGE = re.compile(r'^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+|\*)$')
+
+
+class UploadError(Exception):
+    """
+    Rejected chunk or finalization, carries the HTTP status to answer with.
+    """
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_content_range(header, upload):
+    """
+    Return the first byte and the length of the chunk described by a ``Content-Range: bytes start-end/total`` header.
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if not match:
+        raise UploadError('Content-Range must be "bytes <start>-<end>/<total>"')
+    start, end = int(match['start']), int(match['end'])
+    if match['total'] != '*' and int(match['total']) != upload.size:
+        raise UploadError(f'The total size does not match the {upload.size} bytes declared for the upload')
+    if end < start or end >= upload.size:
+        raise UploadError(f'Range {start}-{end} is outside of the {upload.size} bytes of the upload', 416)
+    length = end - start + 1
+    if length > settings.DOCUMENT_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks can not be bigger than {settings.DOCUMENT_UPLOAD_MAX_CHUNK_SIZE} bytes', 413)
+    return start, length
+
+
+def write_chunk(upload, stream, start, length):
+    """
+    Append ``length`` bytes read from ``stream`` to the partial file of an upload.
+
+    The body is copied in ``DOCUMENT_UPLOAD_BUFFER_SIZE`` pieces so a chunk is never held in memory. Chunks of the
+    same upload are serialized with a lock on the partial file, and a chunk must start at the stored offset. If the
+    connection drops the bytes already written are kept and the client resumes from the new offset.
+
+    :returns: The offset after the chunk.
+    """
+    path = upload.part_path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab+') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        offset = DocumentUpload.objects.values_list('offset', flat=True).get(id=upload.id)
+        if start != offset:
+            raise UploadError(f'The upload continues at byte {offset}', 409)
+
+        # Bytes past the offset come from a write that died before it was recorded
+        file.truncate(offset)
+        written = 0
+        try:
+            while written < length:
+                data = stream.read(min(settings.DOCUMENT_UPLOAD_BUFFER_SIZE, length - written))
+                if not data:
+                    break
+                file.write(data)
+                written += len(data)
+        finally:
+            file.flush()
+            upload.offset = offset + written
+            DocumentUpload.objects.filter(id=upload.id).update(offset=upload.offset, updated=timezone.now())
+
+    if written < length:
+        raise UploadError(f'The body ended after {written} of {length} bytes, continue at byte {upload.offset}')
+    return upload.offset
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(settings.DOCUMENT_UPLOAD_BUFFER_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload_id):
+    """
+    Store the complete file of an upload as a blob and create the ``Document``. A new content is renamed into the
+    blob storage, a known one is dropped, so finalizing never copies the file.
+    """
+    with transaction.atomic():
+        upload = DocumentUpload.objects.select_for_update().get(id=upload_id)
+        if upload.document_id:
+            return upload.document
+        if not upload.is_complete:
+            raise UploadError(f'Only {upload.offset} of {upload.size} bytes have been received', 409)
+
+        file_type = upload.file_type or mimetypes.guess_type(upload.filename)[0]
+        sha256 = file_sha256(upload.part_path)
+        blob = DocumentBlob.objects.acquire_path(upload.part_path, sha256, upload.filename)
+        document = Document.objects.create(
+            content_type=upload.content_type,
+            object_pk=upload.object_pk,
+            user_created=upload.user,
+            title=upload.title,
+            tags=upload.tags,
+            size=upload.size,
+            file_type=file_type,
+            is_multimedia=is_multimedia_file(file_type),
+            file=blob.file.name,
+            blob=blob,
+            sha256=sha256,
+            original_filename=get_valid_filename(upload.filename),
+        )
+
+        upload.document = document
+        upload.save(update_fields=['document', 'updated'])
+    return document
+
+
+def expired_uploads():
+    """
+    Unfinished uploads without chunks for ``DOCUMENT_UPLOAD_EXPIRATION`` seconds.
+    """
+    limit = timezone.now() - timedelta(seconds=settings.DOCUMENT_UPLOAD_EXPIRATION)
+    return DocumentUpload.objects.filter(document__isnull=True, updated__lt=limit)
@@ -1,10 +1,17 @@
 from django.urls import path, include
 from rest_framework import routers
-from documents.api import DocumentViewSet
+from documents.api import DocumentViewSet, DocumentUploadViewSet
+from documents.views import DocumentDownloadView
 
 documents_router = routers.DefaultRouter()
+# Registered before the documents so "uploads/" is not taken as a document id
+documents_router.register("uploads", DocumentUploadViewSet, basename="document-upload")
 documents_router.register("", DocumentViewSet, basename="")
 
 api_urls = ([
     path('', include(documents_router.urls)),
 ], 'documents')
+
+urlpatterns = [
+    path('<int:pk>/download/', DocumentDownloadView.as_view(), name='documents_document_download'),
+]
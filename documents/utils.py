@@ -96,6 +96,11 @@ def is_multimedia_file(mime_type: str):
     return False
 
 
+def is_thumbnail_source(mime_type: str):
+    """ Images and PDFs get thumbnails, every other known type is skipped by the thumbnail worker. """
+    return mime_type.startswith('image/') or mime_type == 'application/pdf'
+
+
 def get_file_type(mime_type: str):
     if mime_type and type(mime_type) == str:
         if mime_type in DOCUMENT_MIME_TYPE:
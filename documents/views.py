@@ -1,3 +1,30 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from rest_framework.views import APIView
+from documents.downloads import serve_document
+from documents.models import Document
+from main.contrib.mixins import UserCreateMixinViewSet
 
-# Create your views here.
+
+class DocumentDownloadView(UserCreateMixinViewSet, APIView):
+    """
+    Download of a document after checking the user can read it, the transfer is handed to the web server when a
+    sendfile backend is configured.
+    """
+
+    @extend_schema(
+        tags=['Documents'],
+        summary='Descarga un documento',
+        parameters=[
+            OpenApiParameter(
+                name='inline',
+                description='Muestra el archivo en el navegador en lugar de descargarlo',
+                type=OpenApiTypes.BOOL,
+                location=OpenApiParameter.QUERY),
+        ],
+        responses={(200, 'application/octet-stream'): OpenApiTypes.BINARY},
+    )
+    def get(self, request, pk):
+        document = get_object_or_404(self.get_user_queryset(Document), pk=pk)
+        return serve_document(request, document, as_attachment='inline' not in request.query_params)
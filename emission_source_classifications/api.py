@@ -1,4 +1,6 @@
-from django.utils.text import slugify
+import json
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, permissions
@@ -6,18 +8,21 @@ from rest_framework.generics import GenericAPIView, get_object_or_404
 from rest_framework.mixins import ListModelMixin, CreateModelMixin
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework import status
 from companies.models import EmissionsSource
-from emissions.utils import calculate_emission
+from emissions.utils import calculate_factor_emissions, calculate_batch_emissions
 from .models import QuantificationType, GHGScope, ISOCategory, EmissionSourceGroup, CommonEquipment, CommonActivity, \
     CommonProduct, Investment
+from .search import search_queryset
 from .serializers import (
     QuantificationTypeSerializer,
     GHGScopeSerializer,
     ISOCategorySerializer,
     EmissionSourceGroupListSerializer, EmissionSourceGroupDetailSerializer, CommonEquipmentSerializer, \
     CommonActivitySerializer, CommonProductSerializer,
-    InvestmentSerializer, EmissionCalculationResultSerializer, EmissionCalculationInputSerializer
+    InvestmentSerializer, EmissionCalculationResultSerializer, EmissionCalculationInputSerializer, \
+    EmissionCalculationBatchInputSerializer, EmissionCalculationBatchResultSerializer
 )
 from emissions.serializers import FactorTypeSerializer
 from django.utils.translation import gettext_lazy as _
@@ -82,7 +87,6 @@ class BaseSearchViewSet(ListModelMixin, viewsets.GenericViewSet, CreateModelMixi
     Clase base para ViewSets con funcionalidad de búsqueda.
     """
     search_param = 'search'
-    search_field = 'normalized_name__icontains'
 
     @extend_schema(
         summary=_("Buscar por un texto"),
@@ -93,15 +97,32 @@ class BaseSearchViewSet(ListModelMixin, viewsets.GenericViewSet, CreateModelMixi
                 type=OpenApiTypes.STR,
                 location=OpenApiParameter.QUERY,
             ),
+            OpenApiParameter(
+                name="limit",
+                description=_('cantidad máxima de resultados'),
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+            ),
+            OpenApiParameter(
+                name="group",
+                description=_('id del grupo de fuente de emisión, solo para los tipos de equipos'),
+                type=OpenApiTypes.INT,
+                location=OpenApiParameter.QUERY,
+            ),
         ],
     )
     @action(detail=False, methods=['get'], url_path='search')
     def search(self, request):
         query = request.query_params.get(self.search_param, '')
         if query:
-            normalized_query = slugify(query).lower()
-            filter_kwargs = {self.search_field: normalized_query}
-            results = self.get_queryset().filter(**filter_kwargs)
+            try:
+                limit = int(request.query_params.get('limit', settings.COMMON_SEARCH_LIMIT))
+                group = request.query_params.get('group')
+                group = int(group) if group else None
+            except ValueError:
+                return Response({"detail": "limit and group must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, settings.COMMON_SEARCH_MAX_LIMIT))
+            results = search_queryset(self.get_queryset(), query, limit, group)
             serializer = self.get_serializer(results, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response({"detail": "No query parameter provided."}, status=status.HTTP_400_BAD_REQUEST)
@@ -161,31 +182,93 @@ class EmissionCalculatorView(GenericAPIView):
         consumption = data['consumption']
         unit_of_measure_id = data['unit_of_measure_id']
 
-        # Get the main emission factor associated with the emission source
-        main_emission_factor = emission_source.emission_factor
+        # Calculate emissions for the main emission factor of the source and its components
+        results = calculate_factor_emissions(emission_source.emission_factor_id, consumption, unit_of_measure_id)
 
-        results = []
+        # Serialize the results and send the response
+        result_serializer = EmissionCalculationResultSerializer(results, many=True)
+        return Response(result_serializer.data, status=status.HTTP_200_OK)
 
-        # Calculate emissions for the main component
-        main_component_result = calculate_emission(
-            name=main_emission_factor.main_component_name,
-            factor=main_emission_factor,
-            consumption=consumption,
-            application_percentage=main_emission_factor.application_percentage
+
+@extend_schema(tags=['Calculator'])
+class EmissionBatchCalculatorView(GenericAPIView):
+    """
+    Calculate the emissions of many (emission source, consumption, unit) items in one request.
+
+    Items are processed in chunks: the emission sources of a chunk are resolved with one query, the factor
+    graphs come from the factor cache and the items sharing a main factor are computed together. Invalid
+    items do not fail the batch, they are returned with their errors.
+    """
+    # workaround to remove warning: Failed to obtain model through view's queryset due to raised exception
+    queryset = EmissionsSource.objects.none()
+    chunk_size = 1000
+
+    def calculate_chunk(self, items, offset):
+        """
+        Return the batch results of a chunk of raw items starting at position `offset`.
+        """
+        outputs = []
+        valid = []
+        for index, item in enumerate(items, start=offset):
+            serializer = EmissionCalculationInputSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+                outputs.append(None)
+            else:
+                outputs.append({
+                    'index': index,
+                    'emission_source_id': item.get('emission_source_id'),
+                    'results': None,
+                    'errors': serializer.errors
+                })
+
+        source_factors = dict(EmissionsSource.objects.filter(
+            id__in={data['emission_source_id'] for _, data in valid}
+        ).values_list('id', 'emission_factor_id'))
+
+        calculable = []
+        for index, data in valid:
+            source_id = data['emission_source_id']
+            if source_id not in source_factors:
+                error = {'emission_source_id': [_('La fuente de emisión no existe.')]}
+            elif source_factors[source_id] is None:
+                error = {'emission_source_id': [_('La fuente de emisión no tiene factor de emisión.')]}
+            else:
+                calculable.append((index, data))
+                continue
+            outputs[index - offset] = {'index': index, 'emission_source_id': source_id, 'results': None,
+                                       'errors': error}
+
+        calculations = calculate_batch_emissions(
+            [source_factors[data['emission_source_id']] for _, data in calculable],
+            [data['consumption'] for _, data in calculable],
+            [data['unit_of_measure_id'] for _, data in calculable]
         )
+        for (index, data), results in zip(calculable, calculations):
+            outputs[index - offset] = {
+                'index': index,
+                'emission_source_id': data['emission_source_id'],
+                'results': EmissionCalculationResultSerializer(results, many=True).data,
+                'errors': None
+            }
+        return outputs
+
+    def calculate(self, items):
+        for offset in range(0, len(items), self.chunk_size):
+            yield from self.calculate_chunk(items[offset:offset + self.chunk_size], offset)
 
-        results.append(main_component_result)
+    @extend_schema(
+        summary="Calculate emissions in batch",
+        request=EmissionCalculationBatchInputSerializer,
+        responses={200: EmissionCalculationBatchResultSerializer(many=True)}
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = EmissionCalculationBatchInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
 
-        # Calculate emissions for each subcomponent
-        for component in main_emission_factor.components.all():
-            sub_component_result = calculate_emission(
-                name=component.component_name,
-                factor=component.component_factor,
-                consumption=consumption,
-                application_percentage=component.application_percentage
-            )
-            results.append(sub_component_result)
+        if serializer.validated_data['stream']:
+            lines = (json.dumps(output, cls=JSONEncoder) + '\n' for output in self.calculate(items))
+            return StreamingHttpResponse(lines, content_type='application/x-ndjson')
 
-        # Serialize the results and send the response
-        result_serializer = EmissionCalculationResultSerializer(results, many=True)
-        return Response(result_serializer.data, status=status.HTTP_200_OK)
+        return Response(list(self.calculate(items)), status=status.HTTP_200_OK)
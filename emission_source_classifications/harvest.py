@@ -0,0 +1,123 @@
+import logging
+import threading
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from emission_source_classifications.models import parse_common_names, CommonActivity, CommonEquipment, \
+    CommonProduct, Investment
+from emission_source_classifications.search import invalidate_search_index
+
+logger = logging.getLogger(__name__)
+
+BULK_CREATE_BATCH_SIZE = 500
+
+# Emission source fields harvested into each common data model, equipment is stored with the source group
+COMMON_DATA_FIELDS = (
+    ('activity_name', CommonActivity),
+    ('equipment_name', CommonEquipment),
+    ('product_name', CommonProduct),
+    ('investment_type', Investment),
+)
+
+_local = threading.local()
+
+
+class CommonDataBatch:
+    """
+    Emission sources whose names wait to be added to the common data models.
+
+    Only the ids are kept, the names are read from the committed rows when the batch is flushed. Sources saved in a
+    transaction or savepoint that was rolled back are then either missing or back to their committed names, so they
+    never add the names of discarded data.
+
+    Attributes:
+        pending: ``{emission source model: set of ids}``.
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def add(self, instance):
+        self.pending.setdefault(type(instance), set()).add(instance.pk)
+
+    def collect(self, pending):
+        """
+        Names of the committed sources, ``{model: {normalized_name: (name, group_id)}}``, the first spelling of a
+        name wins.
+        """
+        entries = {model_class: {} for _field, model_class in COMMON_DATA_FIELDS}
+        fields = [field for field, _model_class in COMMON_DATA_FIELDS]
+        for source_model, ids in pending.items():
+            rows = source_model._default_manager.filter(id__in=ids).values_list('group_id', *fields)
+            for group_id, *values in rows.iterator():
+                for (_field, model_class), value in zip(COMMON_DATA_FIELDS, values):
+                    for name in parse_common_names(value):
+                        normalized_name = slugify(name).lower()
+                        if normalized_name:
+                            entries[model_class].setdefault(normalized_name, (name, group_id))
+        return entries
+
+    def flush(self):
+        """
+        Insert the names that do not exist yet, one lookup and one ``bulk_create`` per model.
+
+        Names are matched on ``normalized_name`` alone, so equipment already known in another group is not added
+        again. Rows inserted meanwhile by another process are skipped by ``ignore_conflicts``.
+        """
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        try:
+            collected = self.collect(pending)
+        except Exception:
+            # Runs after the commit, the saved emission sources must not fail because of the harvesting
+            logger.exception('Error reading the common data names of the emission sources')
+            return
+
+        for model_class, entries in collected.items():
+            if not entries:
+                continue
+            try:
+                existing = set(model_class.objects.filter(
+                    normalized_name__in=list(entries)
+                ).values_list('normalized_name', flat=True))
+                has_group = any(field.name == 'group' for field in model_class._meta.fields)
+                objects = [
+                    model_class(
+                        name=name, normalized_name=normalized_name, **({'group_id': group_id} if has_group else {})
+                    )
+                    for normalized_name, (name, group_id) in entries.items()
+                    if normalized_name not in existing
+                ]
+                if objects:
+                    model_class.objects.bulk_create(
+                        objects, batch_size=BULK_CREATE_BATCH_SIZE, ignore_conflicts=True
+                    )
+                    # bulk_create sends no post_save, the autocomplete indexes are refreshed here
+                    invalidate_search_index(model_class)
+            except Exception:
+                logger.exception('Error adding the common data names of %s', model_class._meta.label)
+
+
+def queue_common_data(instance):
+    """
+    Add the activity, equipment, product and investment names of an emission source to the common data models once
+    the current transaction commits.
+
+    Every source saved by a thread, such as the rows of an import, goes to the same ``CommonDataBatch``. Each save
+    registers its own ``on_commit`` callback, so Django drops it with its savepoint or transaction; the first one
+    that runs flushes the whole batch and the following ones find it empty. Outside of a transaction the batch is
+    flushed right away.
+
+    :param instance: The saved ``EmissionsSource``.
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch is None:
+        batch = _local.batch = CommonDataBatch()
+    batch.add(instance)
+
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(batch.flush)
+    else:
+        batch.flush()
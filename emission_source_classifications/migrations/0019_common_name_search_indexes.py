@@ -0,0 +1,48 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:57
+
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emission_source_classifications', '0018_alter_commonequipment_normalized_name_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='commonactivity',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized_name'], name='commonactivity_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='commonactivity',
+            index=models.Index(fields=['normalized_name'], name='commonactivity_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='commonequipment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized_name'], name='commonequipment_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='commonequipment',
+            index=models.Index(fields=['normalized_name'], name='commonequipment_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='commonproduct',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized_name'], name='commonproduct_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='commonproduct',
+            index=models.Index(fields=['normalized_name'], name='commonproduct_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='investment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['normalized_name'], name='investment_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='investment',
+            index=models.Index(fields=['normalized_name'], name='investment_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -1,9 +1,13 @@
 import json
-from django.db import models, IntegrityError
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from emissions.models import EmissionFactor, FactorType
 from ckeditor.fields import RichTextField
 from django.utils.text import slugify
+from emission_source_classifications.search import invalidate_search_index
 
 
 class QuantificationType(models.Model):
@@ -212,6 +216,10 @@ class CommonEquipment(CommonModel):
         verbose_name_plural = _('Tipos de Maquinarías/Equipos')
         unique_together = (('group', 'normalized_name'),)
         ordering = ('name',)
+        indexes = [
+            GinIndex(fields=['normalized_name'], name='commonequipment_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['normalized_name'], name='commonequipment_name_prefix', opclasses=['varchar_pattern_ops']),
+        ]
 
 
 class CommonActivity(CommonModel):
@@ -219,6 +227,10 @@ class CommonActivity(CommonModel):
         verbose_name = _('Tipo de Actividad')
         verbose_name_plural = _('Tipos de Actividades')
         ordering = ('name',)
+        indexes = [
+            GinIndex(fields=['normalized_name'], name='commonactivity_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['normalized_name'], name='commonactivity_name_prefix', opclasses=['varchar_pattern_ops']),
+        ]
 
 
 class CommonProduct(CommonModel):
@@ -226,6 +238,10 @@ class CommonProduct(CommonModel):
         ordering = ('name',)
         verbose_name = _('Tipo de Producto')
         verbose_name_plural = _('Tipos de Productos')
+        indexes = [
+            GinIndex(fields=['normalized_name'], name='commonproduct_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['normalized_name'], name='commonproduct_name_prefix', opclasses=['varchar_pattern_ops']),
+        ]
 
 
 class Investment(CommonModel):
@@ -233,20 +249,26 @@ class Investment(CommonModel):
         ordering = ('name',)
         verbose_name = _('Tipo de Inversion')
         verbose_name_plural = _('Tipos de Inversiones')
+        indexes = [
+            GinIndex(fields=['normalized_name'], name='investment_name_trgm', opclasses=['gin_trgm_ops']),
+            models.Index(fields=['normalized_name'], name='investment_name_prefix', opclasses=['varchar_pattern_ops']),
+        ]
 
 
-def create_or_get_common_data(model_class, name_field, instance_field, group=None):
-    """
-    Creates or retrieves instances in the specified model based on the provided names.
+@receiver([post_save, post_delete], sender=CommonEquipment)
+@receiver([post_save, post_delete], sender=CommonActivity)
+@receiver([post_save, post_delete], sender=CommonProduct)
+@receiver([post_save, post_delete], sender=Investment)
+def invalidate_common_search(sender, **kwargs):
+    invalidate_search_index(sender)
 
-    :param model_class: The Django model in which the instances are to be created or retrieved.
-    :param name_field: The field in the model where the name will be stored.
-    :param instance_field: The field in the instance containing the name or list of names.
-    :param group: (Optional) The group to which the instance belongs.
-    """
 
+def parse_common_names(instance_field):
+    """
+    Names stored in an emission source field, either a single name or a JSON list of names.
+    """
     if not instance_field:
-        return
+        return []
 
     try:
         names = json.loads(instance_field)
@@ -254,17 +276,4 @@ def create_or_get_common_data(model_class, name_field, instance_field, group=Non
             names = [instance_field]
     except json.JSONDecodeError:
         names = [instance_field]
-
-    for name in names:
-        normalized_name = slugify(name).lower()
-        defaults = {name_field: name}
-        if group:
-            defaults['group'] = group
-
-        try:
-            model_class.objects.get_or_create(
-                normalized_name=normalized_name,
-                defaults=defaults
-            )
-        except IntegrityError:
-            pass
+    return [str(name) for name in names if name]
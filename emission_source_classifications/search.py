@@ -0,0 +1,219 @@
+import logging
+from bisect import bisect_left
+from collections import Counter
+from threading import Lock, Thread
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+from django.utils.text import slugify
+
+from main.cache import get_cache_version, bump_cache_version
+
+logger = logging.getLogger(__name__)
+
+# Queries shorter than a trigram only match name prefixes
+MIN_TRIGRAM_LENGTH = 3
+# Share of the query trigrams a name needs to be returned as a fuzzy match
+FUZZY_THRESHOLD = 0.5
+
+MATCH_PREFIX = 0
+MATCH_WORD_PREFIX = 1
+MATCH_CONTAINS = 2
+MATCH_FUZZY = 3
+
+
+def normalize_query(query):
+    # Same normalization as CommonModel.normalized_name
+    return slugify(query).lower()
+
+
+def search_cache_name(model):
+    return f'common_search:{model._meta.label_lower}'
+
+
+def invalidate_search_index(model):
+    """
+    Discard the in-process indexes of ``model`` in every process.
+    """
+    bump_cache_version(search_cache_name(model))
+
+
+def trigrams(text):
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    In memory trigram index of the normalized names of a common data model, used where PostgreSQL and pg_trgm are
+    not available.
+
+    Names are kept sorted so short queries are answered with a binary search on the prefix, longer ones intersect
+    the posting lists of their trigrams.
+
+    Attributes:
+        entries: ``(normalized_name, id, group_id)`` sorted by name.
+        postings: Positions in ``entries`` of the names containing each trigram.
+    """
+
+    def __init__(self, entries):
+        self.entries = sorted(entries)
+        self.names = [entry[0] for entry in self.entries]
+        self.postings = {}
+        for position, (name, _id, _group_id) in enumerate(self.entries):
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, []).append(position)
+
+    @classmethod
+    def build(cls, queryset):
+        has_group = any(field.name == 'group' for field in queryset.model._meta.fields)
+        fields = ('normalized_name', 'id', 'group_id') if has_group else ('normalized_name', 'id')
+        return cls(
+            row if has_group else row + (None,)
+            for row in queryset.order_by().values_list(*fields).iterator()
+        )
+
+    def prefix_positions(self, query):
+        position = bisect_left(self.names, query)
+        while position < len(self.names) and self.names[position].startswith(query):
+            yield position
+            position += 1
+
+    def search(self, query, limit, group=None):
+        """
+        Ids of the best matches of a normalized query, ranked like ``search_queryset`` does in PostgreSQL.
+        """
+        def allowed(position):
+            return group is None or self.entries[position][2] == group
+
+        if len(query) < MIN_TRIGRAM_LENGTH:
+            ids = []
+            for position in self.prefix_positions(query):
+                if allowed(position):
+                    ids.append(self.entries[position][1])
+                    if len(ids) == limit:
+                        break
+            return ids
+
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+
+        ranked = []
+        for position, count in shared.items():
+            score = count / len(query_trigrams)
+            if score < FUZZY_THRESHOLD or not allowed(position):
+                continue
+            name = self.entries[position][0]
+            if name.startswith(query):
+                match = MATCH_PREFIX
+            elif f'-{query}' in name:
+                match = MATCH_WORD_PREFIX
+            elif query in name:
+                match = MATCH_CONTAINS
+            else:
+                match = MATCH_FUZZY
+            ranked.append((match, -score, len(name), name, self.entries[position][1]))
+        ranked.sort()
+        return [item[-1] for item in ranked[:limit]]
+
+
+class _IndexSlot:
+    """
+    Index of a model in this process and the cache version it was built for.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.index = None
+        self.refreshing = False
+        self.build_lock = Lock()
+
+
+_indexes = {}
+_lock = Lock()
+
+
+def _refresh_index(model, slot, version):
+    try:
+        index = TrigramIndex.build(model._default_manager.all())
+        with _lock:
+            slot.index, slot.version = index, version
+    except Exception:
+        logger.exception('Error building the search index of %s', model._meta.label)
+    finally:
+        with _lock:
+            slot.refreshing = False
+        connection.close()
+
+
+def get_search_index(queryset):
+    """
+    Trigram index of a model, built on first use in each process.
+
+    When the cache version changes the index is built again in a background thread and the previous one keeps
+    answering meanwhile, so a save, or a burst of them, never makes a keystroke wait for a rebuild. Only the first
+    search of a model in a process builds its index in the request, without blocking the other models.
+    """
+    model = queryset.model
+    version = get_cache_version(search_cache_name(model))
+    with _lock:
+        slot = _indexes.setdefault(model, _IndexSlot())
+        if slot.index is not None:
+            if slot.version != version and not slot.refreshing:
+                slot.refreshing = True
+                Thread(target=_refresh_index, args=(model, slot, version), daemon=True).start()
+            return slot.index
+
+    with slot.build_lock:
+        if slot.index is None:
+            index = TrigramIndex.build(model._default_manager.all())
+            with _lock:
+                slot.index, slot.version = index, version
+    return slot.index
+
+
+def search_queryset(queryset, query, limit, group=None):
+    """
+    Autocomplete over the normalized names of ``CommonModel`` subclasses.
+
+    Names starting with the query come first, then names with a word starting with it, names containing it and
+    finally close misspellings, each tier ordered by trigram similarity and length. On PostgreSQL the candidates come
+    from the trigram and ``varchar_pattern_ops`` indexes, other databases use an in-process ``TrigramIndex``.
+
+    :param queryset: Queryset of the model to search.
+    :param query: Text typed by the user.
+    :param limit: Maximum number of results.
+    :param group: Optional ``EmissionSourceGroup`` id, only applied to models with a group.
+    :returns: The matching objects in rank order.
+    """
+    query = normalize_query(query)
+    if not query:
+        return []
+    has_group = any(field.name == 'group' for field in queryset.model._meta.fields)
+    group = group if has_group else None
+
+    if connection.vendor != 'postgresql':
+        ids = get_search_index(queryset).search(query, limit, group)
+        objects = queryset.in_bulk(ids)
+        return [objects[pk] for pk in ids if pk in objects]
+
+    if group is not None:
+        queryset = queryset.filter(group_id=group)
+    if len(query) < MIN_TRIGRAM_LENGTH:
+        return list(queryset.filter(normalized_name__startswith=query).order_by('normalized_name')[:limit])
+
+    return list(queryset.filter(
+        Q(normalized_name__contains=query) | Q(normalized_name__trigram_word_similar=query)
+    ).annotate(
+        match=Case(
+            When(normalized_name__startswith=query, then=Value(MATCH_PREFIX)),
+            When(normalized_name__contains=f'-{query}', then=Value(MATCH_WORD_PREFIX)),
+            When(normalized_name__contains=query, then=Value(MATCH_CONTAINS)),
+            default=Value(MATCH_FUZZY),
+            output_field=IntegerField(),
+        ),
+        similarity=TrigramWordSimilarity(query, 'normalized_name'),
+    ).order_by('match', '-similarity', Length('normalized_name'), 'normalized_name')[:limit])
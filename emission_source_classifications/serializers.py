@@ -89,3 +89,24 @@ class EmissionCalculationResultSerializer(serializers.Serializer):
     co2e = serializers.FloatField()
     results = EmissionCalculationResultDetailSerializer(many=True)
 
+
+class EmissionCalculationBatchInputSerializer(serializers.Serializer):
+    MAX_ITEMS = 5000
+    MAX_STREAM_ITEMS = 100000
+
+    items = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    stream = serializers.BooleanField(default=False, help_text='Return the results as NDJSON, one line per item')
+
+    def validate(self, attrs):
+        max_items = self.MAX_STREAM_ITEMS if attrs['stream'] else self.MAX_ITEMS
+        if len(attrs['items']) > max_items:
+            raise serializers.ValidationError({'items': f'Ensure this field has no more than {max_items} elements.'})
+        return attrs
+
+
+class EmissionCalculationBatchResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    emission_source_id = serializers.IntegerField(allow_null=True)
+    results = EmissionCalculationResultSerializer(many=True, allow_null=True)
+    errors = serializers.DictField(allow_null=True)
+
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from emission_source_classifications.api import QuantificationTypeViewSet, GHGScopeViewSet, ISOCategoryViewSet, \
     EmissionSourceGroupViewSet, CommonEquipmentViewSet, CommonActivityViewSet, CommonProductViewSet, InvestmentViewSet, \
-    EmissionCalculatorView
+    EmissionCalculatorView, EmissionBatchCalculatorView
 
 router = DefaultRouter()
 
@@ -21,5 +21,6 @@ app_name = 'classifications'
 api_urls = ([
     path('', include(router.urls)),
     path('calculate/', EmissionCalculatorView.as_view(), name='calculate-emissions'),
+    path('calculate/batch/', EmissionBatchCalculatorView.as_view(), name='calculate-emissions-batch'),
 ], 'classifications')
 
@@ -105,7 +105,8 @@ class EmissionsResultFilter(filters.FilterSet):
 @extend_schema(tags=['EmissionsResults'])
 class EmissionResultViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = EmissionResult.objects.all().select_related(
-        'emission_source', 'location', 'unit').prefetch_related('total_emissions_gas')
+        'emission_source', 'location', 'unit').prefetch_related(
+        'total_emissions_gas__greenhouse_gas', 'gas_details__greenhouse_gas', 'co2_by_component')
     serializer_class = EmissionResultDetailSerializer
     permission_classes = [IsAuthenticated]
     filterset_class = EmissionsResultFilter
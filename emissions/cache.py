@@ -0,0 +1,136 @@
+from threading import Lock
+from typing import TypedDict, List, Optional
+from django.db import transaction
+from django.db.models import Prefetch
+from main.cache import get_cache_version, bump_cache_version
+
+FACTOR_CACHE = 'emission_factors'
+
+
+class CompiledGas(TypedDict):
+    gas_id: int
+    gas_name: str
+    gas: str
+    kg_co2_equivalence: float
+    value: float
+    uncertainty: float
+
+
+class CompiledComponent(TypedDict):
+    component_name: str
+    factor_id: int
+    application_percentage: float
+
+
+class CompiledFactor(TypedDict):
+    factor: 'EmissionFactor'  # noqa
+    gases: List[CompiledGas]
+    components: List[CompiledComponent]
+
+
+_compiled_factors = {}
+_compiled_version = None
+_lock = Lock()
+
+
+def _compile_factors(factor_ids) -> dict:
+    """
+    Load the given emission factors with their gases and components in a fixed number of queries.
+    """
+    from emissions.models import EmissionFactor, GreenhouseGasEmission
+
+    factors = EmissionFactor.objects.filter(id__in=factor_ids).prefetch_related(
+        Prefetch(
+            'greenhouse_emission_gases',
+            queryset=GreenhouseGasEmission.objects.select_related('greenhouse_gas').order_by('id')
+        ),
+        'components'
+    )
+
+    compiled = {}
+    for factor in factors:
+        compiled[factor.id] = {
+            'factor': factor,
+            'gases': [
+                {
+                    'gas_id': gas_emission.greenhouse_gas_id,
+                    'gas_name': gas_emission.greenhouse_gas.name,
+                    'gas': gas_emission.greenhouse_gas.acronym,
+                    'kg_co2_equivalence': gas_emission.greenhouse_gas.kg_co2_equivalence,
+                    'value': gas_emission.value,
+                    'uncertainty': gas_emission.percentage_uncertainty,
+                }
+                for gas_emission in factor.greenhouse_emission_gases.all()
+                if gas_emission.value != 0
+            ],
+            'components': [
+                {
+                    'component_name': component.component_name,
+                    'factor_id': component.component_factor_id,
+                    'application_percentage': component.application_percentage,
+                }
+                for component in sorted(factor.components.all(), key=lambda item: item.id)
+            ],
+        }
+    return compiled
+
+
+def _current_factors() -> dict:
+    """
+    Compiled factors of the current cache version.
+    """
+    global _compiled_factors, _compiled_version
+
+    version = get_cache_version(FACTOR_CACHE)
+    with _lock:
+        if version != _compiled_version:
+            _compiled_factors = {}
+            _compiled_version = version
+        return _compiled_factors
+
+
+def get_compiled_factors(factor_ids) -> dict:
+    """
+    Return the compiled graphs of many emission factors, loading the missing ones and their components
+    with a bounded number of queries.
+
+    :param factor_ids: Iterable of emission factor ids.
+    """
+    compiled_factors = _current_factors()
+    factor_ids = set(factor_ids)
+
+    missing = [factor_id for factor_id in factor_ids if factor_id not in compiled_factors]
+    if missing:
+        loaded = _compile_factors(missing)
+        component_ids = {
+            component['factor_id'] for compiled in loaded.values() for component in compiled['components']
+        }
+        missing_components = [
+            component_id for component_id in component_ids
+            if component_id not in loaded and component_id not in compiled_factors
+        ]
+        if missing_components:
+            loaded.update(_compile_factors(missing_components))
+        compiled_factors.update(loaded)
+
+    return {factor_id: compiled_factors[factor_id] for factor_id in factor_ids if factor_id in compiled_factors}
+
+
+def get_compiled_factor(factor_id) -> Optional[CompiledFactor]:
+    """
+    Return the compiled graph of an emission factor, loading it and its components on a cache miss.
+
+    The compiled factors live in the process memory and are discarded as a whole when the
+    'emission_factors' cache version changes (see invalidate_factor_cache).
+
+    :param factor_id: The emission factor id.
+    """
+    return get_compiled_factors([factor_id]).get(factor_id)
+
+
+def invalidate_factor_cache(**kwargs):
+    """
+    Signal receiver discarding the compiled factors of every process. The version changes after the commit, so no
+    process compiles the rows being replaced under the new version.
+    """
+    transaction.on_commit(lambda: bump_cache_version(FACTOR_CACHE))
@@ -1,6 +1,9 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
+from emissions.cache import invalidate_factor_cache
 from main.models import UnitOfMeasure, MEASURE_TYPE_CHOICES, MEASURE_TYPE_UNKNOWN
 
 
@@ -476,3 +479,10 @@ class Co2ByComponent(models.Model):
     def __str__(self):
         return f'{self.emission_factor.name} ({self.co2e})'
 
+
+@receiver([post_save, post_delete], sender=GreenhouseGas)
+@receiver([post_save, post_delete], sender=EmissionFactor)
+@receiver([post_save, post_delete], sender=EmissionFactorComponent)
+@receiver([post_save, post_delete], sender=GreenhouseGasEmission)
+def invalidate_compiled_factors(sender, **kwargs):
+    invalidate_factor_cache()
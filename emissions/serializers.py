@@ -2,7 +2,7 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from companies.serializers import EmissionsSourceSerializer
-from documents.serializer import BaseDocumentSerializer
+from documents.serializer import BaseDocumentSerializer, DocumentListSerializer
 from emissions.models import GreenhouseGas, SourceType, FactorType, EmissionFactor, GreenhouseGasEmission, \
      EmissionFactorComponent, EmissionGasDetail, EmissionResult, TotalEmissionGas, Co2ByComponent
 from main.serializer import UnitOfMeasureSerializer
@@ -97,6 +97,7 @@ class EmissionResultSerializer(BaseDocumentSerializer):
 
     class Meta:
         model = EmissionResult
+        list_serializer_class = DocumentListSerializer
         fields = [
             'id',
             'name',
@@ -214,6 +215,7 @@ class EmissionResultDetailSerializer(BaseDocumentSerializer):
 
     class Meta:
         model = EmissionResult
+        list_serializer_class = DocumentListSerializer
         fields = [
             'id',
             'name',
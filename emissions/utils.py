@@ -1,6 +1,8 @@
 from typing import TypedDict, List
-
+import numpy as np
+from emissions.cache import get_compiled_factor, get_compiled_factors, CompiledFactor
 from emissions.models import EmissionFactor
+from main.units import get_unit_converter
 
 
 class EmissionResult(TypedDict):
@@ -24,6 +26,8 @@ def calculate_emission(name, factor: EmissionFactor, consumption,
     """
     Calculate emissions for a given emission factor.
 
+    The gases of the factor are read from the compiled factor cache (emissions.cache).
+
     Parameters:
     - name (str): The name of the component or main factor.
     - factor (EmissionFactor): The emission factor object to be used for calculations.
@@ -37,30 +41,30 @@ def calculate_emission(name, factor: EmissionFactor, consumption,
     total_co2e = 0
     results = []
 
+    compiled = get_compiled_factor(factor.id)
+    gases = compiled['gases'] if compiled else []
+
     # Calculate emissions for each greenhouse gas associated with the emission factor
-    for gas_emission_factor in factor.greenhouse_emission_gases.all():
-        if gas_emission_factor.value != 0:
-            # Get gas data
-            gas_emission = gas_emission_factor.greenhouse_gas
-            # Get emission factor value and uncertainty
-            factor_value = gas_emission_factor.value
-            uncertainty = gas_emission_factor.percentage_uncertainty
-
-            # Calculate CO2e and GWP (Global Warming Potential)
-            co2e = consumption * factor_value * application_percentage
-            gwp = gas_emission.kg_co2_equivalence * co2e
-
-            total_co2e = total_co2e + gwp
-
-            # Append results for the current gas
-            results.append({
-                'gas_name': gas_emission.name,
-                'gas': gas_emission.acronym,
-                'value': factor_value,
-                'co2e': co2e,
-                'uncertainty': uncertainty,
-                'gwp': gwp
-            })
+    for gas_emission_factor in gases:
+        # Get emission factor value and uncertainty
+        factor_value = gas_emission_factor['value']
+        uncertainty = gas_emission_factor['uncertainty']
+
+        # Calculate CO2e and GWP (Global Warming Potential)
+        co2e = consumption * factor_value * application_percentage
+        gwp = gas_emission_factor['kg_co2_equivalence'] * co2e
+
+        total_co2e = total_co2e + gwp
+
+        # Append results for the current gas
+        results.append({
+            'gas_name': gas_emission_factor['gas_name'],
+            'gas': gas_emission_factor['gas'],
+            'value': factor_value,
+            'co2e': co2e,
+            'uncertainty': uncertainty,
+            'gwp': gwp
+        })
 
     # Return the final results including the total CO2e for the component
     return {
@@ -70,3 +74,185 @@ def calculate_emission(name, factor: EmissionFactor, consumption,
         'co2e': total_co2e
     }
 
+
+def normalize_factor_consumption(consumptions, unit_ids, factor_ids) -> np.ndarray:
+    """
+    Convert consumptions into the unit of their main emission factor.
+
+    Consumptions whose unit can not be converted to the factor unit, such as units without scale, are returned
+    unchanged.
+
+    Parameters:
+    - consumptions (list): The consumption of each item.
+    - unit_ids (list): The unit of measure id of each consumption.
+    - factor_ids (list): The main emission factor id of each item.
+    """
+    compiled_factors = get_compiled_factors(factor_ids)
+    factor_unit_ids = [
+        compiled_factors[factor_id]['factor'].unit_id if factor_id in compiled_factors else None
+        for factor_id in factor_ids
+    ]
+    return get_unit_converter().normalize(consumptions, unit_ids, factor_unit_ids)
+
+
+def calculate_factor_emissions(factor_id, consumption, unit_id=None) -> List[EmissionCalculation]:
+    """
+    Calculate the emissions of a main emission factor and each of its components.
+
+    Parameters:
+    - factor_id (int): The id of the main emission factor.
+    - consumption (float): The amount of consumption for the emission source.
+    - unit_id (int): The unit of the consumption, converted into the unit of the factor when given.
+
+    Returns:
+    - list: The calculation of the main component followed by one calculation per subcomponent.
+    """
+    if unit_id is not None:
+        consumption = float(normalize_factor_consumption([consumption], [unit_id], [factor_id])[0])
+    compiled = get_compiled_factor(factor_id)
+    if compiled is None:
+        raise EmissionFactor.DoesNotExist(f'Emission factor {factor_id} does not exist.')
+
+    main_emission_factor = compiled['factor']
+    results = [calculate_emission(
+        name=main_emission_factor.main_component_name,
+        factor=main_emission_factor,
+        consumption=consumption,
+        application_percentage=main_emission_factor.application_percentage
+    )]
+
+    # Calculate emissions for each subcomponent
+    for component in compiled['components']:
+        component_factor = get_compiled_factor(component['factor_id'])['factor']
+        results.append(calculate_emission(
+            name=component['component_name'],
+            factor=component_factor,
+            consumption=consumption,
+            application_percentage=component['application_percentage']
+        ))
+
+    return results
+
+
+class FactorMatrix(object):
+    """
+    Vectorized form of a compiled main emission factor and its components.
+
+    Each column is one (component factor, gas) pair of the factor graph, in the order used by
+    calculate_factor_emissions. For a consumption vector `c` the CO₂e by column is the outer product
+    `c ⊗ coefficients`, and the totals by gas are that matrix times the column -> gas indicator matrix.
+    """
+
+    def __init__(self, compiled: CompiledFactor, components: dict = None):
+        """
+        :param compiled: The compiled main emission factor.
+        :param components: Compiled component factors by id, read from the factor cache when missing.
+        """
+        if compiled is None:
+            raise EmissionFactor.DoesNotExist('Emission factor does not exist.')
+
+        components = components or {}
+        main_factor = compiled['factor']
+        self.components = [(main_factor.main_component_name, compiled, main_factor.application_percentage)]
+        for component in compiled['components']:
+            component_factor = components.get(component['factor_id']) or get_compiled_factor(component['factor_id'])
+            self.components.append(
+                (component['component_name'], component_factor, component['application_percentage'])
+            )
+
+        self.columns = []
+        component_columns = []
+        coefficients = []
+        for position, (_, component_factor, application_percentage) in enumerate(self.components):
+            for gas in component_factor['gases']:
+                self.columns.append(dict(gas, factor_id=component_factor['factor'].id))
+                component_columns.append(position)
+                coefficients.append(gas['value'] * application_percentage)
+
+        self.coefficients = np.array(coefficients, dtype=float)
+        self.gwp = np.array([gas['kg_co2_equivalence'] for gas in self.columns], dtype=float)
+        self.values = np.array([gas['value'] for gas in self.columns], dtype=float)
+
+        self.gas_ids = list(dict.fromkeys(gas['gas_id'] for gas in self.columns))
+        self.gas_matrix = np.zeros((len(self.columns), len(self.gas_ids)))
+        for column, gas in enumerate(self.columns):
+            self.gas_matrix[column, self.gas_ids.index(gas['gas_id'])] = 1
+        self.gas_values = self.values @ self.gas_matrix
+
+        self.component_matrix = np.zeros((len(self.columns), len(self.components)))
+        for column, position in enumerate(component_columns):
+            self.component_matrix[column, position] = 1
+        self.component_columns = component_columns
+
+    def co2e(self, consumption: np.ndarray) -> np.ndarray:
+        """
+        CO₂e by activity (rows) and column.
+        """
+        return np.outer(consumption, self.coefficients)
+
+    def calculations(self, consumption: np.ndarray) -> List[List[EmissionCalculation]]:
+        """
+        Same output as calculate_factor_emissions for each consumption of the vector.
+        """
+        co2e = self.co2e(consumption)
+        gwp = co2e * self.gwp
+        gwp_by_component = gwp @ self.component_matrix
+
+        calculations = []
+        for row in range(len(consumption)):
+            results = [
+                {
+                    'emission_factor': component_factor['factor'],
+                    'component': name,
+                    'results': [],
+                    'co2e': float(gwp_by_component[row, position])
+                }
+                for position, (name, component_factor, _) in enumerate(self.components)
+            ]
+            for column, gas in enumerate(self.columns):
+                results[self.component_columns[column]]['results'].append({
+                    'gas_name': gas['gas_name'],
+                    'gas': gas['gas'],
+                    'value': gas['value'],
+                    'co2e': float(co2e[row, column]),
+                    'uncertainty': gas['uncertainty'],
+                    'gwp': float(gwp[row, column])
+                })
+            calculations.append(results)
+        return calculations
+
+
+def calculate_batch_emissions(factor_ids: List[int], consumptions: List[float],
+                              unit_ids: List[int] = None) -> List[List[EmissionCalculation]]:
+    """
+    Calculate the emissions of many (main emission factor, consumption) pairs.
+
+    The factor graphs are resolved at once from the factor cache and every group of items sharing a main
+    factor is computed with a single matrix product.
+
+    Parameters:
+    - factor_ids (list): The main emission factor id of each item.
+    - consumptions (list): The consumption of each item.
+    - unit_ids (list): The unit of each consumption, converted into the unit of the factor when given.
+
+    Returns:
+    - list: The calculate_factor_emissions output of each item, in the same order.
+    """
+    if unit_ids is not None:
+        consumptions = normalize_factor_consumption(consumptions, unit_ids, factor_ids)
+    compiled_factors = get_compiled_factors(factor_ids)
+    compiled_factors.update(get_compiled_factors(
+        component['factor_id'] for compiled in compiled_factors.values() for component in compiled['components']
+    ))
+
+    positions = {}
+    for position, factor_id in enumerate(factor_ids):
+        positions.setdefault(factor_id, []).append(position)
+
+    calculations = [None] * len(factor_ids)
+    for factor_id, factor_positions in positions.items():
+        matrix = FactorMatrix(compiled_factors.get(factor_id), compiled_factors)
+        consumption = np.array([consumptions[position] for position in factor_positions], dtype=float)
+        for position, calculation in zip(factor_positions, matrix.calculations(consumption)):
+            calculations[position] = calculation
+    return calculations
@@ -1,14 +1,20 @@
 import django_filters
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiParameter
 from rest_framework.decorators import action
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.response import Response
+from main.catalog import get_catalog, accepts_gzip
+from activities.api import CustomPagination
 from main.models import Configuration, UnitOfMeasure, EconomicSector, IndustryType, LocationType, State, City, \
-    DocumentType, Country, MEASURE_TYPE_CHOICES
+    DocumentType, Country, MEASURE_TYPE_CHOICES, normalize_place_name
 from main.serializer import ConfigurationSerializer, UnitOfMeasureSerializer, EconomicSectorSerializer, \
     IndustryTypeSerializer, LocationTypeSerializer, StateSerializer, CitySerializer, DocumentTypeSerializer, \
-    CountrySerializer, MeasureTypeSerializer, ConfigurationDetailSerializer, UnitConversionSerializer
+    CountrySerializer, MeasureTypeSerializer, ConfigurationDetailSerializer, UnitConversionSerializer, \
+    CityResolveSerializer, CityResolvedSerializer
 from rest_framework import viewsets, permissions, status
 from django_filters import rest_framework as filters
 from django.utils.translation import gettext_lazy as _
@@ -59,7 +65,14 @@ class CountryViewSet(viewsets.GenericViewSet, ListModelMixin):
     serializer_class = CountrySerializer
 
 
-class StateFilter(django_filters.FilterSet):
+class PlaceSearchFilter(django_filters.FilterSet):
+    search = django_filters.CharFilter(method='filter_search', label=_('Inicio del nombre, sin importar tildes'))
+
+    def filter_search(self, queryset, name, value):
+        return queryset.filter(normalized_name__startswith=normalize_place_name(value)).order_by('normalized_name')
+
+
+class StateFilter(PlaceSearchFilter):
     country = django_filters.NumberFilter(field_name='country__id')
 
     class Meta:
@@ -74,9 +87,10 @@ class StateViewSet(viewsets.GenericViewSet, ListModelMixin):
     serializer_class = StateSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = StateFilter
+    pagination_class = CustomPagination
 
 
-class CityFilter(django_filters.FilterSet):
+class CityFilter(PlaceSearchFilter):
     state = django_filters.NumberFilter(field_name='state__id')
 
     class Meta:
@@ -91,6 +105,28 @@ class CityViewSet(viewsets.GenericViewSet, ListModelMixin):
     serializer_class = CitySerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = CityFilter
+    pagination_class = CustomPagination
+
+    @extend_schema(
+        summary=_("Resuelve muchos municipios por nombre y departamento"),
+        request=CityResolveSerializer,
+        responses={200: CityResolvedSerializer(many=True)},
+    )
+    @action(detail=False, methods=['post'], url_path='resolve', filterset_class=None, pagination_class=None)
+    def resolve(self, request):
+        serializer = CityResolveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+        resolved = City.resolve_names((item['name'], item.get('state')) for item in items)
+        data = [
+            {
+                'name': item['name'],
+                'state': item.get('state'),
+                'city': resolved[(item['name'], item.get('state'))],
+            }
+            for item in items
+        ]
+        return Response(CityResolvedSerializer(data, many=True).data)
 
 
 @extend_schema(tags=['Main'])
@@ -184,3 +220,50 @@ class LocationTypeViewSet(viewsets.GenericViewSet, ListModelMixin):
     permission_classes = [permissions.AllowAny]
     queryset = LocationType.objects.all()
     serializer_class = LocationTypeSerializer
+
+
+@extend_schema(tags=['Main'])
+class CatalogView(GenericAPIView):
+    """
+    Get:
+    Reference data used by the app (units, places, gases, classifications...) in a single document
+    """
+    permission_classes = [permissions.AllowAny]
+
+    @extend_schema(
+        summary=_("Obtiene el catálogo de datos de referencia"),
+        parameters=[
+            OpenApiParameter(
+                name='revision',
+                description=_('revisión del catálogo que tiene el cliente, si es la actual la respuesta se guarda '
+                              'en caché sin volver a validarla'),
+                required=False,
+                type=str,
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT, 304: OpenApiResponse(description=_('El catálogo no ha cambiado'))},
+        methods=["get"]
+    )
+    def get(self, request, *args, **kwargs):
+        catalog = get_catalog()
+        # Each encoding is a different representation with its own strong validator
+        if accepts_gzip(request.headers.get('Accept-Encoding')):
+            content, etag, encoding = catalog.gzip_content, catalog.gzip_etag, 'gzip'
+        else:
+            content, etag, encoding = catalog.content, catalog.etag, None
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+            if encoding:
+                response['Content-Encoding'] = encoding
+
+        response['ETag'] = etag
+        response['X-Catalog-Revision'] = catalog.revision
+        # The revision is the hash of the content, so a URL naming it never changes, the plain one is revalidated
+        if request.query_params.get('revision') == catalog.revision:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,95 @@
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import BaseCache
+
+_counter_lock = Lock()
+
+# Cache of the counters, apart from the default one so culling its entries never drops them
+STATS_CACHE_ALIAS = 'stats'
+
+
+def _version_key(name):
+    return f'pl4n3t:{name}:version'
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def get_cache_version(name) -> str:
+    """
+    Return the current version of a named cache, shared by every process through Django's cache.
+
+    Versions are random tokens instead of counters, so a version is never seen twice: when the entry is evicted or
+    the cache is flushed a new one is created and every process discards what it built for the old one.
+
+    :param name: Name of the cached data set (e.g. 'emission_factors').
+    """
+    version = cache.get(_version_key(name))
+    if version is None:
+        version = _new_version()
+        cache.add(_version_key(name), version, timeout=None)
+        version = cache.get(_version_key(name), version)
+    return version
+
+
+def bump_cache_version(name) -> str:
+    """
+    Invalidate a named cache by replacing its version with a new one. Concurrent bumps each store a new token, so
+    no read-modify-write cycle is needed and the last one wins.
+
+    :param name: Name of the cached data set.
+    """
+    version = _new_version()
+    cache.set(_version_key(name), version, timeout=None)
+    return version
+
+
+@contextmanager
+def _host_lock(name):
+    """
+    Exclusive lock between the threads and processes of this host.
+    """
+    os.makedirs(settings.CACHE_LOCK_DIR, exist_ok=True)
+    with _counter_lock, open(os.path.join(settings.CACHE_LOCK_DIR, f'{name}.lock'), 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        yield
+
+
+def increment_counter(key, delta=1) -> int:
+    """
+    Add ``delta`` to a counter kept in the stats cache without expiration.
+
+    Backends with their own ``incr`` (local memory, memcached, redis) update it atomically, the others (file,
+    database) inherit ``BaseCache.incr``, which reads the value and sets it again with the default timeout, so the
+    counter is updated under a host lock instead.
+
+    :param key: Cache key of the counter.
+    :param delta: Amount to add.
+    """
+    stats = caches[STATS_CACHE_ALIAS]
+    if type(stats).incr is not BaseCache.incr:
+        try:
+            return stats.incr(key, delta)
+        except ValueError:
+            if stats.add(key, delta, timeout=None):
+                return delta
+            return stats.incr(key, delta)
+
+    with _host_lock('counters'):
+        value = stats.get(key, 0) + delta
+        stats.set(key, value, timeout=None)
+        return value
+
+
+def get_counter(key) -> int:
+    """
+    Current value of a counter updated with ``increment_counter``.
+    """
+    return caches[STATS_CACHE_ALIAS].get(key, 0)
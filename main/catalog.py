@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+from threading import Lock
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from main.cache import get_cache_version, bump_cache_version
+
+CATALOG_CACHE = 'catalog'
+
+# Models of the snapshot, any change to them starts a new catalog revision
+CATALOG_MODELS = (
+    'main.UnitOfMeasure',
+    'main.Country',
+    'main.State',
+    'main.City',
+    'main.EconomicSector',
+    'main.IndustryType',
+    'main.LocationType',
+    'main.DocumentType',
+    'emissions.GreenhouseGas',
+    'emissions.SourceType',
+    'emissions.FactorType',
+    'emission_source_classifications.QuantificationType',
+    'emission_source_classifications.GHGScope',
+    'emission_source_classifications.ISOCategory',
+    'emission_source_classifications.EmissionSourceGroup',
+)
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Attributes:
+        revision: Hash of the catalog content, the same data always has the same revision.
+        etag: Strong validator of ``content``, ``gzip_etag`` is the one of ``gzip_content``.
+    """
+    revision: str
+    etag: str
+    gzip_etag: str
+    content: bytes
+    gzip_content: bytes
+
+
+def catalog_sections():
+    """
+    Reference data of the snapshot, the same lists the individual endpoints return.
+    """
+    from emission_source_classifications.models import QuantificationType, GHGScope, ISOCategory, \
+        EmissionSourceGroup
+    from emission_source_classifications.serializers import QuantificationTypeSerializer, GHGScopeSerializer, \
+        ISOCategorySerializer, EmissionSourceGroupDetailSerializer
+    from emissions.models import GreenhouseGas, SourceType, FactorType
+    from emissions.serializers import GreenhouseGasSerializer, SourceTypeSerializer, FactorTypeSerializer
+    from main.models import UnitOfMeasure, Country, State, City, EconomicSector, IndustryType, LocationType, \
+        DocumentType, MEASURE_TYPE_CHOICES
+    from main.serializer import UnitOfMeasureSerializer, CountrySerializer, StateSerializer, CitySerializer, \
+        EconomicSectorSerializer, IndustryTypeSerializer, LocationTypeSerializer, DocumentTypeSerializer
+
+    class CatalogStateSerializer(StateSerializer):
+        class Meta(StateSerializer.Meta):
+            fields = StateSerializer.Meta.fields + ['country']
+
+    return {
+        'measure_types': [{'label': key, 'value': value} for key, value in MEASURE_TYPE_CHOICES],
+        'units': UnitOfMeasureSerializer(UnitOfMeasure.objects.filter(is_enabled=True), many=True).data,
+        'countries': CountrySerializer(Country.objects.all(), many=True).data,
+        'states': CatalogStateSerializer(State.objects.all(), many=True).data,
+        'cities': CitySerializer(City.objects.all(), many=True).data,
+        'economic_sectors': EconomicSectorSerializer(EconomicSector.objects.all(), many=True).data,
+        'industry_types': IndustryTypeSerializer(IndustryType.objects.all(), many=True).data,
+        'location_types': LocationTypeSerializer(LocationType.objects.all(), many=True).data,
+        'document_types': DocumentTypeSerializer(DocumentType.objects.all(), many=True).data,
+        'greenhouse_gases': GreenhouseGasSerializer(GreenhouseGas.objects.all(), many=True).data,
+        'source_types': SourceTypeSerializer(SourceType.objects.all(), many=True).data,
+        'factor_types': FactorTypeSerializer(FactorType.objects.all(), many=True).data,
+        'quantification_types': QuantificationTypeSerializer(QuantificationType.objects.all(), many=True).data,
+        'ghg_scopes': GHGScopeSerializer(GHGScope.objects.all(), many=True).data,
+        'iso_categories': ISOCategorySerializer(ISOCategory.objects.select_related('scope'), many=True).data,
+        'emission_source_groups': EmissionSourceGroupDetailSerializer(
+            EmissionSourceGroup.objects.select_related('category').prefetch_related('emission_factor_types'),
+            many=True
+        ).data,
+    }
+
+
+def build_catalog() -> CatalogSnapshot:
+    sections = catalog_sections()
+    revision = hashlib.sha256(JSONRenderer().render(sections)).hexdigest()[:32]
+    content = JSONRenderer().render({'revision': revision, **sections})
+    return CatalogSnapshot(
+        revision=revision,
+        etag=f'"{revision}"',
+        gzip_etag=f'"{revision}-gzip"',
+        content=content,
+        gzip_content=gzip.compress(content, compresslevel=9, mtime=0),
+    )
+
+
+_snapshot = None
+_snapshot_version = None
+_lock = Lock()
+
+
+def get_catalog() -> CatalogSnapshot:
+    """
+    Snapshot of the current catalog.
+
+    The catalog is built again when its cache version changes, serialized and compressed once, kept in Django's cache
+    for the other processes and in memory for the following requests of this one. The revision clients see is the
+    hash of the content, so it only changes with the data and is never reused for a different catalog.
+    """
+    global _snapshot, _snapshot_version
+
+    version = get_cache_version(CATALOG_CACHE)
+    snapshot = _snapshot
+    if snapshot is not None and _snapshot_version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot_version != version:
+            key = f'pl4n3t:{CATALOG_CACHE}:{version}'
+            cached = cache.get(key)
+            # Entries written by a release with other snapshot fields are built again
+            if cached and len(cached) == len(CatalogSnapshot._fields):
+                snapshot = CatalogSnapshot(*cached)
+            else:
+                snapshot = build_catalog()
+                cache.set(key, tuple(snapshot), timeout=24 * 60 * 60)
+            _snapshot, _snapshot_version = snapshot, version
+        return _snapshot
+
+
+def accepts_gzip(accept_encoding) -> bool:
+    """
+    Whether an ``Accept-Encoding`` header allows gzip, ``gzip;q=0`` refuses it and ``*`` covers it when gzip is not
+    listed.
+    """
+    qualities = {}
+    for item in (accept_encoding or '').split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0.0))) > 0
+
+
+def invalidate_catalog(**kwargs):
+    """
+    Signal receiver building the catalog again in every process. The version changes after the commit so no
+    process builds it from the data being replaced.
+    """
+    transaction.on_commit(lambda: bump_cache_version(CATALOG_CACHE))
@@ -0,0 +1,53 @@
+# Generated by Django 4.0.4 on 2026-10-18 16:01
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_place_name(name):
+    # Copy of main.models.normalize_place_name as of this migration
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).lower().split())
+
+
+def fill_normalized_names(apps, schema_editor):
+    for model_name in ('State', 'City'):
+        model = apps.get_model('main', model_name)
+        places = list(model.objects.only('id', 'name'))
+        for place in places:
+            place.normalized_name = normalize_place_name(place.name)
+        model.objects.bulk_update(places, ['normalized_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_alter_unitofmeasure_measure_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Nombre normalizado'),
+        ),
+        migrations.AddField(
+            model_name='state',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255, verbose_name='Nombre normalizado'),
+        ),
+        migrations.RunPython(fill_normalized_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['normalized_name'], name='city_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(fields=['state', 'normalized_name'], name='city_state_name'),
+        ),
+        migrations.AddIndex(
+            model_name='state',
+            index=models.Index(fields=['normalized_name'], name='state_name_prefix', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
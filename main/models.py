@@ -1,8 +1,14 @@
+import math
+import unicodedata
 from django_extensions.db.fields import AutoSlugField
 from django.utils.translation import gettext_lazy as _
 from django.contrib.gis.db import models
 from django.contrib.gis.geos import Point
 from slugify import slugify
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+from main.catalog import CATALOG_MODELS, invalidate_catalog
+from main.units import get_unit_converter, invalidate_unit_converter
 
 MEASURE_TYPE_UNKNOWN = "UNKNOWN"
 MEASURE_TYPE_QUANTITY = "QUANTITY"
@@ -59,6 +65,14 @@ class Configuration(models.Model):
         return self.key
 
 
+def normalize_place_name(name):
+    """
+    Lowercase ``name`` without accents and with single spaces, "Bogotá  D.C." becomes "bogota d.c.".
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).lower().split())
+
+
 class Country(models.Model):
     """
     Represents countries.
@@ -86,6 +100,7 @@ class State(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(_("Nombre del Departamento"), max_length=255)
+    normalized_name = models.CharField(_("Nombre normalizado"), max_length=255, default='', editable=False)
     dane_code = models.CharField(_("Código DANE"), max_length=3)
     geonames_code = models.CharField(_("Código GeoNames"), max_length=10, null=True, blank=True)
     slug = AutoSlugField(populate_from='name')
@@ -93,15 +108,34 @@ class State(models.Model):
     @classmethod
     def get_state_by_name(cls, name):
         try:
-            return cls.objects.get(name__iexact=name)
-        except cls.DoesNotExist:
-            print(name)
+            return cls.objects.get(normalized_name=normalize_place_name(name))
+        except (cls.DoesNotExist, cls.MultipleObjectsReturned):
             return None
 
+    @classmethod
+    def resolve_names(cls, names):
+        """
+        Map many state names to their states with one query, accents and case are ignored.
+
+        :param names: State names as written by the user.
+        :returns: ``{name: State or None}``.
+        """
+        normalized = {name: normalize_place_name(name) for name in names}
+        states = {}
+        for state in cls.objects.filter(normalized_name__in=set(normalized.values())):
+            states.setdefault(state.normalized_name, []).append(state)
+        # Names shared by states of different countries are ambiguous
+        return {
+            name: states[key][0] if len(states.get(key, [])) == 1 else None for name, key in normalized.items()
+        }
+
     class Meta:
         verbose_name = _("Departamento")
         verbose_name_plural = _("Departamentos")
         ordering = ("name",)
+        indexes = [
+            models.Index(fields=['normalized_name'], name='state_name_prefix', opclasses=['varchar_pattern_ops']),
+        ]
 
     def __str__(self):
         return self.name
@@ -117,6 +151,7 @@ class City(models.Model):
         verbose_name=_("Municipios"),
         on_delete=models.CASCADE)
     name = models.CharField(_("Nombre del Municipio"), max_length=255)
+    normalized_name = models.CharField(_("Nombre normalizado"), max_length=255, default='', editable=False)
     dane_code = models.CharField(_("Código DANE"), max_length=3)
     slug = AutoSlugField(populate_from='name')
     coords_lat = models.FloatField(null=True, blank=True)
@@ -127,15 +162,48 @@ class City(models.Model):
     def get_city_by_name(cls, name, state):
         try:
             if state:
-                return cls.objects.get(name__iexact=name, state_id=state.id)
-            return cls.objects.get(name__iexact=name)
-        except cls.DoesNotExist:
+                return cls.objects.get(normalized_name=normalize_place_name(name), state_id=state.id)
+            return cls.objects.get(normalized_name=normalize_place_name(name))
+        except (cls.DoesNotExist, cls.MultipleObjectsReturned):
             return None
 
+    @classmethod
+    def resolve_names(cls, pairs):
+        """
+        Map many ``(city name, state name)`` pairs to their cities with one query, for the importers.
+
+        Accents and case are ignored. A pair without state only resolves when no other city has the same name.
+
+        :param pairs: Iterable of ``(name, state_name)`` tuples, ``state_name`` may be None.
+        :returns: ``{(name, state_name): City or None}``.
+        """
+        normalized = {
+            (name, state_name): (normalize_place_name(name), normalize_place_name(state_name) if state_name else None)
+            for name, state_name in pairs
+        }
+        cities = {}
+        for city in cls.objects.select_related('state').filter(
+            normalized_name__in={key[0] for key in normalized.values()}
+        ):
+            cities.setdefault(city.normalized_name, []).append(city)
+
+        resolved = {}
+        for pair, (name_key, state_key) in normalized.items():
+            candidates = [
+                city for city in cities.get(name_key, [])
+                if state_key is None or city.state.normalized_name == state_key
+            ]
+            resolved[pair] = candidates[0] if len(candidates) == 1 else None
+        return resolved
+
     class Meta:
         verbose_name = _("Municipios")
         verbose_name_plural = _("Municipios")
         ordering = ("name",)
+        indexes = [
+            models.Index(fields=['normalized_name'], name='city_name_prefix', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['state', 'normalized_name'], name='city_state_name'),
+        ]
 
     def __str__(self):
         return '%s, %s' % (self.name, self.state.name)
@@ -244,16 +312,15 @@ class UnitOfMeasure(models.Model):
     is_gei_unit = models.BooleanField(_('Es una unidad de medida GEI'), default=False)
 
     def convert_to(self, value, target_unit):
-        if not self.scale_to_standard_unit or not target_unit.scale_to_standard_unit:
-            raise ValueError("Conversion requires scale to standard unit for both units.")
+        """
+        Convert ``value`` from this unit to ``target_unit`` with the conversion tables of main.units.
 
-        # Convert the value to the standard unit
-        standard_value = (value + self.offset_to_standard_unit) * self.scale_to_standard_unit
-
-        # Convert the standard value to the target unit
-        target_value = (standard_value - target_unit.offset_to_standard_unit) / target_unit.scale_to_standard_unit
-
-        return target_value
+        :raises ValueError: When the units are of different measure types or lack a scale to the standard unit.
+        """
+        converted = float(get_unit_converter().convert([value], self.id, target_unit.id)[0])
+        if math.isnan(converted):
+            raise ValueError("Conversion requires scale to standard unit for both units.")
+        return converted
 
     class Meta:
         verbose_name = _("Unidad de Medida")
@@ -311,3 +378,26 @@ class WebinarRegistrant(models.Model):
 
     def __str__(self):
         return self.email
+
+
+@receiver(pre_save, sender=State)
+@receiver(pre_save, sender=City)
+def set_normalized_place_name(sender, instance, **kwargs):
+    # pre_save also runs for loaddata, so the fixtures get their normalized names
+    instance.normalized_name = normalize_place_name(instance.name)
+
+
+@receiver([post_save, post_delete], sender=UnitOfMeasure)
+def invalidate_unit_conversions(sender, **kwargs):
+    invalidate_unit_converter()
+
+
+# Lazy senders, the catalog spans the models of several apps
+for catalog_model in CATALOG_MODELS:
+    post_save.connect(invalidate_catalog, sender=catalog_model, dispatch_uid=f'catalog-save-{catalog_model}')
+    post_delete.connect(invalidate_catalog, sender=catalog_model, dispatch_uid=f'catalog-delete-{catalog_model}')
+m2m_changed.connect(
+    invalidate_catalog,
+    sender='emission_source_classifications.EmissionSourceGroup_emission_factor_types',
+    dispatch_uid='catalog-group-factor-types'
+)
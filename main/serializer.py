@@ -58,6 +58,19 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ['id', 'state', 'name', 'dane_code', 'slug', 'coords_lat', 'coords_long', 'geo_location']
 
 
+class CityNameSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    state = serializers.CharField(max_length=255, required=False, allow_null=True, allow_blank=True)
+
+
+class CityResolveSerializer(serializers.Serializer):
+    items = CityNameSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class CityResolvedSerializer(CityNameSerializer):
+    city = CitySerializer(allow_null=True)
+
+
 class DocumentTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentType
@@ -25,3 +25,26 @@ def get_platform_object_types():
         'emission-source': EmissionsSource,
         'activity': Activity,
     }
+
+
+def get_user_object_queryset(user, model):
+    """
+    Objects of a platform object type a user can attach documents to.
+
+    Like ``UserCreateMixinViewSet.get_user_queryset``, trashed objects are left out and users only reach their own
+    objects: the ones at the locations of the companies they are a member of, or that they created. Superusers reach
+    every object.
+    """
+    from django.db.models import Q
+    from companies.models import Member
+
+    queryset = model.objects.all()
+    if hasattr(model, 'trashed'):
+        queryset = queryset.filter(trashed=False)
+    if user.is_superuser:
+        return queryset
+
+    scope = Q(location__company_id__in=Member.objects.filter(user=user).values('company_id'))
+    if any(field.name == 'user_created' for field in model._meta.fields):
+        scope |= Q(user_created=user)
+    return queryset.filter(scope)
@@ -0,0 +1,124 @@
+from threading import Lock
+
+import numpy as np
+
+from main.cache import get_cache_version, bump_cache_version
+
+UNIT_CACHE = 'units'
+
+
+class UnitConverter(object):
+    """
+    Conversion tables of the units of measure.
+
+    A unit X converts to the standard unit S of its measure type by ``S = offset + scale * X``, so between two units
+    i and j of the same measure type and standard unit ``j = scale[i, j] * i + offset[i, j]`` with::
+
+        scale[i, j] = scale_i / scale_j
+        offset[i, j] = (offset_i - offset_j) / scale_j
+
+    Both matrices are precomputed for every pair of units and hold NaN for the pairs that can not be converted,
+    different measure types or units without scale. A unit always converts to itself.
+    """
+
+    def __init__(self, units):
+        """
+        :param units: ``(id, measure_type, name_standard_unit, scale_to_standard_unit, offset_to_standard_unit)``
+                      of every unit.
+        """
+        units = sorted(units)
+        self.ids = np.array([unit[0] for unit in units], dtype=np.int64)
+        size = len(units)
+        self.scale = np.full((size, size), np.nan)
+        self.offset = np.full((size, size), np.nan)
+        np.fill_diagonal(self.scale, 1.0)
+        np.fill_diagonal(self.offset, 0.0)
+
+        groups = {}
+        for position, (_id, measure_type, standard_unit, scale, offset) in enumerate(units):
+            if scale:
+                key = (measure_type, (standard_unit or '').strip().lower())
+                groups.setdefault(key, []).append((position, scale, offset or 0.0))
+
+        for members in groups.values():
+            positions = np.array([member[0] for member in members])
+            scales = np.array([member[1] for member in members], dtype=float)
+            offsets = np.array([member[2] for member in members], dtype=float)
+            block = np.ix_(positions, positions)
+            self.scale[block] = scales[:, None] / scales[None, :]
+            self.offset[block] = (offsets[:, None] - offsets[None, :]) / scales[None, :]
+
+    def positions(self, unit_ids):
+        """
+        Positions of the units in the matrices, -1 for ids that are not in the table.
+        """
+        unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, unit_ids)
+        positions = np.minimum(positions, max(len(self.ids) - 1, 0))
+        found = (self.ids[positions] == unit_ids) if len(self.ids) else np.zeros(unit_ids.shape, dtype=bool)
+        return np.where(found, positions, -1)
+
+    def convert(self, values, from_unit_ids, to_unit_ids) -> np.ndarray:
+        """
+        Convert every value from its unit to its target unit with one vectorized lookup.
+
+        :param values: Array of values.
+        :param from_unit_ids: Unit id of each value, or one id for all of them.
+        :param to_unit_ids: Target unit id of each value, or one id for all of them.
+        :returns: The converted values, NaN where the units can not be converted.
+        """
+        values = np.asarray(values, dtype=float)
+        from_unit_ids, to_unit_ids = np.broadcast_arrays(
+            np.asarray(from_unit_ids, dtype=np.int64), np.asarray(to_unit_ids, dtype=np.int64)
+        )
+        from_positions = self.positions(from_unit_ids)
+        to_positions = self.positions(to_unit_ids)
+        known = (from_positions >= 0) & (to_positions >= 0)
+
+        scale = np.full(from_positions.shape, np.nan)
+        offset = np.full(from_positions.shape, np.nan)
+        scale[known] = self.scale[from_positions[known], to_positions[known]]
+        offset[known] = self.offset[from_positions[known], to_positions[known]]
+        same = from_unit_ids == to_unit_ids
+        scale[same], offset[same] = 1.0, 0.0
+        return scale * values + offset
+
+    def normalize(self, values, from_unit_ids, to_unit_ids) -> np.ndarray:
+        """
+        Like ``convert``, values whose units can not be converted, or are unknown, are kept as they are.
+        """
+        values = np.asarray(values, dtype=float)
+        from_unit_ids = np.asarray([-1 if unit_id is None else unit_id for unit_id in np.ravel(from_unit_ids)])
+        to_unit_ids = np.asarray([-1 if unit_id is None else unit_id for unit_id in np.ravel(to_unit_ids)])
+        converted = self.convert(values, from_unit_ids, to_unit_ids)
+        return np.where(np.isnan(converted), values, converted)
+
+
+_converter = None
+_converter_version = None
+_lock = Lock()
+
+
+def get_unit_converter() -> UnitConverter:
+    """
+    Converter built from the ``UnitOfMeasure`` table, rebuilt in every process when the 'units' cache version
+    changes (see invalidate_unit_converter).
+    """
+    global _converter, _converter_version
+    from main.models import UnitOfMeasure
+
+    version = get_cache_version(UNIT_CACHE)
+    with _lock:
+        if _converter is None or _converter_version != version:
+            _converter = UnitConverter(UnitOfMeasure.objects.values_list(
+                'id', 'measure_type', 'name_standard_unit', 'scale_to_standard_unit', 'offset_to_standard_unit'
+            ))
+            _converter_version = version
+        return _converter
+
+
+def invalidate_unit_converter(**kwargs):
+    """
+    Signal receiver discarding the conversion tables of every process.
+    """
+    bump_cache_version(UNIT_CACHE)
@@ -7,7 +7,7 @@ from main.views import home, blog, company, contact_us, why_quantify, water_foot
 from rest_framework import routers
 from main.api import ConfigurationView, UnitOfMeasureViewSet, EconomicSectorViewSet, IndustryTypeViewSet, \
     LocationTypeViewSet, StateViewSet, CityViewSet, DocumentTypeViewSet, CountryViewSet, TypeUnitOfMeasureViewSet, \
-    ConfigurationDetailView
+    ConfigurationDetailView, CatalogView
 
 # api urls
 router = routers.DefaultRouter()
@@ -25,6 +25,7 @@ router.register('document-type', DocumentTypeViewSet, basename='document-type')
 api_urls = ([
     path('', include(router.urls)),
     path('type-unit-of-measure/', TypeUnitOfMeasureViewSet.as_view(), name='type-unit-of-measure'),
+    path('catalog/', CatalogView.as_view(), name='catalog'),
 ], 'main')
 
 # general urls
@@ -36,6 +36,7 @@ DEPENDENCIES_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'django.contrib.sites',
     'django.contrib.humanize',
 ]
@@ -281,8 +282,55 @@ SPECTACULAR_SETTINGS = {
 PL4N3T_APPLICATION = 'https://app.pl4n3t.com'
 
 DOCUMENTS_UPLOAD_TO = 'documents'
+FILE_UPLOAD_HANDLERS = [
+    'documents.uploadhandler.HashingMemoryFileUploadHandler',
+    'documents.uploadhandler.HashingTemporaryFileUploadHandler',
+]
+# Blobs without references are deleted by sweep_document_blobs once they are older than this many seconds
+DOCUMENT_BLOB_SWEEP_GRACE = env.int('DOCUMENT_BLOB_SWEEP_GRACE', default=60 * 60)
+# Bounding boxes of the thumbnails generated by the generate_thumbnails command, each one in JPEG and WebP
+DOCUMENT_THUMBNAIL_SIZES = [(150, 85), (300, 169), (600, 338), (1200, 675)]
+DOCUMENT_THUMBNAIL_TIMEOUT = env.int('DOCUMENT_THUMBNAIL_TIMEOUT', default=5 * 60)
+DOCUMENT_THUMBNAIL_MAX_ATTEMPTS = env.int('DOCUMENT_THUMBNAIL_MAX_ATTEMPTS', default=3)
+# Resumable uploads (documents.uploads), sizes in bytes and expiration in seconds without receiving chunks
+DOCUMENT_UPLOAD_MAX_SIZE = env.int('DOCUMENT_UPLOAD_MAX_SIZE', default=2 * 1024 * 1024 * 1024)
+DOCUMENT_UPLOAD_MAX_CHUNK_SIZE = env.int('DOCUMENT_UPLOAD_MAX_CHUNK_SIZE', default=8 * 1024 * 1024)
+DOCUMENT_UPLOAD_BUFFER_SIZE = 64 * 1024
+DOCUMENT_UPLOAD_EXPIRATION = env.int('DOCUMENT_UPLOAD_EXPIRATION', default=24 * 60 * 60)
+# Document downloads handed to the web server: 'nginx' (X-Accel-Redirect to an internal location serving
+# MEDIA_ROOT at DOCUMENT_SENDFILE_URL_PREFIX) or 'apache' (X-Sendfile), streamed by Django when empty
+DOCUMENT_SENDFILE_BACKEND = env.str('DOCUMENT_SENDFILE_BACKEND', default='')
+DOCUMENT_SENDFILE_URL_PREFIX = env.str('DOCUMENT_SENDFILE_URL_PREFIX', default='/protected-media/')
+
+# Shared between the processes of a host so cache versions (main.cache) invalidate every worker
+CACHES = {
+    'default': env.cache('CACHE_URL', default='filecache:///tmp/pl4n3t-cache'),
+    # Counters without expiration (main.cache.increment_counter), kept apart so culling the default cache keeps them
+    'stats': env.cache('STATS_CACHE_URL', default='filecache:///tmp/pl4n3t-stats'),
+}
+# Lock files of the counters kept in caches without atomic increments (main.cache.increment_counter)
+CACHE_LOCK_DIR = env.str('CACHE_LOCK_DIR', default='/tmp/pl4n3t-locks')
+DASHBOARD_CACHE_TIMEOUT = env.int('DASHBOARD_CACHE_TIMEOUT', default=60 * 60)
+
+# Report PDFs are rendered by the render_reports command, at most REPORT_RENDER_CONCURRENCY at a time
+REPORT_RENDER_CONCURRENCY = env.int('REPORT_RENDER_CONCURRENCY', default=1)
+REPORT_RENDER_TIMEOUT = env.int('REPORT_RENDER_TIMEOUT', default=10 * 60)
+REPORT_RENDER_MAX_ATTEMPTS = env.int('REPORT_RENDER_MAX_ATTEMPTS', default=3)
+
+# Rendered PDFs of the report views (reports.cache), evicted least recently used first above the max size in bytes
+REPORT_PDF_CACHE_DIR = env.str('REPORT_PDF_CACHE_DIR', default='/tmp/pl4n3t-pdf-cache')
+REPORT_PDF_CACHE_MAX_SIZE = env.int('REPORT_PDF_CACHE_MAX_SIZE', default=512 * 1024 * 1024)
 
 WEASYPRINT_BASEURL = '/'
+# Report assets are read from disk (reports.assets), these CDN prefixes are served from the static files
+REPORT_STATIC_URL_PREFIXES = env.list(
+    'REPORT_STATIC_URL_PREFIXES', default=['https://s3.amazonaws.com/django-weasyprint/static/']
+)
+REPORT_ASSET_CACHE_SIZE = env.int('REPORT_ASSET_CACHE_SIZE', default=256)
+
+# Results of the common data autocomplete (emission_source_classifications.search)
+COMMON_SEARCH_LIMIT = env.int('COMMON_SEARCH_LIMIT', default=20)
+COMMON_SEARCH_MAX_LIMIT = env.int('COMMON_SEARCH_MAX_LIMIT', default=100)
 
 FIREBASE_CREDENTIALS_PATH = os.path.join(BASE_DIR, 'credentials', 'pl4n3t-firebase-key.json')
 GOOGLE_CLIENT_ID = os.environ.setdefault('GOOGLE_CLIENT_ID', '')
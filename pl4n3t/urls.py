@@ -52,6 +52,7 @@ urlpatterns = [
     path('account/', include('accounts.urls')),
     path('reports/', include('reports.urls')),
     path('companies/', include('companies.urls')),
+    path('documents/', include('documents.urls')),
 ]
 
 if not settings.IS_PRODUCTION:
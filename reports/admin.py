@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib import admin
-from reports.models import Report, ReportTemplate, CompanyTemplate
+from reports.models import Report, ReportTemplate, CompanyTemplate, ReportRenderJob
 from django.utils.translation import gettext_lazy as _
 
 
@@ -130,3 +130,10 @@ class ReportAdmin(admin.ModelAdmin):
         if not obj.pk:
             obj.user = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(ReportRenderJob)
+class ReportRenderJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'report', 'status', 'progress', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['started_at', 'finished_at', 'worker']
@@ -1,12 +1,14 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.response import Response
 
-from reports.models import ReportTemplate, CompanyTemplate, Report
+from reports.models import ReportTemplate, CompanyTemplate, Report, ReportRenderJob
+from reports.rendering import enqueue_report_render
 from reports.serializers import (
     ReportTemplateListSerializer, ReportTemplateDetailSerializer,
     CompanyTemplateListSerializer, CompanyTemplateDetailSerializer,
-    ReportListSerializer, ReportDetailSerializer
+    ReportListSerializer, ReportDetailSerializer, ReportRenderJobSerializer
 )
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiResponse
 from django.utils.translation import gettext_lazy as _
@@ -83,3 +85,25 @@ class ReportViewSet(viewsets.ModelViewSet):
 
         serializer = ReportListSerializer(queryset, many=True)
         return Response(serializer.data)
+
+    @extend_schema(
+        summary=_("Encola la generación del PDF del reporte"),
+        request=None,
+        responses={202: ReportRenderJobSerializer}
+    )
+    @action(detail=True, methods=['post'], url_path='render')
+    def render_pdf(self, request, *args, **kwargs):
+        job = enqueue_report_render(self.get_object(), user=request.user)
+        serializer = ReportRenderJobSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(tags=['Reports'])
+class ReportRenderJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ReportRenderJob.objects.select_related('report')
+    serializer_class = ReportRenderJobSerializer
+    filterset_fields = ['report', 'status']
+
+    def get_queryset(self):
+        user = self.request.user
+        return self.queryset.filter(report__company__members_roles__user=user).distinct()
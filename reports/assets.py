@@ -0,0 +1,87 @@
+import mimetypes
+import os
+from functools import lru_cache
+from urllib.parse import urlparse, unquote
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+
+
+class AssetNotFound(ValueError):
+    pass
+
+
+def resolve_asset_path(url):
+    """
+    Return the file behind a static or media URL of a report, or None when it is not a local asset.
+
+    Static files go through the staticfiles finders first so the app folders work without ``collectstatic``, CDN
+    copies of the static files listed in ``REPORT_STATIC_URL_PREFIXES`` are read from disk as well.
+
+    :param url: Absolute, root relative or ``file://`` URL found in the report HTML or CSS.
+    """
+    for prefix in settings.REPORT_STATIC_URL_PREFIXES:
+        if url.startswith(prefix):
+            url = settings.STATIC_URL + url[len(prefix):]
+            break
+
+    path = unquote(urlparse(url).path)
+    if settings.STATIC_URL and path.startswith(settings.STATIC_URL):
+        relative = path[len(settings.STATIC_URL):]
+        try:
+            found = finders.find(relative)
+        except SuspiciousFileOperation:
+            return None
+        if found:
+            return found
+        path = os.path.join(settings.STATIC_ROOT, relative)
+    elif settings.MEDIA_URL not in ('', '/') and path.startswith(settings.MEDIA_URL):
+        path = os.path.join(settings.MEDIA_ROOT, path[len(settings.MEDIA_URL):])
+    else:
+        return None
+
+    path = os.path.realpath(path)
+    roots = [os.path.realpath(root) for root in (settings.STATIC_ROOT, settings.MEDIA_ROOT)]
+    if not any(path.startswith(root + os.sep) for root in roots):
+        return None
+    return path
+
+
+@lru_cache(maxsize=settings.REPORT_ASSET_CACHE_SIZE)
+def read_asset(path, mtime):
+    """
+    Read a report asset once per process. The modification time is part of the key so edited files are read again.
+    """
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def local_url_fetcher(url, *args, **kwargs):
+    """
+    WeasyPrint URL fetcher serving static and media files from disk, other URLs are refused so rendering never
+    waits on the network. ``data:`` URLs are decoded by WeasyPrint itself.
+    """
+    if url.startswith('data:'):
+        import weasyprint
+        return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+    path = resolve_asset_path(url)
+    if path is None or not os.path.isfile(path):
+        raise AssetNotFound(f'Report asset {url} is not a local static or media file')
+
+    mime_type, encoding = mimetypes.guess_type(path)
+    return {
+        'string': read_asset(path, os.path.getmtime(path)),
+        'mime_type': mime_type,
+        'encoding': encoding,
+        'filename': os.path.basename(path),
+        'redirected_url': url,
+    }
+
+
+def pisa_link_callback(uri, rel):
+    """
+    xhtml2pdf link callback resolving static and media references to local files.
+    """
+    return resolve_asset_path(uri) or uri
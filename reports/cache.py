@@ -0,0 +1,129 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+
+class PDFCache:
+    """
+    Rendered PDFs stored on disk by the hash of everything that affects their bytes.
+
+    The modification time of a file is its last use, entries are evicted oldest first once the directory grows past
+    ``max_size`` bytes.
+
+    Attributes:
+        directory: Folder holding the cached files, defaults to ``REPORT_PDF_CACHE_DIR``.
+        max_size: Maximum size in bytes of the cached files, defaults to ``REPORT_PDF_CACHE_MAX_SIZE``.
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self._directory = directory
+        self._max_size = max_size
+
+    @property
+    def directory(self):
+        return self._directory or settings.REPORT_PDF_CACHE_DIR
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else settings.REPORT_PDF_CACHE_MAX_SIZE
+
+    @staticmethod
+    def make_key(html, stylesheets=(), engine='') -> str:
+        """
+        :param html: Rendered HTML of the document.
+        :param stylesheets: Stylesheet paths, their content is hashed when the file exists, the value otherwise.
+        :param engine: Name and version of the PDF engine and any option that changes its output.
+        """
+        digest = hashlib.sha256(engine.encode())
+        digest.update(html.encode())
+        for stylesheet in stylesheets:
+            if stylesheet and os.path.isfile(stylesheet):
+                with open(stylesheet, 'rb') as file:
+                    digest.update(file.read())
+            else:
+                digest.update(str(stylesheet).encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f'{key}.pdf')
+
+    def get(self, key):
+        """
+        Return the path of a cached PDF marking it as recently used, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, content):
+        """
+        Store a rendered PDF and evict the least recently used ones above the size limit.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial PDF
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+
+        size = sum(entry[1] for entry in entries)
+        for _mtime, file_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+
+
+pdf_cache = PDFCache()
+
+
+def cached_pdf_response(request, key, render, filename=None, attachment=False):
+    """
+    Serve the PDF identified by ``key`` from the cache, rendering it only on a miss.
+
+    The key is sent as the ETag, so a client holding the same version gets a 304 without touching the disk.
+
+    :param request: Current request.
+    :param key: Key built with ``PDFCache.make_key``.
+    :param render: Callable returning the PDF bytes.
+    :param filename: Name suggested in the ``Content-Disposition`` header.
+    :param attachment: Whether the browser should download the PDF instead of showing it.
+    """
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        path = pdf_cache.get(key) or pdf_cache.put(key, render())
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type='application/pdf',
+            as_attachment=attachment,
+            filename=filename or f'{key[:12]}.pdf'
+        )
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,42 @@
+import os
+import socket
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from reports.rendering import render_slot, claim_job, render_job
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de generación de reportes PDF'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Termina cuando la cola queda vacía')
+        parser.add_argument('--sleep', type=float, default=5, help='Segundos de espera cuando no hay trabajos')
+        parser.add_argument('--nice', type=int, default=0, help='Reduce la prioridad del proceso de renderizado')
+
+    def handle(self, *args, **options):
+        if options['nice']:
+            os.nice(options['nice'])
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+
+        while True:
+            close_old_connections()
+            with render_slot() as slot:
+                if slot is None:
+                    self.stdout.write('No hay espacios de renderizado disponibles')
+                else:
+                    self.process(worker)
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+    def process(self, worker):
+        while True:
+            job = claim_job(worker)
+            if job is None:
+                return
+            self.stdout.write(f'Generando el reporte {job.report_id} (trabajo {job.id}, intento {job.attempts})')
+            if render_job(job):
+                self.stdout.write(self.style.SUCCESS(f'Reporte {job.report_id} generado.'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Error generando el reporte {job.report_id}: {job.error}'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.0.4 on 2026-10-18 15:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0009_alter_companytemplate_tags_alter_report_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('RUNNING', 'En proceso'), ('DONE', 'Terminado'), ('FAILED', 'Fallido')], default='PENDING', max_length=20, verbose_name='Estado')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='render_jobs', to='reports.report')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Generación de reporte',
+                'verbose_name_plural': 'Generaciones de reportes',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reportrenderjob',
+            index=models.Index(fields=['status', 'created_at'], name='reports_rep_status_f7c2c6_idx'),
+        ),
+    ]
@@ -1,13 +1,20 @@
+from io import BytesIO
+
 from ckeditor.fields import RichTextField
 from django.core.files.base import ContentFile
 from django.db import models
-from django.http import HttpResponse
 from django.template.loader import get_template
+from django.utils import timezone
 from taggit.managers import TaggableManager
 from xhtml2pdf import pisa
+from reports.assets import pisa_link_callback
 from django.utils.translation import gettext_lazy as _
 
 
+class ReportRenderError(Exception):
+    pass
+
+
 class Template(models.Model):
     # General report information
     name = models.CharField(_('Nombre'), max_length=200)
@@ -66,6 +73,11 @@ class Template(models.Model):
         abstract = True
 
 
+SECTION_FIELDS = [
+    field.name for field in Template._meta.local_fields if isinstance(field, RichTextField)
+]
+
+
 class ReportTemplate(Template):
     tags = TaggableManager()
 
@@ -127,19 +139,41 @@ class Report(Template):
             self.pdf_report.read_only = True
         super(Report, self).save(*args, **kwargs)
 
-    def generate_pdf_report(self):
-        # Generate the PDF report from HTML content
+    def get_sections(self) -> list:
+        """
+        Return the (title, content) pairs of the report in the configured order, skipping empty sections.
+        """
+        names = [name for name in self.fields_ordered.split(',') if name] or SECTION_FIELDS
+        sections = []
+        for name in names:
+            content = getattr(self, name, '')
+            if name in SECTION_FIELDS and content:
+                sections.append((self._meta.get_field(name).verbose_name, content))
+        return sections
+
+    def generate_pdf_report(self, progress=None):
+        """
+        Render the report sections to PDF with xhtml2pdf and store the result in ``pdf_report``.
+
+        :param progress: Optional callable receiving the completed percentage.
+        :raises ReportRenderError: When xhtml2pdf reports errors in the document.
+        """
+        progress = progress or (lambda percentage: None)
+
         template = get_template('reports/report_template.html')
-        context = {'report_content': self.template.content}
+        context = {'report': self, 'company': self.company, 'sections': self.get_sections()}
         html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'filename=sustainability_report_{self.id}.pdf'
-        pisa_status = pisa.CreatePDF(html, dest=response)
+        progress(20)
 
+        output = BytesIO()
+        pisa_status = pisa.CreatePDF(html, dest=output, link_callback=pisa_link_callback)
         if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        else:
-            self.pdf_report.save(response['Content-Disposition'], ContentFile(response.content))
+            raise ReportRenderError(f'xhtml2pdf reported {pisa_status.err} errors rendering report {self.id}')
+        progress(90)
+
+        self.pdf_report.save(f'sustainability_report_{self.id}.pdf', ContentFile(output.getvalue()))
+        progress(100)
+        return self.pdf_report
 
     def __str__(self):
         return f"{self.name} - Version {self.version} - Period {self.period}"
@@ -147,3 +181,69 @@ class Report(Template):
     class Meta:
         verbose_name = _('Reporte')
         verbose_name_plural = _('Reportes')
+
+
+class ReportRenderJob(models.Model):
+    """
+    Queued PDF rendering of a report, processed out of band by the ``render_reports`` command.
+
+    Attributes:
+        report: Report whose ``pdf_report`` is generated.
+        requested_by: User that requested the rendering.
+        status: Current state of the job.
+        progress: Completed percentage reported while rendering.
+        attempts: Number of times a worker has claimed the job.
+        worker: Identifier of the worker that claimed the job last.
+        error: Error of the last failed attempt.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    STATUS_CHOICES = [
+        (PENDING, _('Pendiente')),
+        (RUNNING, _('En proceso')),
+        (DONE, _('Terminado')),
+        (FAILED, _('Fallido')),
+    ]
+
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='render_jobs')
+    requested_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    status = models.CharField(_('Estado'), choices=STATUS_CHOICES, max_length=20, default=PENDING)
+    progress = models.PositiveSmallIntegerField(_('Progreso'), default=0)
+    attempts = models.PositiveSmallIntegerField(_('Intentos'), default=0)
+    worker = models.CharField(_('Worker'), max_length=100, blank=True)
+    error = models.TextField(_('Error'), blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def set_progress(self, progress):
+        self.progress = progress
+        ReportRenderJob.objects.filter(id=self.id).update(progress=progress)
+
+    def finish(self, status, error=''):
+        self.status = status
+        self.error = error
+        self.finished_at = timezone.now()
+        if status == self.DONE:
+            self.progress = 100
+        self.save(update_fields=['status', 'error', 'finished_at', 'progress'])
+
+    def __str__(self):
+        return f"{self.report} - {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = _('Generación de reporte')
+        verbose_name_plural = _('Generaciones de reportes')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
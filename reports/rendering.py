@@ -0,0 +1,114 @@
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from reports.models import ReportRenderJob
+
+logger = logging.getLogger(__name__)
+
+# First key of the postgres advisory locks used as rendering slots, the second key is the slot number
+RENDER_SLOT_LOCK = 4_700_013
+
+
+def enqueue_report_render(report, user=None) -> ReportRenderJob:
+    """
+    Queue the PDF rendering of a report, reusing the job already waiting or running for it.
+
+    :param report: Report to render.
+    :param user: User requesting the rendering.
+    """
+    with transaction.atomic():
+        job = ReportRenderJob.objects.select_for_update().filter(
+            report=report, status__in=[ReportRenderJob.PENDING, ReportRenderJob.RUNNING]
+        ).first()
+        if job is None:
+            job = ReportRenderJob.objects.create(report=report, requested_by=user)
+    return job
+
+
+@contextmanager
+def render_slot():
+    """
+    Hold one of the ``REPORT_RENDER_CONCURRENCY`` rendering slots while the block runs.
+
+    Slots are session level advisory locks, so any number of workers can be started and only that many render at
+    the same time. Yields the slot number, or None when every slot is taken.
+    """
+    slot = None
+    with connection.cursor() as cursor:
+        for number in range(settings.REPORT_RENDER_CONCURRENCY):
+            cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [RENDER_SLOT_LOCK, number])
+            if cursor.fetchone()[0]:
+                slot = number
+                break
+    try:
+        yield slot
+    finally:
+        if slot is not None:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [RENDER_SLOT_LOCK, slot])
+
+
+def claim_job(worker) -> ReportRenderJob:
+    """
+    Take the oldest pending job, or a running job whose worker stopped answering before the timeout.
+
+    Stale running jobs that already used their ``REPORT_RENDER_MAX_ATTEMPTS`` are marked as failed instead, so a
+    report that kills its worker is not rendered forever. Rows locked by other workers are skipped so claiming never
+    waits on a job being taken elsewhere.
+
+    :param worker: Identifier stored in the claimed job.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.REPORT_RENDER_TIMEOUT)
+    max_attempts = settings.REPORT_RENDER_MAX_ATTEMPTS
+    with transaction.atomic():
+        exhausted = list(ReportRenderJob.objects.select_for_update(skip_locked=True).filter(
+            status=ReportRenderJob.RUNNING, started_at__lt=stale, attempts__gte=max_attempts
+        ).values_list('id', flat=True))
+        if exhausted:
+            ReportRenderJob.objects.filter(id__in=exhausted).update(
+                status=ReportRenderJob.FAILED, finished_at=timezone.now(),
+                error=f'El proceso de generación no respondió en {max_attempts} intentos.'
+            )
+
+        job = ReportRenderJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ReportRenderJob.PENDING) |
+            Q(status=ReportRenderJob.RUNNING, started_at__lt=stale, attempts__lt=max_attempts)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+
+        job.status = ReportRenderJob.RUNNING
+        job.progress = 0
+        job.attempts += 1
+        job.worker = worker
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'progress', 'attempts', 'worker', 'started_at'])
+    return job
+
+
+def render_job(job):
+    """
+    Render the report of a claimed job. Failed jobs go back to the queue until ``REPORT_RENDER_MAX_ATTEMPTS``.
+
+    :param job: Job returned by ``claim_job``.
+    """
+    try:
+        job.report.generate_pdf_report(progress=job.set_progress)
+    except Exception as error:
+        logger.exception('Error rendering report %s', job.report_id)
+        if job.attempts < settings.REPORT_RENDER_MAX_ATTEMPTS:
+            job.status = ReportRenderJob.PENDING
+            job.error = str(error)
+            job.save(update_fields=['status', 'error'])
+        else:
+            job.finish(ReportRenderJob.FAILED, str(error))
+        return False
+
+    job.finish(ReportRenderJob.DONE)
+    return True
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import ReportTemplate, CompanyTemplate, Report
+from .models import ReportTemplate, CompanyTemplate, Report, ReportRenderJob
 
 
 class ReportTemplateListSerializer(serializers.ModelSerializer):
@@ -36,3 +36,19 @@ class ReportDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
+
+
+class ReportRenderJobSerializer(serializers.ModelSerializer):
+    pdf_report = serializers.SerializerMethodField()
+
+    def get_pdf_report(self, obj) -> str:
+        if obj.status != ReportRenderJob.DONE or not obj.report.pdf_report:
+            return None
+        url = obj.report.pdf_report.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    class Meta:
+        model = ReportRenderJob
+        fields = ['id', 'report', 'status', 'progress', 'attempts', 'error', 'created_at', 'started_at',
+                  'finished_at', 'pdf_report']
@@ -1,3 +1,55 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from reports import rendering
+from reports.models import ReportRenderJob
+
+
+@override_settings(REPORT_RENDER_TIMEOUT=600, REPORT_RENDER_MAX_ATTEMPTS=3)
+class ClaimJobTest(SimpleTestCase):
+    """
+    Jobs taken by the render_reports workers.
+    """
+
+    def setUp(self):
+        for target, name in ((ReportRenderJob, 'objects'), (rendering, 'transaction')):
+            patcher = mock.patch.object(target, name)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.now = timezone.now()
+        patcher = mock.patch.object(rendering.timezone, 'now', return_value=self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.locked = self.objects.select_for_update.return_value
+        self.locked.filter.return_value.values_list.return_value = []
+        self.locked.filter.return_value.order_by.return_value.first.return_value = None
+
+    def test_stale_job_without_attempts_left_is_failed(self):
+        self.locked.filter.return_value.values_list.return_value = [4, 9]
+
+        self.assertIsNone(rendering.claim_job('worker-1'))
+
+        stale = self.now - timedelta(seconds=600)
+        self.locked.filter.assert_any_call(status=ReportRenderJob.RUNNING, started_at__lt=stale, attempts__gte=3)
+        self.objects.filter.assert_called_once_with(id__in=[4, 9])
+        update = self.objects.filter.return_value.update
+        update.assert_called_once()
+        self.assertEqual(update.call_args.kwargs['status'], ReportRenderJob.FAILED)
+        # Only the stale jobs with attempts left can be claimed again
+        claimable = self.locked.filter.call_args_list[-1].args[0]
+        self.assertIn(('attempts__lt', 3), claimable.children[1].children)
+
+    def test_claimed_job_counts_the_attempt(self):
+        job = ReportRenderJob(id=1, attempts=1, status=ReportRenderJob.RUNNING)
+        job.save = mock.Mock()
+        self.locked.filter.return_value.order_by.return_value.first.return_value = job
+
+        self.assertIs(rendering.claim_job('worker-2'), job)
+
+        self.objects.filter.assert_not_called()
+        self.assertEqual((job.status, job.attempts, job.worker), (ReportRenderJob.RUNNING, 2, 'worker-2'))
+        job.save.assert_called_once_with(update_fields=['status', 'progress', 'attempts', 'worker', 'started_at'])
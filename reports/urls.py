@@ -1,6 +1,6 @@
 from django.urls import path
 from reports.views import ReportPDFDetailView, PrintView, DownloadView, DynamicNameView
-from reports.api import ReportTemplateViewSet, CompanyTemplateViewSet, ReportViewSet
+from reports.api import ReportTemplateViewSet, CompanyTemplateViewSet, ReportViewSet, ReportRenderJobViewSet
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -9,6 +9,7 @@ router = DefaultRouter()
 router.register(r'planet-templates', ReportTemplateViewSet)
 router.register(r'company-templates', CompanyTemplateViewSet)
 router.register(r'reports', ReportViewSet)
+router.register(r'render-jobs', ReportRenderJobViewSet)
 
 api_urls = ([
     path('', include(router.urls)),
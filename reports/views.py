@@ -1,15 +1,30 @@
-import ssl
+import json
+import os
+from functools import lru_cache
+
+import pdfkit
+import weasyprint
+from django.contrib.staticfiles import finders
 from django.shortcuts import render, get_object_or_404
+from django.template.response import SimpleTemplateResponse
 from django.utils import timezone
 from django_pdfkit import PDFView
+from reports.assets import local_url_fetcher
+from reports.cache import pdf_cache, cached_pdf_response
 from reports.models import ReportTemplate
 from companies.models import Company
-import functools
 from django.conf import settings
 from django.views.generic import DetailView
 from django_weasyprint import WeasyTemplateResponseMixin
 from django_weasyprint.views import WeasyTemplateResponse
-from django_weasyprint.utils import django_url_fetcher
+
+
+# Static files linked by the report templates, hashed into the PDF cache key so editing them renders again
+REPORT_STATIC_FILES = ['css/report.css']
+
+
+def report_static_files():
+    return [finders.find(path) or path for path in REPORT_STATIC_FILES]
 
 
 class ReportPDFDetailView(PDFView):
@@ -46,7 +61,37 @@ class ReportPDFDetailView(PDFView):
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
-        return super(ReportPDFDetailView, self).get(request, *args, **kwargs)
+        if 'html' in request.GET:
+            return super(ReportPDFDetailView, self).get(request, *args, **kwargs)
+
+        html = self.render_html(*args, **kwargs)
+        options = self.get_render_options()
+        engine = f'pdfkit-{pdfkit.__version__}-{json.dumps(options, sort_keys=True)}'
+        key = pdf_cache.make_key(html, report_static_files(), engine)
+        attachment = (not self.inline or 'download' in request.GET) and 'inline' not in request.GET
+        return cached_pdf_response(
+            request, key, lambda: self.render_html_pdf(html, options),
+            filename=self.get_filename(), attachment=attachment
+        )
+
+    def get_render_options(self):
+        """
+        Final pdfkit options of the request, the ones ``render_pdf`` would use.
+        """
+        options = dict(self.get_pdfkit_options())
+        if 'debug' in self.request.GET and settings.DEBUG:
+            options['debug-javascript'] = 1
+        return options
+
+    def render_html_pdf(self, html, options):
+        """
+        Same as ``render_pdf`` for HTML that is already rendered, so a cache miss renders the template once.
+        """
+        kwargs = {}
+        wkhtmltopdf_bin = os.environ.get('WKHTMLTOPDF_BIN')
+        if wkhtmltopdf_bin:
+            kwargs['configuration'] = pdfkit.configuration(wkhtmltopdf=wkhtmltopdf_bin)
+        return pdfkit.from_string(html, False, options=options, **kwargs)
 
 
 class MyDetailView(DetailView):
@@ -54,41 +99,68 @@ class MyDetailView(DetailView):
     template_name = 'reports/basic2-template.html'
 
 
-def custom_url_fetcher(url, *args, **kwargs):
-    # rewrite requests for CDN URLs to file path in STATIC_ROOT to use local file
-    cloud_storage_url = 'https://s3.amazonaws.com/django-weasyprint/static/'
-    print('******************')
-    print(url)
-    print('******************')
-    if url.startswith(cloud_storage_url):
-        url = 'file://' + url.replace(cloud_storage_url, settings.STATIC_URL)
-    new_url = django_url_fetcher(url, *args, **kwargs)
-    print('******************')
-    print(new_url)
-    print('******************')
-    return new_url
+@lru_cache(maxsize=None)
+def shared_font_config():
+    # One font configuration per process so @font-face files are loaded once
+    return weasyprint.fonts.FontConfiguration()
+
+
+@lru_cache(maxsize=settings.REPORT_ASSET_CACHE_SIZE)
+def parsed_stylesheet(path, mtime):
+    return weasyprint.CSS(path, url_fetcher=local_url_fetcher, font_config=shared_font_config())
 
 
 class CustomWeasyTemplateResponse(WeasyTemplateResponse):
-    # customized response class to pass a kwarg to URL fetcher
+    # Assets are read from disk through the local fetcher and parsed stylesheets are kept between renders
     def get_url_fetcher(self):
-        # disable host and certificate check
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
-        return functools.partial(custom_url_fetcher, ssl_context=context)
+        return local_url_fetcher
+
+    def get_font_config(self):
+        return shared_font_config()
+
+    def get_css(self, base_url, url_fetcher, font_config):
+        stylesheets = []
+        for value in self._stylesheets:
+            if os.path.isfile(value):
+                stylesheets.append(parsed_stylesheet(value, os.path.getmtime(value)))
+            else:
+                stylesheets.append(
+                    weasyprint.CSS(value, base_url=base_url, url_fetcher=url_fetcher, font_config=font_config)
+                )
+        return stylesheets
+
+    @property
+    def rendered_html(self):
+        return SimpleTemplateResponse.rendered_content.fget(self)
+
+
+class CachedPDFMixin(WeasyTemplateResponseMixin):
+    """
+    Serve the WeasyPrint PDF from the report PDF cache, it is only rendered when the HTML or the stylesheets change.
+    """
+    response_class = CustomWeasyTemplateResponse
 
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        key = pdf_cache.make_key(
+            response.rendered_html,
+            report_static_files() + list(self.get_pdf_stylesheets()),
+            f'weasyprint-{weasyprint.__version__}'
+        )
+        return cached_pdf_response(
+            self.request, key, lambda: response.rendered_content,
+            filename=self.get_pdf_filename() or f'report-{self.object.pk}.pdf',
+            attachment=bool(self.pdf_attachment and self.get_pdf_filename())
+        )
 
-class PrintView(WeasyTemplateResponseMixin, MyDetailView):
+
+class PrintView(CachedPDFMixin, MyDetailView):
     # output of MyDetailView rendered as PDF with hardcoded CSS
     pdf_stylesheets = [
         settings.STATIC_ROOT + '/css/report.css',
     ]
     # show pdf in-line (default: True, show download dialog)
     pdf_attachment = False
-    # custom response class to configure url-fetcher
-    response_class = CustomWeasyTemplateResponse
-
     queryset = ReportTemplate.objects.all()
 
     def get_context_data(self, **kwargs):
@@ -101,12 +173,12 @@ class PrintView(WeasyTemplateResponseMixin, MyDetailView):
         return super().get_context_data(**context)
 
 
-class DownloadView(WeasyTemplateResponseMixin, MyDetailView):
+class DownloadView(CachedPDFMixin, MyDetailView):
     # suggested filename (is required for attachment/download!)
     pdf_filename = 'foo.pdf'
 
 
-class DynamicNameView(WeasyTemplateResponseMixin, MyDetailView):
+class DynamicNameView(CachedPDFMixin, MyDetailView):
     # dynamically generate filename
     def get_pdf_filename(self):
         return 'foo-{at}.pdf'.format(